@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import DailyFinancialRollup
 
-# Register your models here.
+
+@admin.register(DailyFinancialRollup)
+class DailyFinancialRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'day', 'income', 'expenses', 'invoice_count', 'expense_count')
+    list_filter = ('day',)
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('updated_at',)
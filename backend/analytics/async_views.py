@@ -0,0 +1,90 @@
+"""Async variants of the multi-query analytics endpoints.
+
+Enabled with ``ASYNC_ANALYTICS_VIEWS``. DRF views are sync only, so these are
+plain Django async views that authenticate with the same JWT backend, render
+with DRF's JSON renderer (identical payloads to the sync views) and share the
+analytics response cache with them.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .cache import lookup_cached_response, store_cached_response
+from .concurrency import run_concurrently
+from .views import parse_bundle_params, bundle_tasks, assemble_bundle
+
+
+_jwt_auth = JWTAuthentication()
+
+
+def render_json(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+async def authenticate_request(request):
+    """Return the JWT authenticated user, or None"""
+    try:
+        result = await sync_to_async(_jwt_auth.authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def async_analytics_view(cache_endpoint=None):
+    """Wrap an async ``view(request, user)`` with GET-only, JWT auth and optional caching.
+
+    ``cache_endpoint`` is the cache key namespace; pass the sync view's class
+    name so both modes hit the same cached responses.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return render_json({'detail': f'Method "{request.method}" not allowed.'},
+                                   status.HTTP_405_METHOD_NOT_ALLOWED)
+
+            user = await authenticate_request(request)
+            if user is None:
+                return render_json({'detail': 'Authentication credentials were not provided.'},
+                                   status.HTTP_401_UNAUTHORIZED)
+
+            if not cache_endpoint or not getattr(settings, 'ANALYTICS_CACHE_ENABLED', True):
+                data, status_code = await view(request, user, *args, **kwargs)
+                return render_json(data, status_code)
+
+            key, data = await sync_to_async(lookup_cached_response)(user.id, cache_endpoint, request.GET)
+            if data is not None:
+                response = render_json(data)
+                response['X-Analytics-Cache'] = 'HIT'
+                return response
+
+            data, status_code = await view(request, user, *args, **kwargs)
+            if status_code == status.HTTP_200_OK:
+                await sync_to_async(store_cached_response)(key, data)
+            response = render_json(data, status_code)
+            response['X-Analytics-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+    return decorator
+
+
+@async_analytics_view(cache_endpoint='DashboardBundleView')
+async def dashboard_bundle(request, user):
+    """Async DashboardBundleView: the section queries run concurrently"""
+    params, error = parse_bundle_params(request.GET)
+    if error:
+        return {'error': error}, status.HTTP_400_BAD_REQUEST
+
+    results = await run_concurrently(bundle_tasks(user, params))
+
+    result, error = assemble_bundle(params['sections'], results)
+    if error:
+        return {'error': error}, status.HTTP_400_BAD_REQUEST
+    return result, status.HTTP_200_OK
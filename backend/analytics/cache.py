@@ -0,0 +1,134 @@
+"""Per-user versioned response cache for the analytics endpoints.
+
+Every user has a data version counter that is bumped whenever one of their
+invoices, invoice items, expenses or expense categories changes. The counter
+is part of every cache key, so a bump makes all cached analytics responses of
+that user unreachable without having to enumerate and delete them. The
+current date is part of the key as well: relative ranges, days until due and
+the current month change at midnight without any data changing.
+
+The backend is the ``analytics`` entry of ``settings.CACHES`` (local memory,
+file based or Redis, see ``ANALYTICS_CACHE_BACKEND``).
+"""
+import hashlib
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+
+# Hit/miss counters of this process. Counting in the shared cache would add a
+# read-modify-write (a file write on the file backend) to every request.
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_analytics_cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'analytics')]
+
+
+def _version_key(user_id):
+    return f"version:{user_id}"
+
+
+def _increment(cache, key):
+    """Increment a counter that never expires, creating it on first use"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, None):
+            return 1
+        return cache.incr(key)
+
+
+def get_data_version(user_id):
+    return get_analytics_cache().get(_version_key(user_id), 0)
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached analytics response of a user"""
+    return _increment(get_analytics_cache(), _version_key(user_id))
+
+
+def bump_data_version_on_commit(user_id):
+    """Bump the version once the current transaction commits.
+
+    Bumping before commit would let a concurrent request cache the old data
+    under the new version.
+    """
+    if user_id is not None:
+        transaction.on_commit(lambda: bump_data_version(user_id))
+
+
+def build_cache_key(user_id, endpoint, query_params):
+    params = '&'.join(
+        f"{name}={','.join(sorted(query_params.getlist(name)))}" for name in sorted(query_params)
+    )
+    params_hash = hashlib.md5(params.encode()).hexdigest()
+    return f"response:{user_id}:{get_data_version(user_id)}:{timezone.localdate():%Y%m%d}:{endpoint}:{params_hash}"
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_cache_stats():
+    """Hit/miss counters of the process serving the request"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'backend': get_analytics_cache().__class__.__name__,
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total * 100, 2) if total else 0
+    }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def lookup_cached_response(user_id, endpoint, query_params):
+    """Return ``(key, data)`` for a request; ``data`` is None on a miss"""
+    cache = get_analytics_cache()
+    key = build_cache_key(user_id, endpoint, query_params)
+    data = cache.get(key)
+    _count('hits' if data is not None else 'misses')
+    return key, data
+
+
+def store_cached_response(key, data):
+    get_analytics_cache().set(key, data)
+
+
+def cached_analytics_response(get):
+    """Cache successful responses of an analytics ``get`` handler.
+
+    Responses are keyed by user, endpoint, query parameters and the user's
+    data version. The ``X-Analytics-Cache`` header reports HIT or MISS.
+    """
+    @wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        if not getattr(settings, 'ANALYTICS_CACHE_ENABLED', True) or not request.user.is_authenticated:
+            return get(self, request, *args, **kwargs)
+
+        key, data = lookup_cached_response(request.user.id, self.__class__.__name__, request.query_params)
+        if data is not None:
+            response = Response(data)
+            response['X-Analytics-Cache'] = 'HIT'
+            return response
+
+        response = get(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            store_cached_response(key, response.data)
+        response['X-Analytics-Cache'] = 'MISS'
+        return response
+
+    return wrapper
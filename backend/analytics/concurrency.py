@@ -0,0 +1,71 @@
+"""Run independent ORM queries concurrently from async views.
+
+Tasks run on a bounded thread pool via ``sync_to_async(thread_sensitive=False)``,
+so every task uses the database connection of its worker thread and the
+queries of one request execute in parallel. The pool size
+(``ANALYTICS_ASYNC_MAX_WORKERS``) caps how many extra connections a process
+opens.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ANALYTICS_ASYNC_MAX_WORKERS,
+                thread_name_prefix='analytics-query'
+            )
+    return _executor
+
+
+def can_run_concurrently():
+    # SQLite serializes access and test databases only exist inside the request's own
+    # connection, so fall back to running the tasks one after another
+    return settings.ANALYTICS_ASYNC_MAX_WORKERS > 1 and connection.vendor != 'sqlite'
+
+
+def _run_task(task):
+    """Run one task in a pool thread, honouring CONN_MAX_AGE like a request would"""
+    close_old_connections()
+    try:
+        return task()
+    finally:
+        close_old_connections()
+
+
+def _run_serially(tasks):
+    return {name: task() for name, task in tasks.items()}
+
+
+async def run_concurrently(tasks):
+    """Await a dict of name -> zero argument callable, returning name -> result.
+
+    If tasks fail, the first failure (in ``tasks`` order) is raised after all
+    of them have finished.
+    """
+    if not can_run_concurrently():
+        return await sync_to_async(_run_serially)(tasks)
+
+    executor = get_executor()
+    names = list(tasks)
+    results = await asyncio.gather(*(
+        sync_to_async(_run_task, thread_sensitive=False, executor=executor)(tasks[name])
+        for name in names
+    ), return_exceptions=True)
+    # Raise only once every task is done, so no query is still running when the request fails
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return dict(zip(names, results))
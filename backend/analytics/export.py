@@ -0,0 +1,163 @@
+"""Streaming exports of the analytics data (CSV, Parquet, Arrow IPC).
+
+Rows are read with ``QuerySet.iterator()`` and written out chunk by chunk from
+a generator handed to ``StreamingHttpResponse``, so memory use does not grow
+with the size of the exported range. Parquet and Arrow output need the
+``pyarrow`` package (listed in ``requirements.txt``), which is only imported
+when such an export is requested; installs without it keep CSV exports.
+"""
+import csv
+from itertools import islice
+
+from django.db.models import Sum, Count
+from django.http import StreamingHttpResponse
+
+from archive.services import archived_category_totals, merge_category_totals
+from expense.models import Expense
+from .services import get_rollups
+from .series import iter_series, bucket_label
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_DATASETS = ('series', 'categories')
+
+EXPORT_OUTPUTS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+# Column name and Arrow type name per dataset
+DATASET_COLUMNS = {
+    'series': [('date', 'date'), ('label', 'string'), ('income', 'decimal'), ('expenses', 'decimal'), ('net', 'decimal')],
+    'categories': [('category', 'string'), ('total', 'decimal'), ('count', 'integer')],
+}
+
+
+def iter_series_rows(user, start_date, end_date, group_by):
+    """Dense income/expenses/net rows, one per bucket"""
+    rollups = (
+        get_rollups(user, start_date, end_date)
+        .order_by('day')
+        .values_list('day', 'income', 'expenses')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for start, income, expenses in iter_series(start_date, end_date, group_by, rollups):
+        yield start, bucket_label(start, group_by), income, expenses, income - expenses
+
+
+def iter_category_rows(user, start_date, end_date):
+    """Expense total and count per category (archived expenses included), largest first"""
+    category_totals = (
+        Expense.objects.filter(user=user, date__gte=start_date, date__lte=end_date)
+        .values('category_id', 'category__name')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by('-total', 'category__name')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    category_totals = merge_category_totals(category_totals, archived_category_totals(user.id, start_date, end_date))
+    for row in category_totals:
+        yield row['category__name'] or 'Uncategorized', row['total'], row['count']
+
+
+class Echo:
+    """File-like object whose ``write`` returns the value instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class ChunkSink:
+    """Write-only file-like object collecting bytes until they are drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_arrow(columns, rows, output):
+    """Write rows as Parquet row groups / Arrow record batches of EXPORT_CHUNK_SIZE rows"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        'date': pa.date32(),
+        'string': pa.string(),
+        'decimal': pa.decimal128(18, 2),
+        'integer': pa.int64(),
+    }
+    schema = pa.schema([(name, arrow_types[type_name]) for name, type_name in columns])
+
+    sink = ChunkSink()
+    if output == 'parquet':
+        writer = pq.ParquetWriter(sink, schema)
+        write_batch = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write_batch = writer.write_batch
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+        write_batch(pa.record_batch(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)],
+            schema=schema
+        ))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+def export_response(dataset, output, rows, filename):
+    """StreamingHttpResponse sending ``rows`` of ``dataset`` in the requested output format"""
+    columns = DATASET_COLUMNS[dataset]
+    content_type, extension = EXPORT_OUTPUTS[output]
+
+    if output == 'csv':
+        content = stream_csv(columns, rows)
+    else:
+        content = stream_arrow(columns, rows, output)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
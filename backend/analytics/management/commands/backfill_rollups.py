@@ -0,0 +1,52 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from analytics.services import rebuild_user_rollups
+
+User = get_user_model()
+
+
+def _rebuild_for_user(user_id):
+    """Rebuild one user's rollups inside a worker thread"""
+    try:
+        return user_id, rebuild_user_rollups(user_id)
+    finally:
+        # Every worker thread opens its own connection; close it once the user is done
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DailyFinancialRollup rows from raw invoices and expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of users rebuilt in parallel')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild the given user id (can be repeated)')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        user_ids = options['user_ids'] or list(User.objects.order_by('id').values_list('id', flat=True))
+
+        started = time.monotonic()
+        total_rows = 0
+
+        if workers == 1 or connection.vendor == 'sqlite':
+            # SQLite serializes writers, so parallel rebuilds would only contend for the lock
+            for user_id in user_ids:
+                total_rows += rebuild_user_rollups(user_id)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_rebuild_for_user, user_id) for user_id in user_ids]
+                for future in as_completed(futures):
+                    user_id, rows = future.result()
+                    total_rows += rows
+                    self.stdout.write(f'User {user_id}: {rows} rollup rows')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {total_rows} rollup rows for {len(user_ids)} users in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum, Count
+
+
+def backfill_rollups(apps, schema_editor):
+    """Populate the rollup table from existing invoices and expenses"""
+    Invoice = apps.get_model('invoice', 'Invoice')
+    Expense = apps.get_model('expense', 'Expense')
+    DailyFinancialRollup = apps.get_model('analytics', 'DailyFinancialRollup')
+
+    buckets = {}
+    invoice_rows = (
+        Invoice.objects.filter(status='paid')
+        .values('user_id', 'issue_date')
+        .annotate(total=Sum('total'), count=Count('id'))
+        .order_by()
+    )
+    for row in invoice_rows:
+        bucket = buckets.setdefault((row['user_id'], row['issue_date']), {})
+        bucket['income'] = row['total'] or 0
+        bucket['invoice_count'] = row['count']
+
+    expense_rows = (
+        Expense.objects.values('user_id', 'date')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    for row in expense_rows:
+        bucket = buckets.setdefault((row['user_id'], row['date']), {})
+        bucket['expenses'] = row['total'] or 0
+        bucket['expense_count'] = row['count']
+
+    DailyFinancialRollup.objects.bulk_create(
+        [DailyFinancialRollup(user_id=user_id, day=day, **values) for (user_id, day), values in buckets.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('invoice', '0001_initial'),
+        ('expense', '0002_alter_expense_receipt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFinancialRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['day'],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
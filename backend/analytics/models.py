@@ -1,3 +1,116 @@
 from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
 
-# Create your models here.
+from invoice.models import Invoice, InvoiceItem, invoices_bulk_created, invoices_bulk_updated
+from expense.models import Expense, ExpenseCategory
+from .cache import bump_data_version_on_commit
+
+User = get_user_model()
+
+
+class DailyFinancialRollup(models.Model):
+    """Pre-aggregated paid income and expenses per user and day.
+
+    Maintained incrementally from Invoice/Expense signals so analytics
+    endpoints read one row per day instead of every raw invoice and expense.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expenses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    invoice_count = models.PositiveIntegerField(default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.day}"
+
+    @property
+    def net(self):
+        return self.income - self.expenses
+
+    class Meta:
+        unique_together = ('user', 'day')
+        ordering = ['day']
+
+
+# Signal handlers keeping DailyFinancialRollup in sync with raw rows.
+# pre_save remembers the (user, day) a row used to belong to, so moving an
+# invoice to another date or user refreshes both the old and the new bucket.
+
+@receiver(pre_save, sender=Invoice)
+def remember_invoice_rollup_day(sender, instance, **kwargs):
+    instance._previous_rollup_key = None
+    if not instance._state.adding:
+        previous = Invoice.objects.filter(pk=instance.pk).values('user_id', 'issue_date').first()
+        if previous:
+            instance._previous_rollup_key = (previous['user_id'], previous['issue_date'])
+
+
+@receiver(pre_save, sender=Expense)
+def remember_expense_rollup_day(sender, instance, **kwargs):
+    instance._previous_rollup_key = None
+    if not instance._state.adding:
+        previous = Expense.objects.filter(pk=instance.pk).values('user_id', 'date').first()
+        if previous:
+            instance._previous_rollup_key = (previous['user_id'], previous['date'])
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def update_rollup_for_invoice(sender, instance, **kwargs):
+    from .services import refresh_rollup_keys
+    refresh_rollup_keys(
+        [(instance.user_id, instance.issue_date), getattr(instance, '_previous_rollup_key', None)]
+    )
+
+
+@receiver(invoices_bulk_created)
+def update_rollups_for_bulk_invoices(sender, user_id, invoices, **kwargs):
+    # Only paid invoices count towards the rollups
+    from .services import refresh_rollup_keys
+    refresh_rollup_keys([(user_id, invoice.issue_date) for invoice in invoices if invoice.status == 'paid'])
+    bump_data_version_on_commit(user_id)
+
+
+@receiver(invoices_bulk_updated)
+def update_rollups_for_bulk_update(sender, user_id, issue_dates, fields, statuses=None, **kwargs):
+    from .services import refresh_rollup_keys
+    # Rollups only hold paid invoices, so e.g. unpaid -> overdue leaves them as they are
+    rollup_fields = {'total', 'issue_date'} | ({'status'} if statuses is None or 'paid' in statuses else set())
+    if rollup_fields & set(fields):
+        refresh_rollup_keys([(user_id, day) for day in issue_dates])
+    bump_data_version_on_commit(user_id)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def update_rollup_for_expense(sender, instance, **kwargs):
+    from .services import refresh_rollup_keys
+    refresh_rollup_keys(
+        [(instance.user_id, instance.date), getattr(instance, '_previous_rollup_key', None)]
+    )
+
+
+# Any change to a user's financial data invalidates their cached analytics responses
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=ExpenseCategory)
+@receiver(post_delete, sender=ExpenseCategory)
+def bump_analytics_version(sender, instance, **kwargs):
+    bump_data_version_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def bump_analytics_version_for_item(sender, instance, **kwargs):
+    if InvoiceItem.invoice.is_cached(instance):
+        user_id = instance.invoice.user_id
+    else:
+        user_id = Invoice.objects.filter(pk=instance.invoice_id).values_list('user_id', flat=True).first()
+    bump_data_version_on_commit(user_id)
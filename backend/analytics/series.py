@@ -0,0 +1,128 @@
+"""Calendar-aligned bucketing for analytics time series.
+
+Daily rows are folded into day/week/month/year buckets in a single pass: the
+bucket index is built once as a dict keyed by bucket start date, then every
+row is placed with one lookup instead of rescanning the data per bucket.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+
+GROUP_BY_CHOICES = ('day', 'week', 'month', 'year')
+
+
+def bucket_start(day, group_by):
+    """Return the first day of the bucket containing ``day``"""
+    if group_by == 'day':
+        return day
+    if group_by == 'week':
+        # ISO weeks start on Monday
+        return day - timedelta(days=day.weekday())
+    if group_by == 'month':
+        return day.replace(day=1)
+    if group_by == 'year':
+        return day.replace(month=1, day=1)
+    raise ValueError(f"Unsupported grouping: {group_by}")
+
+
+def next_bucket(start, group_by):
+    """Start of the bucket following the one starting at ``start``"""
+    if group_by == 'day':
+        return start + timedelta(days=1)
+    if group_by == 'week':
+        return start + timedelta(days=7)
+    if group_by == 'year':
+        return start.replace(year=start.year + 1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def iter_buckets(start_date, end_date, group_by):
+    """Lazily yield every bucket start date covering the inclusive date range"""
+    current = bucket_start(start_date, group_by)
+    while current <= end_date:
+        yield current
+        current = next_bucket(current, group_by)
+
+
+def generate_buckets(start_date, end_date, group_by):
+    """Return every bucket start date covering the inclusive date range"""
+    return list(iter_buckets(start_date, end_date, group_by))
+
+
+def bucket_label(start, group_by):
+    """Human readable chart label for a bucket"""
+    if group_by == 'day':
+        return start.strftime('%d %b')
+    if group_by == 'week':
+        week_end = start + timedelta(days=6)
+        return f"Week {start.isocalendar()[1]} ({start.strftime('%d %b')} - {week_end.strftime('%d %b')})"
+    if group_by == 'month':
+        return start.strftime('%b %Y')
+    return start.strftime('%Y')
+
+
+def build_series(start_date, end_date, group_by, rows):
+    """Build a dense income/expenses/net series from daily rows.
+
+    ``rows`` is an iterable of ``(day, income, expenses)`` tuples, e.g.
+    ``DailyFinancialRollup.values_list('day', 'income', 'expenses')``.
+    Every bucket in the range is present in the output, empty ones as zeros.
+    """
+    # numpy is only needed once a series is actually built, keep it out of worker boot
+    import numpy as np
+
+    buckets = generate_buckets(start_date, end_date, group_by)
+    index = {start: position for position, start in enumerate(buckets)}
+
+    positions = []
+    income_values = []
+    expense_values = []
+    for day, income, expenses in rows:
+        position = index.get(bucket_start(day, group_by))
+        if position is None:
+            continue
+        positions.append(position)
+        income_values.append(float(income or 0))
+        expense_values.append(float(expenses or 0))
+
+    income = np.zeros(len(buckets))
+    expenses = np.zeros(len(buckets))
+    positions = np.asarray(positions, dtype=np.intp)
+    np.add.at(income, positions, income_values)
+    np.add.at(expenses, positions, expense_values)
+    net = income - expenses
+
+    return [
+        {
+            'date': start.strftime('%Y-%m-%d'),
+            'label': bucket_label(start, group_by),
+            'income': float(income[position]),
+            'expenses': float(expenses[position]),
+            'net': float(net[position])
+        }
+        for position, start in enumerate(buckets)
+    ]
+
+
+def iter_series(start_date, end_date, group_by, rows):
+    """Stream a dense series from daily rows sorted by day.
+
+    Same buckets as ``build_series`` but yields ``(start, income, expenses)``
+    with exact Decimal totals one bucket at a time, merging the sorted rows
+    as it goes, so memory stays constant for any range length.
+    """
+    rows = iter(rows)
+    pending = next(rows, None)
+
+    for start in iter_buckets(start_date, end_date, group_by):
+        following = next_bucket(start, group_by)
+        income = expenses = Decimal('0.00')
+        while pending is not None and pending[0] < following:
+            day, row_income, row_expenses = pending
+            if day >= start:
+                income += row_income or 0
+                expenses += row_expenses or 0
+            pending = next(rows, None)
+        yield start, income, expenses
@@ -0,0 +1,239 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum, Count
+from django.db.models.fields import DateField
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from archive.services import archived_daily_totals
+from invoice.models import Invoice
+from expense.models import Expense
+from .models import DailyFinancialRollup
+from .cache import get_analytics_cache
+
+
+_date_field = DateField()
+
+
+def _normalize_day(value):
+    """Coerce a date/datetime/string into a date (Invoice.issue_date defaults to a datetime)"""
+    return _date_field.to_python(value) if value is not None else None
+
+
+def refresh_rollup_keys(keys):
+    """Recompute the rollup rows for a collection of (user_id, day) pairs.
+
+    Each bucket is rebuilt from the raw rows of that single user and day, so the
+    cost is independent of how much history the user has. ``None`` entries and
+    duplicates are ignored.
+    """
+    days_by_user = defaultdict(set)
+    for key in keys:
+        if not key:
+            continue
+        user_id, day = key
+        day = _normalize_day(day)
+        if user_id is None or day is None:
+            continue
+        days_by_user[user_id].add(day)
+
+    for user_id, days in days_by_user.items():
+        refresh_daily_rollups(user_id, days)
+
+
+def refresh_daily_rollups(user_id, days):
+    """Rebuild the rollup rows of one user for the given days"""
+    days = sorted({_normalize_day(day) for day in days})
+    if not days:
+        return
+
+    invoice_totals = {
+        row['issue_date']: row
+        for row in Invoice.objects.filter(user_id=user_id, status='paid', issue_date__in=days)
+        .values('issue_date')
+        .annotate(total=Sum('total'), count=Count('id'))
+    }
+    expense_totals = {
+        row['date']: row
+        for row in Expense.objects.filter(user_id=user_id, date__in=days)
+        .values('date')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    }
+    # Days of archived years still count their archived invoices and expenses
+    archived_invoices, archived_expenses = archived_daily_totals(user_id, days)
+    _add_totals(invoice_totals, archived_invoices)
+    _add_totals(expense_totals, archived_expenses)
+
+    with transaction.atomic():
+        empty_days = []
+        for day in days:
+            income_row = invoice_totals.get(day)
+            expense_row = expense_totals.get(day)
+
+            if not income_row and not expense_row:
+                empty_days.append(day)
+                continue
+
+            DailyFinancialRollup.objects.update_or_create(
+                user_id=user_id,
+                day=day,
+                defaults={
+                    'income': income_row['total'] if income_row else 0,
+                    'invoice_count': income_row['count'] if income_row else 0,
+                    'expenses': expense_row['total'] if expense_row else 0,
+                    'expense_count': expense_row['count'] if expense_row else 0,
+                }
+            )
+
+        if empty_days:
+            DailyFinancialRollup.objects.filter(user_id=user_id, day__in=empty_days).delete()
+
+    # Drop memoized months only once the new totals are visible to other requests
+    transaction.on_commit(lambda: invalidate_monthly_revenue(user_id, days))
+
+
+def _add_totals(totals, extra):
+    """Add ``{day: {'total', 'count'}}`` rows to grouped rows of the same shape"""
+    for day, row in extra.items():
+        current = totals.get(day)
+        totals[day] = row if current is None else {
+            'total': (current['total'] or Decimal('0')) + (row['total'] or Decimal('0')),
+            'count': current['count'] + row['count'],
+        }
+
+
+def rebuild_user_rollups(user_id, batch_size=1000):
+    """Rebuild every rollup row for one user from raw invoices and expenses.
+
+    Runs two grouped queries per source (the hot table and its archive) and
+    replaces the user's rollup rows in a single transaction. Returns the
+    number of rows written.
+    """
+    buckets = defaultdict(lambda: {
+        'income': Decimal('0'), 'invoice_count': 0,
+        'expenses': Decimal('0'), 'expense_count': 0,
+    })
+
+    invoice_rows = (
+        Invoice.objects.filter(user_id=user_id, status='paid')
+        .values('issue_date')
+        .annotate(total=Sum('total'), count=Count('id'))
+        .order_by()
+    )
+    for row in invoice_rows:
+        bucket = buckets[row['issue_date']]
+        bucket['income'] = row['total'] or Decimal('0')
+        bucket['invoice_count'] = row['count']
+
+    expense_rows = (
+        Expense.objects.filter(user_id=user_id)
+        .values('date')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    for row in expense_rows:
+        bucket = buckets[row['date']]
+        bucket['expenses'] = row['total'] or Decimal('0')
+        bucket['expense_count'] = row['count']
+
+    archived_invoices, archived_expenses = archived_daily_totals(user_id)
+    for day, row in archived_invoices.items():
+        buckets[day]['income'] += row['total'] or Decimal('0')
+        buckets[day]['invoice_count'] += row['count']
+    for day, row in archived_expenses.items():
+        buckets[day]['expenses'] += row['total'] or Decimal('0')
+        buckets[day]['expense_count'] += row['count']
+
+    rollups = [
+        DailyFinancialRollup(user_id=user_id, day=day, **values)
+        for day, values in buckets.items()
+    ]
+
+    affected_days = list(DailyFinancialRollup.objects.filter(user_id=user_id).values_list('day', flat=True))
+    affected_days.extend(buckets)
+
+    with transaction.atomic():
+        DailyFinancialRollup.objects.filter(user_id=user_id).delete()
+        DailyFinancialRollup.objects.bulk_create(rollups, batch_size=batch_size)
+        transaction.on_commit(lambda: invalidate_monthly_revenue(user_id, affected_days))
+
+    return len(rollups)
+
+
+def get_rollups(user, start_date, end_date):
+    """Rollup rows for a user within an inclusive date range"""
+    return DailyFinancialRollup.objects.filter(
+        user=user,
+        day__gte=start_date,
+        day__lte=end_date
+    )
+
+
+def month_start(day, offset=0):
+    """First day of the month ``offset`` months away from the month containing ``day``"""
+    month_index = day.year * 12 + (day.month - 1) + offset
+    return day.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def _monthly_revenue_key(user_id, month):
+    return f"monthly-revenue:{user_id}:{month:%Y-%m}"
+
+
+def invalidate_monthly_revenue(user_id, days):
+    """Forget memoized monthly revenue for the months containing ``days``"""
+    months = {month_start(_normalize_day(day)) for day in days if day is not None}
+    if months:
+        get_analytics_cache().delete_many([_monthly_revenue_key(user_id, month) for month in months])
+
+
+def get_monthly_revenue(user_id, months):
+    """Paid revenue per month for the given month start dates.
+
+    Closed months (before the current month) are memoized in the cache until
+    an invoice in that month changes, for at most ``ANALYTICS_CACHE_TIMEOUT``
+    (the invalidation only reaches the cache of the process that made the
+    change when the backend is per process); everything not memoized is read with a
+    single range query over the daily rollups bucketed by ``TruncMonth``.
+    Returns a dict mapping month start date to a Decimal total.
+    """
+    months = sorted(set(months))
+    if not months:
+        return {}
+
+    cache = get_analytics_cache()
+    current_month = month_start(timezone.now().date())
+    closed_keys = {
+        _monthly_revenue_key(user_id, month): month
+        for month in months if month < current_month
+    }
+
+    revenue = {}
+    for key, value in cache.get_many(closed_keys.keys()).items():
+        revenue[closed_keys[key]] = value
+
+    missing = [month for month in months if month not in revenue]
+    if missing:
+        monthly_rows = (
+            DailyFinancialRollup.objects.filter(
+                user_id=user_id,
+                day__gte=missing[0],
+                day__lt=month_start(missing[-1], 1)
+            )
+            .annotate(month=TruncMonth('day'))
+            .values('month')
+            .annotate(total=Sum('income'))
+            .order_by('month')
+        )
+        totals = {row['month']: row['total'] or Decimal('0') for row in monthly_rows}
+
+        to_memoize = {}
+        for month in missing:
+            revenue[month] = totals.get(month, Decimal('0'))
+            if month < current_month:
+                to_memoize[_monthly_revenue_key(user_id, month)] = revenue[month]
+        if to_memoize:
+            cache.set_many(to_memoize)
+
+    return revenue
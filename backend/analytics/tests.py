@@ -1,3 +1,841 @@
-from django.test import TestCase
+import csv
+import io
+import re
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from clients.models import Client
+from expense.models import Expense, ExpenseCategory
+from invoice.models import OPEN_BALANCE, Invoice, RecurringInvoice
+from invoice.bulk import InvoiceImporter, import_records
+from invoice.recurring import RecurringInvoiceGenerator
+from invoice.transitions import apply_bulk_status
+from payment.models import InvoicePayment
+from trackify.pagination import KeysetPagination
+from users import async_views as users_async_views, views as users_views
+from . import async_views
+from .concurrency import run_concurrently
+from .cache import get_analytics_cache, get_cache_stats, get_data_version, reset_cache_stats
+from .export import arrow_available
+from .models import DailyFinancialRollup
+from .series import build_series
+from .services import (
+    get_monthly_revenue, month_start, rebuild_user_rollups, refresh_daily_rollups, refresh_rollup_keys
+)
+from .views import DashboardBundleView, get_filtered_data, get_top_expense_categories, get_upcoming_payments, get_overdue_payments
+
+
+class RollupTests(TestCase):
+    """Daily rollups follow every invoice and expense write"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('roller', 'roller@example.com', 'password')
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.day = timezone.now().date() - timedelta(days=40)
+
+    def rollup(self, day):
+        return DailyFinancialRollup.objects.filter(user=self.user, day=day).values_list(
+            'income', 'invoice_count', 'expenses', 'expense_count'
+        ).first()
+
+    def create_invoice(self, amount, status='paid'):
+        return Invoice.objects.create_with_items(
+            [{'description': 'Work', 'quantity': 1, 'unit_price': amount}],
+            user=self.user, client=self.client_obj, status=status, issue_date=self.day, due_date=self.day
+        )
+
+    def test_invoice_create_update_delete(self):
+        paid = self.create_invoice(Decimal('100.00'))
+        self.create_invoice(Decimal('40.00'), status='unpaid')
+        self.assertEqual(self.rollup(self.day), (Decimal('100.00'), 1, Decimal('0.00'), 0))
+
+        second = self.create_invoice(Decimal('25.00'))
+        self.assertEqual(self.rollup(self.day), (Decimal('125.00'), 2, Decimal('0.00'), 0))
+
+        # Moving an invoice to another day moves its income with it
+        next_day = self.day + timedelta(days=1)
+        second.issue_date = next_day
+        second.save()
+        self.assertEqual(self.rollup(self.day), (Decimal('100.00'), 1, Decimal('0.00'), 0))
+        self.assertEqual(self.rollup(next_day), (Decimal('25.00'), 1, Decimal('0.00'), 0))
+
+        paid.status = 'unpaid'
+        paid.save()
+        self.assertIsNone(self.rollup(self.day))
+
+        second.delete()
+        self.assertFalse(DailyFinancialRollup.objects.filter(user=self.user).exists())
+
+    def test_expense_create_update_delete(self):
+        expense = Expense.objects.create(user=self.user, amount=Decimal('30.00'), date=self.day)
+        Expense.objects.create(user=self.user, amount=Decimal('5.50'), date=self.day)
+        self.assertEqual(self.rollup(self.day), (Decimal('0.00'), 0, Decimal('35.50'), 2))
+
+        expense.amount = Decimal('10.00')
+        expense.save()
+        self.assertEqual(self.rollup(self.day), (Decimal('0.00'), 0, Decimal('15.50'), 2))
+
+        expense.delete()
+        self.assertEqual(self.rollup(self.day), (Decimal('0.00'), 0, Decimal('5.50'), 1))
+
+    def test_monthly_revenue_of_closed_months_is_refreshed(self):
+        invoice = self.create_invoice(Decimal('100.00'))
+        month = month_start(self.day)
+        get_analytics_cache().clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(get_monthly_revenue(self.user.id, [month]), {month: Decimal('100.00')})
+            invoice.status = 'unpaid'
+            invoice.save()
+        self.assertEqual(get_monthly_revenue(self.user.id, [month]), {month: Decimal('0')})
+
+
+    def test_refresh_rollup_keys_skips_none_and_duplicates(self):
+        keys = [None, (None, self.day), (self.user.id, None), (self.user.id, self.day), (self.user.id, self.day)]
+        with mock.patch('analytics.services.refresh_daily_rollups') as refresh:
+            refresh_rollup_keys(keys)
+        refresh.assert_called_once_with(self.user.id, {self.day})
+
+        with mock.patch('analytics.services.refresh_daily_rollups') as refresh:
+            refresh_rollup_keys([None, (None, None)])
+        refresh.assert_not_called()
+
+    def test_refresh_rollup_keys_accepts_datetimes_and_strings(self):
+        self.create_invoice(Decimal('100.00'))
+        DailyFinancialRollup.objects.all().delete()
+        moment = timezone.make_naive(timezone.now()).replace(
+            year=self.day.year, month=self.day.month, day=self.day.day
+        )
+
+        with mock.patch('analytics.services.refresh_daily_rollups', wraps=refresh_daily_rollups) as refresh:
+            refresh_rollup_keys([(self.user.id, moment), (self.user.id, self.day.isoformat())])
+
+        refresh.assert_called_once_with(self.user.id, {self.day})
+        self.assertEqual(self.rollup(self.day), (Decimal('100.00'), 1, Decimal('0.00'), 0))
+
+    def test_bulk_created_invoices_update_rollups(self):
+        report = InvoiceImporter(self.user).run(import_records([
+            {'client': 'Acme', 'issue_date': self.day.isoformat(), 'due_date': self.day.isoformat(),
+             'status': status, 'items': [{'description': 'Work', 'quantity': '1', 'unit_price': '30.00'}]}
+            for status in ['paid', 'paid', 'unpaid']
+        ]))
+
+        self.assertEqual(report['created'], 3)
+        self.assertEqual(self.rollup(self.day), (Decimal('60.00'), 2, Decimal('0.00'), 0))
+
+    def test_bulk_status_updates_rollups_only_when_paid_is_involved(self):
+        invoices = [self.create_invoice(Decimal('20.00'), status='unpaid') for _ in range(2)]
+        ids = [invoice.id for invoice in invoices]
+
+        apply_bulk_status(self.user, ids, 'paid')
+        self.assertEqual(self.rollup(self.day), (Decimal('40.00'), 2, Decimal('0.00'), 0))
+
+        apply_bulk_status(self.user, ids[:1], 'unpaid')
+        self.assertEqual(self.rollup(self.day), (Decimal('20.00'), 1, Decimal('0.00'), 0))
+
+        # unpaid -> overdue cannot change a rollup, so no bucket is recomputed
+        with mock.patch('analytics.services.refresh_rollup_keys') as refresh:
+            apply_bulk_status(self.user, ids[:1], 'overdue')
+        refresh.assert_not_called()
+
+    def test_incremental_rollups_match_a_full_rebuild(self):
+        other_day = self.day + timedelta(days=3)
+        moved = self.create_invoice(Decimal('100.00'))
+        self.create_invoice(Decimal('45.50'))
+        self.create_invoice(Decimal('12.00'), status='unpaid')
+        Expense.objects.create(user=self.user, amount=Decimal('30.00'), date=self.day)
+        expense = Expense.objects.create(user=self.user, amount=Decimal('7.25'), date=self.day)
+        moved.issue_date = other_day
+        moved.save()
+        expense.date = other_day
+        expense.save()
+        apply_bulk_status(self.user, [moved.id], 'unpaid')
+
+        def rows():
+            return list(DailyFinancialRollup.objects.filter(user=self.user).order_by('day').values_list(
+                'day', 'income', 'invoice_count', 'expenses', 'expense_count'
+            ))
+
+        incremental = rows()
+        self.assertEqual(rebuild_user_rollups(self.user.id), len(incremental))
+        self.assertEqual(rows(), incremental)
+        self.assertEqual(incremental, [
+            (self.day, Decimal('45.50'), 1, Decimal('30.00'), 1),
+            (other_day, Decimal('0.00'), 0, Decimal('7.25'), 1),
+        ])
+
+
+class AnalyticsCacheTests(TestCase):
+    """Cached analytics responses are dropped as soon as the user's data changes"""
+
+    def setUp(self):
+        get_analytics_cache().clear()
+        self.user = User.objects.create_user('cached', 'cached@example.com', 'password')
+        self.other = User.objects.create_user('bystander', 'bystander@example.com', 'password')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def get(self):
+        response = self.api.get('/api/analytic/top-expense-categories/')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_writes_invalidate_cached_responses(self):
+        self.assertEqual(self.get()['X-Analytics-Cache'], 'MISS')
+        self.assertEqual(self.get()['X-Analytics-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            category = ExpenseCategory.objects.create(user=self.user, name='Travel')
+            Expense.objects.create(user=self.user, category=category, amount=Decimal('12.00'),
+                                   date=timezone.now().date())
+
+        response = self.get()
+        self.assertEqual(response['X-Analytics-Cache'], 'MISS')
+        self.assertEqual(self.get().data, response.data)
+
+    def test_responses_expire_at_midnight(self):
+        self.assertEqual(self.get()['X-Analytics-Cache'], 'MISS')
+        self.assertEqual(self.get()['X-Analytics-Cache'], 'HIT')
+
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.localdate', return_value=tomorrow):
+            self.assertEqual(self.get()['X-Analytics-Cache'], 'MISS')
+
+    def test_stats_are_counted_in_process(self):
+        reset_cache_stats()
+        self.get()
+        self.get()
+
+        stats = get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 50.0))
+        self.assertIsNone(get_analytics_cache().get('stats:hits'))
+
+    def test_version_is_bumped_on_commit_for_the_owner_only(self):
+        version, other_version = get_data_version(self.user.id), get_data_version(self.other.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, amount=Decimal('1.00'), date=timezone.now().date())
+            # Not visible to other requests before the commit
+            self.assertEqual(get_data_version(self.user.id), version)
+
+        self.assertEqual(get_data_version(self.user.id), version + 1)
+        self.assertEqual(get_data_version(self.other.id), other_version)
+
+
+class ExportTests(TestCase):
+    """Exports stream the series and category datasets as CSV, Parquet or Arrow"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', 'exporter@example.com', 'password')
+        client = Client.objects.create(user=self.user, name='Acme')
+        travel = ExpenseCategory.objects.create(user=self.user, name='Travel')
+        Invoice.objects.create_with_items(
+            [{'description': 'Work', 'quantity': 1, 'unit_price': Decimal('100.00')}],
+            user=self.user, client=client, status='paid', issue_date=date(2025, 3, 3), due_date=date(2025, 3, 3)
+        )
+        Expense.objects.create(user=self.user, category=travel, amount=Decimal('30.00'), date=date(2025, 3, 2))
+        Expense.objects.create(user=self.user, category=travel, amount=Decimal('10.00'), date=date(2025, 3, 3))
+        Expense.objects.create(user=self.user, amount=Decimal('5.00'), date=date(2025, 3, 4))
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def export(self, **params):
+        return self.api.get('/api/analytic/export/', {'start_date': '2025-03-01', 'end_date': '2025-03-10', **params})
+
+    def csv_rows(self, response, numeric):
+        """Header and rows of a CSV export, the ``numeric`` columns as Decimals (SQLite sums drop trailing zeros)"""
+        header, *rows = csv.reader(io.StringIO(b''.join(response.streaming_content).decode()))
+        return header, [[Decimal(value) if index in numeric else value for index, value in enumerate(row)]
+                        for row in rows]
+
+    def test_csv_series(self):
+        response = self.export()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="series-20250301-20250310.csv"')
+        header, rows = self.csv_rows(response, numeric={2, 3, 4})
+        self.assertEqual(header, ['date', 'label', 'income', 'expenses', 'net'])
+        # One dense row per day of the range
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[0], ['2025-03-01', '01 Mar', 0, 0, 0])
+        self.assertEqual(rows[1], ['2025-03-02', '02 Mar', 0, Decimal('30'), Decimal('-30')])
+        self.assertEqual(rows[2], ['2025-03-03', '03 Mar', Decimal('100'), Decimal('10'), Decimal('90')])
+
+    def test_csv_categories(self):
+        response = self.export(dataset='categories')
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="categories-20250301-20250310.csv"')
+        header, rows = self.csv_rows(response, numeric={1})
+        self.assertEqual(header, ['category', 'total', 'count'])
+        self.assertEqual(rows, [['Travel', Decimal('40'), '2'], ['Uncategorized', Decimal('5'), '1']])
+
+    @skipUnless(arrow_available(), 'pyarrow is not installed')
+    def test_parquet_and_arrow_round_trip(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet = self.export(dataset='categories', output='parquet')
+        self.assertEqual(parquet['Content-Type'], 'application/vnd.apache.parquet')
+        self.assertTrue(parquet['Content-Disposition'].endswith('.parquet"'))
+        table = pq.read_table(io.BytesIO(b''.join(parquet.streaming_content)))
+        self.assertEqual(table.to_pylist(), [
+            {'category': 'Travel', 'total': Decimal('40.00'), 'count': 2},
+            {'category': 'Uncategorized', 'total': Decimal('5.00'), 'count': 1},
+        ])
+
+        arrow = self.export(output='arrow')
+        self.assertTrue(arrow['Content-Disposition'].endswith('.arrows"'))
+        table = pa.ipc.open_stream(b''.join(arrow.streaming_content)).read_all()
+        self.assertEqual(table.schema.names, ['date', 'label', 'income', 'expenses', 'net'])
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(table.slice(2, 1).to_pylist()[0], {
+            'date': date(2025, 3, 3), 'label': '03 Mar',
+            'income': Decimal('100.00'), 'expenses': Decimal('10.00'), 'net': Decimal('90.00'),
+        })
+
+    def test_arrow_outputs_need_pyarrow(self):
+        # A None entry makes ``import pyarrow`` raise ImportError
+        with mock.patch.dict(sys.modules, {'pyarrow': None}):
+            self.assertFalse(arrow_available())
+            for output in ('parquet', 'arrow'):
+                response = self.export(output=output)
+                self.assertEqual(response.status_code, 501)
+                self.assertIn('pyarrow', response.data['error'])
+            self.assertEqual(self.export().status_code, 200)
+
+    def test_bad_parameters(self):
+        response = self.export(output='xlsx')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'output must be one of: csv, parquet, arrow')
+        self.assertEqual(self.export(dataset='invoices').status_code, 400)
+        self.assertEqual(self.export(start_date='March').status_code, 400)
+
+        self.api.force_authenticate(None)
+        self.assertEqual(self.export().status_code, 401)
+
+
+class SeriesTests(TestCase):
+    """build_series folds daily rows into dense, calendar-aligned buckets"""
+
+    ROWS = [
+        (date(2025, 3, 3), Decimal('100.00'), Decimal('0.00')),
+        (date(2025, 3, 4), Decimal('0.00'), Decimal('40.00')),
+        (date(2025, 3, 4), None, None),
+        (date(2025, 3, 17), Decimal('50.00'), Decimal('10.00')),
+        (date(2025, 4, 2), Decimal('20.00'), Decimal('25.00')),
+    ]
+
+    def summary(self, series):
+        return [(row['date'], row['income'], row['expenses'], row['net']) for row in series]
+
+    def test_parity_with_the_replaced_helpers(self):
+        # What format_daily_data, format_weekly_data and format_monthly_data returned for these rows
+        self.assertEqual(build_series(date(2025, 3, 2), date(2025, 3, 5), 'day', self.ROWS[:3]), [
+            {'date': '2025-03-02', 'label': '02 Mar', 'income': 0, 'expenses': 0, 'net': 0.0},
+            {'date': '2025-03-03', 'label': '03 Mar', 'income': 100.0, 'expenses': 0, 'net': 100.0},
+            {'date': '2025-03-04', 'label': '04 Mar', 'income': 0, 'expenses': 40.0, 'net': -40.0},
+            {'date': '2025-03-05', 'label': '05 Mar', 'income': 0, 'expenses': 0, 'net': 0.0},
+        ])
+        self.assertEqual(build_series(date(2025, 3, 3), date(2025, 4, 6), 'week', self.ROWS), [
+            {'date': '2025-03-03', 'label': 'Week 10 (03 Mar - 09 Mar)', 'income': 100.0, 'expenses': 40.0, 'net': 60.0},
+            {'date': '2025-03-10', 'label': 'Week 11 (10 Mar - 16 Mar)', 'income': 0, 'expenses': 0, 'net': 0.0},
+            {'date': '2025-03-17', 'label': 'Week 12 (17 Mar - 23 Mar)', 'income': 50.0, 'expenses': 10.0, 'net': 40.0},
+            {'date': '2025-03-24', 'label': 'Week 13 (24 Mar - 30 Mar)', 'income': 0, 'expenses': 0, 'net': 0.0},
+            {'date': '2025-03-31', 'label': 'Week 14 (31 Mar - 06 Apr)', 'income': 20.0, 'expenses': 25.0, 'net': -5.0},
+        ])
+        self.assertEqual(build_series(date(2025, 2, 15), date(2025, 4, 30), 'month', self.ROWS), [
+            {'date': '2025-02-01', 'label': 'Feb 2025', 'income': 0, 'expenses': 0, 'net': 0.0},
+            {'date': '2025-03-01', 'label': 'Mar 2025', 'income': 150.0, 'expenses': 50.0, 'net': 100.0},
+            {'date': '2025-04-01', 'label': 'Apr 2025', 'income': 20.0, 'expenses': 25.0, 'net': -5.0},
+        ])
+
+    def test_buckets_are_calendar_aligned(self):
+        # A range starting mid-week begins with the Monday of that week (the old helper dropped those days)
+        weeks = build_series(date(2025, 3, 5), date(2025, 3, 20), 'week', self.ROWS)
+        self.assertEqual(self.summary(weeks), [
+            ('2025-03-03', 100.0, 40.0, 60.0), ('2025-03-10', 0, 0, 0), ('2025-03-17', 50.0, 10.0, 40.0),
+        ])
+        # Across a year end, months and years start on the 1st
+        rows = [(date(2024, 12, 31), Decimal('5.00'), 0), (date(2025, 1, 1), Decimal('7.00'), 0)]
+        self.assertEqual(self.summary(build_series(date(2024, 12, 15), date(2025, 1, 10), 'month', rows)),
+                         [('2024-12-01', 5.0, 0, 5.0), ('2025-01-01', 7.0, 0, 7.0)])
+        self.assertEqual([row['label'] for row in build_series(date(2024, 6, 1), date(2025, 1, 1), 'year', rows)],
+                         ['2024', '2025'])
+
+    def test_empty_buckets_and_rows_outside_the_range(self):
+        self.assertEqual(self.summary(build_series(date(2025, 5, 1), date(2025, 5, 3), 'day', [])),
+                         [('2025-05-01', 0, 0, 0), ('2025-05-02', 0, 0, 0), ('2025-05-03', 0, 0, 0)])
+        # Rows whose bucket lies outside the range are ignored
+        self.assertEqual(self.summary(build_series(date(2025, 3, 4), date(2025, 3, 5), 'day', self.ROWS)),
+                         [('2025-03-04', 0, 40.0, -40.0), ('2025-03-05', 0, 0, 0)])
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class GrowthSeriesTests(TestCase):
+    """Monthly revenue with month-over-month and year-over-year growth and a moving average"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('grower', 'grower@example.com', 'password')
+        client = Client.objects.create(user=self.user, name='Acme')
+        self.today = timezone.now().date()
+        # Paid revenue by month offset from the current month
+        for offset, amount in ((0, '300.00'), (-1, '200.00'), (-2, '100.00'), (-12, '150.00')):
+            day = month_start(self.today, offset)
+            Invoice.objects.create_with_items(
+                [{'description': 'Work', 'quantity': 1, 'unit_price': Decimal(amount)}],
+                user=self.user, client=client, status='paid', issue_date=day, due_date=day
+            )
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def series(self, **params):
+        return self.api.get('/api/analytic/growth-series/', params)
+
+    def test_growth_and_moving_average(self):
+        response = self.series(months=3, window=2)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.data['months'], response.data['window']), (3, 2))
+        rows = response.data['data']
+        self.assertEqual([row['month'] for row in rows],
+                         [f'{month_start(self.today, offset):%Y-%m}' for offset in (-2, -1, 0)])
+        self.assertEqual([row['revenue'] for row in rows], [100.0, 200.0, 300.0])
+        # No revenue the month (or year) before: no base to compare with
+        self.assertEqual([row['mom_growth'] for row in rows], [None, 100.0, 50.0])
+        self.assertEqual([row['yoy_growth'] for row in rows], [None, None, 100.0])
+        self.assertEqual([row['moving_average'] for row in rows], [50.0, 150.0, 250.0])
+
+    def test_defaults(self):
+        response = self.series()
+
+        self.assertEqual((response.data['months'], response.data['window']), (12, 3))
+        self.assertEqual(len(response.data['data']), 12)
+        # Nothing the month after the 150.00 of a year ago
+        self.assertEqual(response.data['data'][0]['mom_growth'], -100.0)
+        self.assertEqual(response.data['data'][-1]['moving_average'], 200.0)
+
+    def test_bad_parameters(self):
+        for params in ({'months': 'twelve'}, {'window': '1.5'}, {'months': 0}, {'months': 61}, {'window': 0},
+                       {'window': 13}):
+            with self.subTest(params=params):
+                self.assertEqual(self.series(**params).status_code, 400)
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class TopExpenseCategoriesTests(TestCase):
+    """Categories past the limit fold into an Others bucket, expenses without a category into Uncategorized"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('spender', 'spender@example.com', 'password')
+        today = timezone.now().date()
+        for name, amounts in (('Rent', ['500.00']), ('Travel', ['100.00', '50.00']), ('Food', ['80.00']),
+                              ('Software', ['30.00']), ('Books', ['10.00', '5.00'])):
+            category = ExpenseCategory.objects.create(user=self.user, name=name)
+            for amount in amounts:
+                Expense.objects.create(user=self.user, category=category, amount=Decimal(amount), date=today)
+        ExpenseCategory.objects.create(user=self.user, name='Unused')
+        Expense.objects.create(user=self.user, amount=Decimal('7.00'), date=today)
+        Expense.objects.create(user=self.user, amount=Decimal('3.00'), date=today)
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_limit_others_and_uncategorized(self):
+        response = self.api.get('/api/analytic/top-expense-categories/', {'limit': 3})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data, [
+            {'category': 'Rent', 'total': 500.0},
+            {'category': 'Travel', 'total': 150.0},
+            {'category': 'Food', 'total': 80.0},
+            {'category': 'Others', 'total': 45.0},
+            {'category': 'Uncategorized', 'total': 10.0},
+        ])
+
+    def test_no_others_within_the_limit(self):
+        rows = self.api.get('/api/analytic/top-expense-categories/', {'limit': 5}).data
+        self.assertEqual([row['category'] for row in rows],
+                         ['Rent', 'Travel', 'Food', 'Software', 'Books', 'Uncategorized'])
+        self.assertEqual(self.api.get('/api/analytic/top-expense-categories/', {'limit': 'x'}).status_code, 400)
+
+    def test_single_grouped_query(self):
+        expenses = Expense.objects.filter(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            rows = get_top_expense_categories(expenses, limit=2)
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('GROUP BY', queries[0]['sql'])
+        self.assertEqual([row['category'] for row in rows], ['Rent', 'Travel', 'Others', 'Uncategorized'])
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class UpcomingPaymentsTests(TestCase):
+    """Upcoming and overdue open invoices, with days until due computed in the database"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('payee', 'payee@example.com', 'password')
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.invoices = {
+            due_in: self.create_invoice(status, due_in)
+            for status, due_in in (('unpaid', 10), ('unpaid', 0), ('unpaid', 3), ('unpaid', 40), ('paid', 5),
+                                   ('overdue', -5), ('unpaid', -2))
+        }
+        InvoicePayment.objects.create(invoice=self.invoices[3], gateway_name='manual', amount=Decimal('25.00'),
+                                      status='completed')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def create_invoice(self, status, due_in):
+        today = timezone.now().date()
+        return Invoice.objects.create_with_items(
+            [{'description': 'Work', 'quantity': 1, 'unit_price': Decimal('100.00')}],
+            user=self.user, client=self.client_obj, status=status, issue_date=today,
+            due_date=today + timedelta(days=due_in)
+        )
+
+    def get(self, **params):
+        response = self.api.get('/api/analytic/upcoming-payments/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_upcoming(self):
+        rows = self.get()
+
+        self.assertEqual([row['days_until_due'] for row in rows], [0, 3, 10])
+        self.assertEqual(rows[1], {
+            'invoice_id': str(self.invoices[3].id),
+            'invoice_number': self.invoices[3].invoice_number,
+            'client_id': str(self.client_obj.id),
+            'client_name': 'Acme',
+            'amount': 100.0,
+            'balance_due': 75.0,
+            'due_date': self.invoices[3].due_date.strftime('%Y-%m-%d'),
+            'days_until_due': 3,
+            'status': 'unpaid',
+        })
+        self.assertEqual([row['days_until_due'] for row in self.get(days=5)], [0, 3])
+
+    def test_overdue(self):
+        # Unpaid invoices the sweep has not reached yet count as overdue too
+        rows = self.get(section='overdue')
+        self.assertEqual([(row['status'], row['days_until_due']) for row in rows], [('overdue', -5), ('unpaid', -2)])
+
+        both = self.get(include_overdue='true', days=5)
+        self.assertEqual([row['days_until_due'] for row in both['upcoming']], [0, 3])
+        self.assertEqual(both['overdue'], rows)
+
+    def test_paging(self):
+        first = self.get(page_size=2)
+        self.assertEqual(first['count'], 3)
+        self.assertEqual([row['days_until_due'] for row in first['results']], [0, 3])
+        self.assertIsNotNone(first['next'])
+
+        last = self.get(page_size=2, page=2)
+        self.assertEqual([row['days_until_due'] for row in last['results']], [10])
+        self.assertIsNone(last['next'])
+        self.assertEqual(self.get(section='overdue', page=1)['count'], 2)
+
+    def test_bad_parameters(self):
+        for params in ({'days': 'soon'}, {'section': 'paid'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.api.get('/api/analytic/upcoming-payments/', params).status_code, 400)
+
+
+def create_dashboard_data(user):
+    """Paid invoices this month and last month, open invoices around today and categorized expenses"""
+    today = timezone.now().date()
+    client = Client.objects.create(user=user, name='Acme')
+    rent = ExpenseCategory.objects.create(user=user, name='Rent')
+    travel = ExpenseCategory.objects.create(user=user, name='Travel')
+    invoices = [
+        ('paid', month_start(today), Decimal('300.00'), 0),
+        ('paid', month_start(today, -1), Decimal('200.00'), 0),
+        ('unpaid', today, Decimal('80.00'), 5),
+        ('unpaid', today, Decimal('60.00'), 20),
+        ('overdue', today - timedelta(days=30), Decimal('40.00'), -10),
+    ]
+    for status, issue_date, amount, due_in in invoices:
+        Invoice.objects.create_with_items(
+            [{'description': 'Work', 'quantity': 1, 'unit_price': amount}],
+            user=user, client=client, status=status, issue_date=issue_date, due_date=today + timedelta(days=due_in)
+        )
+    Expense.objects.create(user=user, category=rent, amount=Decimal('500.00'), date=today)
+    Expense.objects.create(user=user, category=travel, amount=Decimal('50.00'), date=today)
+    Expense.objects.create(user=user, amount=Decimal('20.00'), date=today)
+
+
+@override_settings(ANALYTICS_CACHE_ENABLED=False)
+class DashboardBundleTests(TestCase):
+    """The bundle returns the standalone endpoints' payloads from a fixed number of queries"""
+
+    # Sections and the standalone endpoint answering the same default query
+    STANDALONE = {
+        'income_expenses': '/api/analytic/income-expenses/?range=monthly',
+        'status_breakdown': '/api/analytic/invoice-status-breakdown/',
+        'top_categories': '/api/analytic/top-expense-categories/',
+        'upcoming_payments': '/api/analytic/upcoming-payments/',
+        'growth_rate': '/api/analytic/growth-rate/',
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user('bundler', 'bundler@example.com', 'password')
+        create_dashboard_data(self.user)
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def bundle(self, **params):
+        return self.api.get('/api/analytic/bundle/', params)
+
+    def test_sections_match_the_standalone_endpoints(self):
+        response = self.bundle()
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(set(response.data), set(self.STANDALONE))
+        for section, url in self.STANDALONE.items():
+            standalone = self.api.get(url).data
+            if section == 'status_breakdown':
+                self.assertCountEqual(response.data[section], standalone)
+            else:
+                self.assertEqual(response.data[section], standalone, section)
+        self.assertEqual(response.data['growth_rate']['growth_rate'], 50.0)
+
+    def test_growth_rate_counts_invoices_the_rollups_count(self):
+        # Rollups are the growth source everywhere; a raw invoice scan would miss this change
+        DailyFinancialRollup.objects.filter(user=self.user, day=month_start(timezone.now().date())).update(
+            income=Decimal('400.00')
+        )
+        self.assertEqual(self.bundle(sections='growth_rate').data['growth_rate'],
+                         self.api.get('/api/analytic/growth-rate/').data)
+
+    def test_section_selection_and_validation(self):
+        response = self.bundle(sections='growth_rate, top_categories', limit='1')
+        self.assertEqual(set(response.data), {'growth_rate', 'top_categories'})
+        self.assertEqual([row['category'] for row in response.data['top_categories']], ['Rent', 'Others', 'Uncategorized'])
+
+        response = self.bundle(sections='status_breakdown,charts')
+        self.assertEqual((response.status_code, response.data['error']), (400, 'Unknown sections: charts'))
+        self.assertEqual(self.bundle(limit='many').status_code, 400)
+        self.assertEqual(self.bundle(start_date='2025-13-01', end_date='2025-12-31').status_code, 400)
+        self.assertEqual(self.bundle(range='hourly').status_code, 400)
+
+    def test_query_count_is_fixed(self):
+        # Income/expenses, status breakdown, top categories and upcoming payments are one query each, growth
+        # rate reads the rollups once, and the archive adds one query to each of status and categories
+        with self.assertNumQueries(7):
+            self.bundle()
+
+        create_dashboard_data(self.user)
+        with self.assertNumQueries(7):
+            self.bundle()
+
+
+# Both execution modes side by side, for AsyncModeTests (the project URLs pick one at startup)
+urlpatterns = [
+    path('async/bundle/', async_views.dashboard_bundle),
+    path('async/dashboard/', users_async_views.get_dashboard_data),
+    path('sync/bundle/', DashboardBundleView.as_view()),
+    path('sync/dashboard/', users_views.get_dashboard_data),
+]
+
+
+@override_settings(ASYNC_ANALYTICS_VIEWS=True, ROOT_URLCONF='analytics.tests')
+class AsyncModeTests(TestCase):
+    """The async views answer like the sync ones and share their cache"""
+
+    def setUp(self):
+        get_analytics_cache().clear()
+        self.user = User.objects.create_user('concurrent', 'concurrent@example.com', 'password')
+        create_dashboard_data(self.user)
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def sync_get(self, url, **params):
+        return await sync_to_async(self.client.get)(url, params, headers=self.auth)
+
+    async def test_responses_match_the_sync_views(self):
+        for name, params in (('bundle', {}), ('bundle', {'sections': 'growth_rate,top_categories'}),
+                             ('dashboard', {'range_type': 'last_month'})):
+            with self.subTest(name=name, params=params), self.settings(ANALYTICS_CACHE_ENABLED=False):
+                response = await self.async_client.get(f'/async/{name}/', params, headers=self.auth)
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(response.json(), (await self.sync_get(f'/sync/{name}/', **params)).json())
+
+    async def test_cache_is_shared_with_the_sync_view(self):
+        response = await self.async_client.get('/async/bundle/', headers=self.auth)
+        self.assertEqual(response['X-Analytics-Cache'], 'MISS')
+        self.assertEqual((await self.sync_get('/sync/bundle/'))['X-Analytics-Cache'], 'HIT')
+        self.assertEqual((await self.async_client.get('/async/bundle/', headers=self.auth))['X-Analytics-Cache'], 'HIT')
+
+        response = await self.async_client.get('/async/bundle/', {'sections': 'nope'}, headers=self.auth)
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Unknown sections: nope'}))
+
+    async def test_authentication_and_methods(self):
+        for url in ('/async/bundle/', '/async/dashboard/'):
+            self.assertEqual((await self.async_client.get(url)).status_code, 401)
+            response = await self.async_client.get(url, headers={'Authorization': 'Bearer not-a-token'})
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual((await self.async_client.post(url, headers=self.auth)).status_code, 405)
+
+    async def test_a_failing_task_surfaces_after_the_others_finish(self):
+        finished = []
+
+        def other():
+            finished.append('other')
+            return 'done'
+
+        def broken():
+            raise ValueError('query failed')
+
+        # The concurrent path, with tasks that do not touch the database
+        with mock.patch('analytics.concurrency.can_run_concurrently', return_value=True):
+            self.assertEqual(await run_concurrently({'a': other, 'b': lambda: 2}), {'a': 'done', 'b': 2})
+            with self.assertRaisesMessage(ValueError, 'query failed'):
+                await run_concurrently({'broken': broken, 'other': other})
+        self.assertEqual(finished, ['other', 'other'])
+
+        with self.assertRaisesMessage(ValueError, 'query failed'):
+            await run_concurrently({'broken': broken})
+
+
+class QueryPlanTests(TestCase):
+    """The hot analytics, dashboard and list queries must stay on their indexes.
+
+    Seeds enough rows across several users that the planner prefers an index
+    over a full scan whenever one fits, then checks the plan of each query.
+    Runs against the configured database (SQLite ``EXPLAIN QUERY PLAN`` or
+    Postgres ``EXPLAIN``).
+    """
+    USERS = 4
+    ROWS_PER_USER = 1500
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        statuses = ['paid', 'unpaid', 'overdue']
+        cls.users = []
+        for user_index in range(cls.USERS):
+            user = User.objects.create_user(f'planner{user_index}', f'planner{user_index}@example.com', 'password')
+            client = Client.objects.create(user=user, name=f'Client {user_index}')
+            invoices = Invoice.objects.bulk_create([
+                Invoice(
+                    user=user, client=client, invoice_number=f'PLAN-{index:05d}',
+                    issue_date=today - timedelta(days=index % 730), due_date=today + timedelta(days=index % 90 - 45),
+                    status=statuses[index % 3], subtotal=Decimal('100.00'), total=Decimal('100.00'),
+                    balance_due=Decimal('0.00') if index % 3 == 0 else Decimal('100.00')
+                )
+                for index in range(cls.ROWS_PER_USER)
+            ])
+            Expense.objects.bulk_create([
+                Expense(user=user, amount=Decimal('10.00'), date=today - timedelta(days=index % 730))
+                for index in range(cls.ROWS_PER_USER)
+            ])
+            InvoicePayment.objects.bulk_create([
+                InvoicePayment(invoice=invoice, gateway_name='stripe', amount=invoice.total,
+                               gateway_session_id=f'cs_{user_index}_{index}', gateway_payment_id=f'pi_{user_index}_{index}')
+                for index, invoice in enumerate(invoices[:300])
+            ])
+            cls.users.append(user)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.user = self.users[1]
+        self.today = timezone.now().date()
+
+    def assertUsesIndex(self, queryset, *index_names, ordered=False, seek=None):
+        """Fail if the plan scans the table instead of searching one of ``index_names``.
+
+        ``ordered`` also rejects sorting the rows after fetching them, ``seek``
+        requires the index search to start from a bound on that column.
+        """
+        plan = queryset.explain()
+        if seek:
+            self.assertRegex(plan, rf'\b{seek}\s*[<>]', plan)
+        table = queryset.model._meta.db_table
+        names = '|'.join(index_names)
+
+        if connection.vendor == 'sqlite':
+            self.assertRegex(plan, rf'SEARCH {table} USING (COVERING )?INDEX ({names})\b', plan)
+            self.assertNotRegex(plan, rf'SCAN {table}\b', plan)
+            if ordered:
+                self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+        else:
+            self.assertRegex(plan, rf'Index (Only )?Scan( Backward)? (using|on) ({names})\b', plan)
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+            if ordered:
+                self.assertIsNone(re.search(r'^\s*(->\s+)?(Incremental )?Sort\b', plan, re.MULTILINE), plan)
+
+    def test_analytics_date_range_queries(self):
+        invoices, expenses = get_filtered_data(self.user, self.today - timedelta(days=90), self.today)
+
+        self.assertUsesIndex(invoices, 'invoice_user_status_issue_idx')
+        self.assertUsesIndex(expenses, 'expense_user_date_idx')
+
+    def test_upcoming_and_overdue_payments(self):
+        self.assertUsesIndex(get_upcoming_payments(self.user, 30), 'invoice_unpaid_due_idx', 'invoice_user_status_due_idx')
+        self.assertUsesIndex(get_overdue_payments(self.user), 'invoice_user_status_due_idx', 'invoice_unpaid_due_idx')
+
+    def test_dashboard_period_queries(self):
+        start = timezone.now() - timedelta(days=30)
+        end = timezone.now()
+
+        paid = Invoice.objects.filter(user=self.user, status='paid', created_at__gte=start, created_at__lte=end)
+        self.assertUsesIndex(paid, 'invoice_user_created_idx', 'invoice_user_status_issue_idx')
+        expenses = Expense.objects.filter(user=self.user, created_at__gte=start, created_at__lte=end)
+        self.assertUsesIndex(expenses, 'expense_user_created_idx')
+        recent = Expense.objects.filter(user=self.user, created_at__gte=start).order_by('-created_at')[:5]
+        self.assertUsesIndex(recent, 'expense_user_created_idx', ordered=True)
+
+    def test_list_pages(self):
+        invoices = Invoice.objects.filter(user=self.user).order_by('-created_at', '-id')
+        self.assertUsesIndex(invoices[:10], 'invoice_user_created_idx', ordered=True)
+
+        last = invoices[500]
+        keyset = KeysetPagination(('-created_at', '-id'))
+        deep_page = invoices.filter(keyset.keyset_filter([last.created_at, last.id], reverse=False))[:10]
+        self.assertUsesIndex(deep_page, 'invoice_user_created_idx', ordered=True, seek='created_at')
+
+        expenses = Expense.objects.filter(user=self.user).order_by('-date', '-id')
+        self.assertUsesIndex(expenses[:10], 'expense_user_date_idx', ordered=True)
+
+    def test_payment_lookups(self):
+        invoice = Invoice.objects.filter(user=self.user).first()
+
+        payments = InvoicePayment.objects.filter(invoice=invoice).order_by('-created_at')
+        self.assertUsesIndex(payments, 'payment_invoice_created_idx', ordered=True)
+        self.assertUsesIndex(InvoicePayment.objects.filter(gateway_session_id='cs_1_7'), 'payment_session_id_idx')
+        self.assertUsesIndex(InvoicePayment.objects.filter(gateway_payment_id='pi_1_7'), 'payment_gateway_id_idx')
+
+    def test_outstanding_balances(self):
+        open_invoices = Invoice.objects.filter(OPEN_BALANCE, user=self.user)
+        self.assertUsesIndex(open_invoices.order_by().values('due_date', 'balance_due'), 'invoice_open_balance_idx')
+
+    def test_overdue_sweep(self):
+        candidates = Invoice.objects.filter(status='unpaid', due_date__lt=self.today).order_by('due_date', 'id')
+        self.assertUsesIndex(candidates[:2000], 'invoice_unpaid_due_date_idx', ordered=True, seek='due_date')
+
+    def test_due_recurring_templates(self):
+        client = Client.objects.filter(user=self.user).first()
+        RecurringInvoice.objects.bulk_create([
+            RecurringInvoice(user=self.user, client=client, start_date=self.today,
+                             next_run=self.today + timedelta(days=index % 400 - 30), is_active=index % 4 != 0)
+            for index in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        due = RecurringInvoiceGenerator(today=self.today).due_templates()
+        self.assertUsesIndex(due[:500], 'recurring_due_idx', ordered=True, seek='next_run')
@@ -1,11 +1,18 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     IncomeExpensesView, 
     InvoiceStatusBreakdownView, 
     TopExpenseCategoriesView,
     UpcomingPaymentsView,
-    GrowthRateView
+    AgingReportView,
+    GrowthRateView,
+    GrowthSeriesView,
+    AnalyticsCacheStatsView,
+    DashboardBundleView,
+    AnalyticsExportView
 )
+from . import async_views
 
 
 urlpatterns = [
@@ -16,5 +23,18 @@ urlpatterns = [
     
     # Actionable insights endpoints
     path('upcoming-payments/', UpcomingPaymentsView.as_view(), name='upcoming-payments'),
+    path('aging/', AgingReportView.as_view(), name='aging-report'),
     path('growth-rate/', GrowthRateView.as_view(), name='growth-rate'),
+    path('growth-series/', GrowthSeriesView.as_view(), name='growth-series'),
+    
+    # All dashboard charts in a single request
+    path('bundle/',
+         async_views.dashboard_bundle if settings.ASYNC_ANALYTICS_VIEWS else DashboardBundleView.as_view(),
+         name='dashboard-bundle'),
+    
+    # File downloads (CSV / Parquet / Arrow)
+    path('export/', AnalyticsExportView.as_view(), name='analytics-export'),
+    
+    # Monitoring
+    path('cache-stats/', AnalyticsCacheStatsView.as_view(), name='analytics-cache-stats'),
 ]
\ No newline at end of file
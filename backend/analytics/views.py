@@ -1,16 +1,21 @@
-from django.db.models import Sum, Count, F, Q
-from django.db.models.functions import TruncMonth, TruncYear, TruncDay, TruncWeek
-from django.db.models.functions import ExtractMonth, ExtractYear, ExtractWeek
+from django.db.models import Sum, Count, F, Q, Value, ExpressionWrapper, DateField, DurationField
 from django.utils import timezone
 from datetime import datetime, timedelta
-import pandas as pd
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.pagination import PageNumberPagination
 
-from invoice.models import Invoice
-from expense.models import Expense, ExpenseCategory
+from archive.services import archived_category_totals, archived_invoice_totals, merge_category_totals
+from invoice.models import OPEN_BALANCE, Invoice
+from expense.models import Expense
+from .services import get_rollups, get_monthly_revenue, month_start
+from .series import build_series
+from .cache import cached_analytics_response, get_cache_stats
+from .export import (
+    EXPORT_DATASETS, EXPORT_OUTPUTS, arrow_available, export_response, iter_series_rows, iter_category_rows
+)
 
 
 # Utility functions for analytics
@@ -80,275 +85,167 @@ def get_filtered_data(user, start_date, end_date):
     return invoices, expenses
 
 
-def group_by_day(invoices, expenses):
-    """Group financial data by day"""
-    invoice_data = (
-        invoices
-        .values('issue_date')
-        .annotate(total=Sum('total'))
-        .order_by('issue_date')
-    )
+def get_upcoming_payments(user, days=30):
+    """Get upcoming payments due within specified days"""
+    today = timezone.now().date()
+    end_date = today + timedelta(days=days)
     
-    expense_data = (
-        expenses
-        .values('date')
-        .annotate(total=Sum('amount'))
-        .order_by('date')
-    )
+    # Get unpaid invoices due within the specified period
+    upcoming_invoices = Invoice.objects.filter(
+        user=user,
+        status='unpaid',  # Only unpaid invoices
+        due_date__gte=today,  # Due date is today or later
+        due_date__lte=end_date  # Due date is within the specified period
+    ).order_by('due_date', 'id')  # Order by due date (ascending)
     
-    return invoice_data, expense_data
+    return upcoming_invoices
 
 
-def group_by_week(invoices, expenses):
-    """Group financial data by week"""
-    invoice_data = (
-        invoices
-        .annotate(
-            year=ExtractYear('issue_date'),
-            week=ExtractWeek('issue_date')
-        )
-        .values('year', 'week')
-        .annotate(total=Sum('total'))
-        .order_by('year', 'week')
-    )
-    
-    expense_data = (
-        expenses
-        .annotate(
-            year=ExtractYear('date'),
-            week=ExtractWeek('date')
-        )
-        .values('year', 'week')
-        .annotate(total=Sum('amount'))
-        .order_by('year', 'week')
-    )
+def get_overdue_payments(user):
+    """Get open invoices whose due date has already passed"""
+    today = timezone.now().date()
     
-    return invoice_data, expense_data
+    return Invoice.objects.filter(
+        user=user,
+        status__in=['unpaid', 'overdue'],
+        due_date__lt=today
+    ).order_by('due_date', 'id')
 
 
-def group_by_month(invoices, expenses):
-    """Group financial data by month"""
-    invoice_data = (
-        invoices
-        .annotate(month=TruncMonth('issue_date'))
-        .values('month')
-        .annotate(total=Sum('total'))
-        .order_by('month')
-    )
-    
-    expense_data = (
-        expenses
-        .annotate(month=TruncMonth('date'))
-        .values('month')
-        .annotate(total=Sum('amount'))
-        .order_by('month')
-    )
-    
-    return invoice_data, expense_data
-
+def project_payments(invoices):
+    """Narrow an invoice queryset to the columns the payments widgets need.
 
-def group_by_year(invoices, expenses):
-    """Group financial data by year"""
-    invoice_data = (
-        invoices
-        .annotate(year=TruncYear('issue_date'))
-        .values('year')
-        .annotate(total=Sum('total'))
-        .order_by('year')
-    )
+    Joins the client name and computes days until due in the database, so no
+    model instances or client serializers are built per row.
+    """
+    today = timezone.now().date()
     
-    expense_data = (
-        expenses
-        .annotate(year=TruncYear('date'))
-        .values('year')
-        .annotate(total=Sum('amount'))
-        .order_by('year')
+    return invoices.annotate(
+        client_name=F('client__name'),
+        days_until_due=ExpressionWrapper(F('due_date') - Value(today, output_field=DateField()),
+                                         output_field=DurationField())
+    ).values(
+        'id', 'invoice_number', 'client_id', 'client_name', 'total', 'balance_due', 'due_date', 'days_until_due',
+        'status'
     )
-    
-    return invoice_data, expense_data
-
-
-def format_daily_data(start_date, end_date, invoice_data, expense_data):
-    """Format data for daily view"""
-    # Generate date range
-    date_range = []
-    current_date = start_date
-    while current_date <= end_date:
-        date_range.append(current_date)
-        current_date = current_date + timedelta(days=1)
-    
-    # Format results
-    result = []
-    for date in date_range:
-        date_str = date.strftime('%Y-%m-%d')
-        
-        # Find income for this day
-        income = next((item['total'] for item in invoice_data if item['issue_date'] == date), 0)
-        
-        # Find expenses for this day
-        expense = next((item['total'] for item in expense_data if item['date'] == date), 0)
-        
-        result.append({
-            'date': date_str,
-            'label': date.strftime('%d %b'),
-            'income': float(income) if income else 0,
-            'expenses': float(expense) if expense else 0,
-            'net': float(income - expense) if income and expense else float(income or 0) - float(expense or 0)
-        })
-    
-    return result
 
 
-def format_weekly_data(start_date, end_date, invoice_data, expense_data):
-    """Format data for weekly view"""
-    # Generate week range
-    date_range = pd.date_range(start=start_date, end=end_date, freq='W-MON')
-    
-    # Format results
-    result = []
-    for date in date_range:
-        date_obj = date.date()
-        year = date_obj.year
-        week = date_obj.isocalendar()[1]
-        
-        # Find income for this week
-        income = next((item['total'] for item in invoice_data if item['year'] == year and item['week'] == week), 0)
-        
-        # Find expenses for this week
-        expense = next((item['total'] for item in expense_data if item['year'] == year and item['week'] == week), 0)
-        
-        # Calculate week end date (Sunday)
-        week_end = date_obj + timedelta(days=6)
-        
-        result.append({
-            'date': date_obj.strftime('%Y-%m-%d'),
-            'label': f"Week {week} ({date_obj.strftime('%d %b')} - {week_end.strftime('%d %b')})",
-            'income': float(income) if income else 0,
-            'expenses': float(expense) if expense else 0,
-            'net': float(income - expense) if income and expense else float(income or 0) - float(expense or 0)
-        })
-    
-    return result
-
-
-def format_monthly_data(start_date, end_date, invoice_data, expense_data):
-    """Format data for monthly view"""
-    # Generate month range
-    months_range = []
-    current_date = start_date.replace(day=1)
-    while current_date <= end_date:
-        months_range.append(current_date)
-        # Move to next month
-        if current_date.month == 12:
-            current_date = current_date.replace(year=current_date.year + 1, month=1)
+def format_upcoming_payments(payment_rows):
+    """Format projected invoice rows for the upcoming payments chart"""
+    return [
+        {
+            'invoice_id': str(row['id']),
+            'invoice_number': row['invoice_number'],
+            'client_id': str(row['client_id']),
+            'client_name': row['client_name'],
+            'amount': float(row['total']),
+            'balance_due': float(row['balance_due']),
+            'due_date': row['due_date'].strftime('%Y-%m-%d'),
+            'days_until_due': row['days_until_due'].days,
+            'status': row['status']
+        }
+        for row in payment_rows
+    ]
+
+
+# (name, first, last day past due); "current" is not due yet
+AGING_BUCKETS = (
+    ('current', None, 0),
+    ('1-30', 1, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None),
+)
+
+
+def build_aging_report(user):
+    """Outstanding balance by days past due.
+
+    One conditional aggregate over the open invoices (``OPEN_BALANCE``: paid
+    invoices are settled whatever they recorded); ``balance_due`` is kept up
+    to date from the payments, so this reads ``invoice_open_balance_idx``
+    only and never joins or sums payments.
+    """
+    today = timezone.now().date()
+    aggregates = {}
+    for name, first_day, last_day in AGING_BUCKETS:
+        if first_day is None:
+            bucket = Q(due_date__gte=today)
         else:
-            current_date = current_date.replace(month=current_date.month + 1)
-    
-    # Format results
-    result = []
-    for month_date in months_range:
-        month_str = month_date.strftime('%Y-%m')
-        month_name = month_date.strftime('%b %Y')
-        
-        # Find income for this month
-        income = next((item['total'] for item in invoice_data if item['month'].strftime('%Y-%m') == month_str), 0)
-        
-        # Find expenses for this month
-        expense = next((item['total'] for item in expense_data if item['month'].strftime('%Y-%m') == month_str), 0)
-        
-        result.append({
-            'date': month_date.strftime('%Y-%m-%d'),
-            'label': month_name,
-            'income': float(income) if income else 0,
-            'expenses': float(expense) if expense else 0,
-            'net': float(income - expense) if income and expense else float(income or 0) - float(expense or 0)
-        })
-    
-    return result
+            bucket = Q(due_date__lte=today - timedelta(days=first_day))
+            if last_day is not None:
+                bucket &= Q(due_date__gte=today - timedelta(days=last_day))
+        aggregates[f'{name}_amount'] = Sum('balance_due', filter=bucket)
+        aggregates[f'{name}_count'] = Count('id', filter=bucket)
+    
+    totals = Invoice.objects.filter(OPEN_BALANCE, user=user).aggregate(**aggregates)
+    
+    buckets = [
+        {
+            'bucket': name,
+            'count': totals[f'{name}_count'],
+            'amount': float(totals[f'{name}_amount'] or 0)
+        }
+        for name, _, _ in AGING_BUCKETS
+    ]
+    return {
+        'as_of': today.strftime('%Y-%m-%d'),
+        'total_outstanding': round(sum(bucket['amount'] for bucket in buckets), 2),
+        'overdue': round(sum(bucket['amount'] for bucket in buckets[1:]), 2),
+        'invoice_count': sum(bucket['count'] for bucket in buckets),
+        'buckets': buckets
+    }
 
 
-def format_yearly_data(start_date, end_date, invoice_data, expense_data):
-    """Format data for yearly view"""
-    # Generate year range
-    start_year = start_date.year
-    end_year = end_date.year
-    years_range = []
+def build_income_expenses(user, range_type=None, custom_start=None, custom_end=None):
+    """Income vs. expenses payload; returns (data, error)"""
+    # Get date range and grouping type
+    start_date, end_date, group_by, error = get_date_range(range_type, custom_start, custom_end)
+    if error:
+        return None, error
     
-    for year in range(start_year, end_year + 1):
-        years_range.append(datetime(year, 1, 1).date())
+    # Read the pre-aggregated daily rollups instead of raw invoices/expenses
+    rollups = get_rollups(user, start_date, end_date).values_list('day', 'income', 'expenses')
     
-    # Format results
-    result = []
-    for year_date in years_range:
-        year_str = year_date.strftime('%Y')
-        
-        # Find income for this year
-        income = next((item['total'] for item in invoice_data if item['year'].strftime('%Y') == year_str), 0)
-        
-        # Find expenses for this year
-        expense = next((item['total'] for item in expense_data if item['year'].strftime('%Y') == year_str), 0)
-        
-        result.append({
-            'date': f"{year_str}-01-01",
-            'label': year_str,
-            'income': float(income) if income else 0,
-            'expenses': float(expense) if expense else 0,
-            'net': float(income - expense) if income and expense else float(income or 0) - float(expense or 0)
-        })
+    # Fold the daily rows into day/week/month/year buckets in one pass
+    result = build_series(start_date, end_date, group_by, rollups)
     
-    return result
+    return {
+        'range_type': range_type if range_type else group_by,
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'data': result
+    }, None
 
 
-def get_upcoming_payments(user, days=30):
-    """Get upcoming payments due within specified days"""
-    today = timezone.now().date()
-    end_date = today + timedelta(days=days)
-    
-    # Get unpaid invoices due within the specified period
-    upcoming_invoices = Invoice.objects.filter(
-        user=user,
-        status='unpaid',  # Only unpaid invoices
-        due_date__gte=today,  # Due date is today or later
-        due_date__lte=end_date  # Due date is within the specified period
-    ).order_by('due_date')  # Order by due date (ascending)
-    
-    return upcoming_invoices
+def percentage_change(current, previous):
+    """Percentage change from previous to current, None when there is no base to compare with"""
+    if not previous:
+        return None
+    return round(float((current - previous) / previous * 100), 2)
 
 
 def calculate_growth_rate(user, months=1):
     """Calculate month-over-month growth rate for revenue"""
     today = timezone.now().date()
     
-    # Calculate current month start and end
-    current_month_start = today.replace(day=1)
-    if today.month == 12:
-        next_month = today.replace(year=today.year + 1, month=1, day=1)
-    else:
-        next_month = today.replace(month=today.month + 1, day=1)
-    current_month_end = next_month - timedelta(days=1)
+    # Compare the current calendar month with the one `months` before it
+    current_month_start = month_start(today)
+    previous_month_start = month_start(today, -months)
     
-    # Calculate previous month start and end
-    if current_month_start.month == 1:
-        previous_month_start = current_month_start.replace(year=current_month_start.year - 1, month=12)
-    else:
-        previous_month_start = current_month_start.replace(month=current_month_start.month - 1)
-    previous_month_end = current_month_start - timedelta(days=1)
+    # Paid revenue for both months, read from issue_date ranges (year aware)
+    revenue = get_monthly_revenue(user.id, [current_month_start, previous_month_start])
     
-    # Get total revenue for current month (paid invoices only)
-    current_month_revenue = Invoice.objects.filter(
-        user=user,
-        status='paid',
-        issue_date__month=current_month_start.month
-    ).aggregate(total=Sum('total'))['total'] or 0
+    return format_growth_rate(
+        revenue[current_month_start], revenue[previous_month_start],
+        current_month_start, previous_month_start
+    )
 
-    
-    
-    # Get total revenue for previous month (paid invoices only)
-    previous_month_revenue = Invoice.objects.filter(
-        user=user,
-        status='paid',
-        issue_date__month=previous_month_start.month
-    ).aggregate(total=Sum('total'))['total'] or 0
+
+def format_growth_rate(current_month_revenue, previous_month_revenue, current_month_start, previous_month_start):
+    """Growth rate payload shared by the growth-rate endpoint and the dashboard bundle"""
+    current_month_revenue = current_month_revenue or 0
+    previous_month_revenue = previous_month_revenue or 0
     
     # Calculate growth rate
     if previous_month_revenue > 0:
@@ -368,6 +265,236 @@ def calculate_growth_rate(user, months=1):
     }
 
 
+def build_growth_series(user, months=12, window=3):
+    """Rolling monthly revenue series with MoM/YoY growth and a moving average.
+
+    The 12 months before the first reported month are loaded as well so that
+    year-over-year growth and the moving average are defined from the start.
+    """
+    today = timezone.now().date()
+    first_month = month_start(today, -(months - 1))
+    history_start = month_start(first_month, -12)
+    
+    all_months = []
+    current = history_start
+    while current <= today:
+        all_months.append(current)
+        current = month_start(current, 1)
+    
+    revenue = get_monthly_revenue(user.id, all_months)
+    values = [revenue[month] for month in all_months]
+    
+    result = []
+    for position in range(12, len(all_months)):
+        month = all_months[position]
+        window_values = values[position - window + 1:position + 1]
+        result.append({
+            'month': month.strftime('%Y-%m'),
+            'label': month.strftime('%b %Y'),
+            'revenue': float(values[position]),
+            'mom_growth': percentage_change(values[position], values[position - 1]),
+            'yoy_growth': percentage_change(values[position], values[position - 12]),
+            'moving_average': round(float(sum(window_values) / len(window_values)), 2)
+        })
+    
+    return result
+
+
+def get_top_expense_categories(expenses, limit=5, archived_rows=()):
+    """Top categories by total plus "Others" and "Uncategorized" buckets.
+
+    Uses a single GROUP BY over the expenses; categories are ranked by total
+    and everything past ``limit`` is folded into "Others". Expenses without a
+    category (category deleted or never set) are reported as "Uncategorized".
+    ``archived_rows`` (``archived_category_totals``) are added to the totals.
+    """
+    category_rows = (
+        expenses
+        .values('category_id', 'category__name')
+        .annotate(total=Sum('amount'))
+        .order_by('-total', 'category__name')
+    )
+    category_rows = merge_category_totals(category_rows, archived_rows)
+    
+    category_totals = []
+    uncategorized_total = 0
+    for row in category_rows:
+        if row['category_id'] is None:
+            uncategorized_total = row['total'] or 0
+        elif row['total'] and row['total'] > 0:  # Only include categories with expenses
+            category_totals.append({
+                'category': row['category__name'],
+                'total': float(row['total'])
+            })
+    
+    top_categories = category_totals[:limit]
+    
+    # Calculate "Others" category if there are more than the limit
+    if len(category_totals) > limit:
+        others_total = sum(item['total'] for item in category_totals[limit:])
+        top_categories.append({
+            'category': 'Others',
+            'total': float(others_total)
+        })
+    
+    if uncategorized_total > 0:
+        top_categories.append({
+            'category': 'Uncategorized',
+            'total': float(uncategorized_total)
+        })
+    
+    return top_categories
+
+
+BUNDLE_SECTIONS = ('income_expenses', 'status_breakdown', 'top_categories', 'upcoming_payments', 'growth_rate')
+
+
+def add_archived_invoices(status_breakdown, user, start_date=None, end_date=None):
+    """Count the archived invoices of the range (all paid) in the "paid" entry of a status breakdown"""
+    count, total = archived_invoice_totals(user.id, start_date, end_date)
+    if not count:
+        return status_breakdown
+    paid = next((entry for entry in status_breakdown if entry['status'] == 'paid'), None)
+    if paid is None:
+        paid = {'status': 'paid', 'count': 0, 'total': 0}
+        status_breakdown.insert(0, paid)
+    paid['count'] += count
+    paid['total'] += float(total or 0)
+    return status_breakdown
+
+
+def aggregate_status_breakdown(user, start_date=None, end_date=None):
+    """Invoice count and total per status from one invoice scan.
+
+    Uses conditional aggregation (``Sum(..., filter=Q(...))``) so every status
+    bucket comes back from a single query. The optional date range filters on
+    the issue date.
+    """
+    breakdown_filter = Q()
+    if start_date and end_date:
+        breakdown_filter = Q(issue_date__gte=start_date, issue_date__lte=end_date)
+    
+    aggregates = {}
+    for status_value, _ in Invoice.STATUS_CHOICES:
+        status_filter = breakdown_filter & Q(status=status_value)
+        aggregates[f'{status_value}_count'] = Count('id', filter=status_filter)
+        aggregates[f'{status_value}_total'] = Sum('total', filter=status_filter)
+    
+    totals = Invoice.objects.filter(user=user).aggregate(**aggregates)
+    
+    status_breakdown = [
+        {
+            'status': status_value,
+            'count': totals[f'{status_value}_count'],
+            'total': float(totals[f'{status_value}_total'] or 0)
+        }
+        for status_value, _ in Invoice.STATUS_CHOICES
+        if totals[f'{status_value}_count']
+    ]
+    return add_archived_invoices(status_breakdown, user, start_date, end_date)
+
+
+def parse_bundle_params(query_params):
+    """Validate the dashboard bundle query parameters; returns (params, error)"""
+    sections = query_params.get('sections')
+    sections = [section.strip() for section in sections.split(',') if section.strip()] if sections else list(BUNDLE_SECTIONS)
+    unknown = [section for section in sections if section not in BUNDLE_SECTIONS]
+    if unknown:
+        return None, f"Unknown sections: {', '.join(unknown)}"
+    
+    custom_start = query_params.get('start_date', None)
+    custom_end = query_params.get('end_date', None)
+    try:
+        limit = max(int(query_params.get('limit', 5)), 0)
+        days = int(query_params.get('days', 30))
+    except ValueError:
+        return None, 'limit and days must be integers'
+    
+    start_date = end_date = None
+    if custom_start and custom_end:
+        try:
+            start_date = datetime.strptime(custom_start, '%Y-%m-%d').date()
+            end_date = datetime.strptime(custom_end, '%Y-%m-%d').date()
+        except ValueError:
+            return None, 'Invalid date format. Use YYYY-MM-DD.'
+    
+    return {
+        'sections': sections,
+        'range_type': query_params.get('range', 'monthly'),
+        'custom_start': custom_start,
+        'custom_end': custom_end,
+        'start_date': start_date,
+        'end_date': end_date,
+        'limit': limit,
+        'days': days,
+    }, None
+
+
+def bundle_tasks(user, params):
+    """Independent queries needed for the requested bundle sections.
+
+    Returns a dict of name -> zero argument callable. The callables share no
+    state, so the sync view runs them one after another and the async view
+    runs them concurrently.
+    """
+    sections = params['sections']
+    start_date, end_date = params['start_date'], params['end_date']
+    tasks = {}
+    
+    if 'income_expenses' in sections:
+        tasks['income_expenses'] = lambda: build_income_expenses(
+            user, params['range_type'], params['custom_start'], params['custom_end']
+        )
+    
+    if 'status_breakdown' in sections:
+        tasks['status_breakdown'] = lambda: aggregate_status_breakdown(user, start_date, end_date)
+    
+    # Read from the rollups like the growth-rate endpoint, so the two never disagree
+    if 'growth_rate' in sections:
+        tasks['growth_rate'] = lambda: calculate_growth_rate(user)
+    
+    if 'top_categories' in sections:
+        def top_categories():
+            expenses = Expense.objects.filter(user=user)
+            if start_date and end_date:
+                expenses = expenses.filter(date__gte=start_date, date__lte=end_date)
+            return get_top_expense_categories(
+                expenses, params['limit'], archived_category_totals(user.id, start_date, end_date)
+            )
+        tasks['top_categories'] = top_categories
+    
+    if 'upcoming_payments' in sections:
+        tasks['upcoming_payments'] = lambda: format_upcoming_payments(
+            project_payments(get_upcoming_payments(user, params['days']))
+        )
+    
+    return tasks
+
+
+def assemble_bundle(sections, results):
+    """Build the bundle payload from the task results; returns (result, error)"""
+    result = {}
+    
+    if 'income_expenses' in sections:
+        data, error = results['income_expenses']
+        if error:
+            return None, error
+        result['income_expenses'] = data
+    
+    for section in ('status_breakdown', 'top_categories', 'upcoming_payments', 'growth_rate'):
+        if section in sections:
+            result[section] = results[section]
+    
+    return result, None
+
+
+class PaymentsPagination(PageNumberPagination):
+    """Pagination for the upcoming/overdue payments lists"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
 class BaseAnalyticsView(APIView):
     """Base class for analytics views"""
     permission_classes = [IsAuthenticated]
@@ -385,40 +512,18 @@ class BaseAnalyticsView(APIView):
 class IncomeExpensesView(BaseAnalyticsView):
     """API endpoint for Income vs. Expenses chart with flexible date ranges"""
     
+    @cached_analytics_response
     def get(self, request, format=None):
         # Get query parameters
         range_type = request.query_params.get('range')
         custom_start = request.query_params.get('start_date', None)
         custom_end = request.query_params.get('end_date', None)
         
-        # Get date range and grouping type
-        start_date, end_date, group_by, error = get_date_range(range_type, custom_start, custom_end)
+        data, error = build_income_expenses(request.user, range_type, custom_start, custom_end)
         if error:
             return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get filtered data
-        invoices, expenses = get_filtered_data(request.user, start_date, end_date)
-        
-        # Group data based on grouping type
-        if group_by == 'day':
-            invoice_data, expense_data = group_by_day(invoices, expenses)
-            result = format_daily_data(start_date, end_date, invoice_data, expense_data)
-        elif group_by == 'week':
-            invoice_data, expense_data = group_by_week(invoices, expenses)
-            result = format_weekly_data(start_date, end_date, invoice_data, expense_data)
-        elif group_by == 'month':
-            invoice_data, expense_data = group_by_month(invoices, expenses)
-            result = format_monthly_data(start_date, end_date, invoice_data, expense_data)
-        elif group_by == 'year':
-            invoice_data, expense_data = group_by_year(invoices, expenses)
-            result = format_yearly_data(start_date, end_date, invoice_data, expense_data)
-        
-        return Response({
-            'range_type': range_type if range_type else group_by,
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d'),
-            'data': result
-        })
+        return Response(data)
 
 
 
@@ -427,12 +532,14 @@ class IncomeExpensesView(BaseAnalyticsView):
 class InvoiceStatusBreakdownView(BaseAnalyticsView):
     """API endpoint for Invoice Status Breakdown chart"""
     
+    @cached_analytics_response
     def get(self, request, format=None):
         # Get query parameters for optional date filtering
         custom_start = request.query_params.get('start_date', None)
         custom_end = request.query_params.get('end_date', None)
         
         # Get date range if specified
+        start_date = end_date = None
         if custom_start and custom_end:
             try:
                 start_date = datetime.strptime(custom_start, '%Y-%m-%d').date()
@@ -455,6 +562,7 @@ class InvoiceStatusBreakdownView(BaseAnalyticsView):
                 'count': status_data['count'],
                 'total': float(status_data['total']) if status_data['total'] else 0
             })
+        add_archived_invoices(result, request.user, start_date, end_date)
         
         return Response(result)
 
@@ -462,13 +570,18 @@ class InvoiceStatusBreakdownView(BaseAnalyticsView):
 class TopExpenseCategoriesView(BaseAnalyticsView):
     """API endpoint for Top 5 Expense Categories chart"""
     
+    @cached_analytics_response
     def get(self, request, format=None):
         # Get query parameters
-        limit = int(request.query_params.get('limit', 5))  # Default to top 5
+        try:
+            limit = max(int(request.query_params.get('limit', 5)), 0)  # Default to top 5
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
         custom_start = request.query_params.get('start_date', None)
         custom_end = request.query_params.get('end_date', None)
         
         # Get date range if specified
+        start_date = end_date = None
         if custom_start and custom_end:
             try:
                 start_date = datetime.strptime(custom_start, '%Y-%m-%d').date()
@@ -480,76 +593,165 @@ class TopExpenseCategoriesView(BaseAnalyticsView):
             # Get all expenses for the user
             expenses = Expense.objects.filter(user=request.user)
         
-        # Get user's expense categories
-        categories = ExpenseCategory.objects.filter(user=request.user)
-        
-        # Calculate total for each category within the date range
-        category_totals = []
-        for category in categories:
-            total = expenses.filter(category=category).aggregate(total=Sum('amount'))['total'] or 0
-            
-            if total > 0:  # Only include categories with expenses
-                category_totals.append({
-                    'category': category.name,
-                    'total': float(total)
-                })
-        
-        # Sort by total (descending) and limit
-        category_totals.sort(key=lambda x: x['total'], reverse=True)
-        top_categories = category_totals[:limit]
-        
-        # Calculate "Others" category if there are more than the limit
-        if len(category_totals) > limit:
-            others_total = sum(item['total'] for item in category_totals[limit:])
-            top_categories.append({
-                'category': 'Others',
-                'total': float(others_total)
-            })
+        top_categories = get_top_expense_categories(
+            expenses, limit, archived_category_totals(request.user.id, start_date, end_date)
+        )
         
         return Response(top_categories)
 
 
 class UpcomingPaymentsView(BaseAnalyticsView):
-    """API endpoint for Upcoming Payments Due"""
+    """API endpoint for Upcoming Payments Due
+    
+    Query parameters:
+    - days: look-ahead window (default 30)
+    - section: 'upcoming' (default) or 'overdue'
+    - include_overdue: 'true' to return both sections as {'upcoming': [...], 'overdue': [...]}
+    - page / page_size: return the selected section as a paginated envelope
+    """
     
+    @cached_analytics_response
     def get(self, request, format=None):
         # Get query parameters
-        days = int(request.query_params.get('days', 30))  # Default to next 30 days
-        
-        # Get upcoming payments
-        upcoming_invoices = get_upcoming_payments(request.user, days)
-        
-        # Format response data
-        from clients.serializers import ClientSerializer
+        try:
+            days = int(request.query_params.get('days', 30))  # Default to next 30 days
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        section = request.query_params.get('section', 'upcoming')
+        if section not in ('upcoming', 'overdue'):
+            return Response({'error': "section must be 'upcoming' or 'overdue'"}, status=status.HTTP_400_BAD_REQUEST)
         
-        result = []
-        for invoice in upcoming_invoices:
-            # Get client details
-            client_data = ClientSerializer(invoice.client).data
-            
-            # Calculate days until due
-            today = timezone.now().date()
-            days_until_due = (invoice.due_date - today).days
-            
-            result.append({
-                'invoice_id': str(invoice.id),
-                'invoice_number': invoice.invoice_number,
-                'client_id': str(invoice.client.id),
-                'client_name': client_data['name'],
-                'amount': float(invoice.total),
-                'due_date': invoice.due_date.strftime('%Y-%m-%d'),
-                'days_until_due': days_until_due,
-                'status': invoice.status
+        if section == 'overdue':
+            invoices = get_overdue_payments(request.user)
+        else:
+            invoices = get_upcoming_payments(request.user, days)
+        payment_rows = project_payments(invoices)
+        
+        # Page through large sets of open invoices when asked to
+        if 'page' in request.query_params or 'page_size' in request.query_params:
+            paginator = PaymentsPagination()
+            page = paginator.paginate_queryset(payment_rows, request, view=self)
+            return paginator.get_paginated_response(format_upcoming_payments(page))
+        
+        if request.query_params.get('include_overdue') == 'true':
+            return Response({
+                'upcoming': format_upcoming_payments(project_payments(get_upcoming_payments(request.user, days))),
+                'overdue': format_upcoming_payments(project_payments(get_overdue_payments(request.user)))
             })
         
-        return Response(result)
+        return Response(format_upcoming_payments(payment_rows))
+
+
+class AgingReportView(BaseAnalyticsView):
+    """API endpoint for outstanding balances by days past due"""
+    
+    @cached_analytics_response
+    def get(self, request, format=None):
+        return Response(build_aging_report(request.user))
 
 
 class GrowthRateView(BaseAnalyticsView):
     """API endpoint for Month-over-Month Growth Rate"""
     
+    @cached_analytics_response
     def get(self, request, format=None):
         # Calculate growth rate
         growth_data = calculate_growth_rate(request.user)
         
         return Response(growth_data)
+
+
+class GrowthSeriesView(BaseAnalyticsView):
+    """API endpoint for a rolling monthly revenue growth series"""
+    
+    @cached_analytics_response
+    def get(self, request, format=None):
+        # Get query parameters
+        try:
+            months = int(request.query_params.get('months', 12))  # Default to last 12 months
+            window = int(request.query_params.get('window', 3))  # Default to a 3 month moving average
+        except ValueError:
+            return Response({'error': 'months and window must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not 1 <= months <= 60 or not 1 <= window <= 12:
+            return Response({'error': 'months must be between 1 and 60 and window between 1 and 12'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'months': months,
+            'window': window,
+            'data': build_growth_series(request.user, months, window)
+        })
+
+
+class AnalyticsExportView(BaseAnalyticsView):
+    """API endpoint streaming analytics data as a file download
+    
+    Query parameters:
+    - dataset: series (income/expenses/net per bucket, default) or categories
+    - output: csv (default), parquet or arrow; parquet/arrow need pyarrow
+    - range, start_date, end_date: as for income-expenses, which also picks
+      the series grouping
+    """
+    
+    def get(self, request, format=None):
+        dataset = request.query_params.get('dataset', 'series')
+        output = request.query_params.get('output', 'csv')
+        if dataset not in EXPORT_DATASETS:
+            return Response({'error': f"dataset must be one of: {', '.join(EXPORT_DATASETS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if output not in EXPORT_OUTPUTS:
+            return Response({'error': f"output must be one of: {', '.join(EXPORT_OUTPUTS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if output != 'csv' and not arrow_available():
+            return Response({'error': f'{output} export is not available on this server (pyarrow is not installed)'},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+        
+        start_date, end_date, group_by, error = get_date_range(
+            request.query_params.get('range', 'monthly'),
+            request.query_params.get('start_date', None),
+            request.query_params.get('end_date', None)
+        )
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if dataset == 'series':
+            rows = iter_series_rows(request.user, start_date, end_date, group_by)
+        else:
+            rows = iter_category_rows(request.user, start_date, end_date)
+        
+        filename = f'{dataset}-{start_date:%Y%m%d}-{end_date:%Y%m%d}'
+        return export_response(dataset, output, rows, filename)
+
+
+class AnalyticsCacheStatsView(APIView):
+    """API endpoint exposing analytics cache hit/miss counters (staff only)"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, format=None):
+        return Response(get_cache_stats())
+
+
+class DashboardBundleView(BaseAnalyticsView):
+    """API endpoint returning every dashboard chart in one response
+    
+    Query parameters:
+    - sections: comma separated subset of BUNDLE_SECTIONS (default: all)
+    - range, start_date, end_date: as for income-expenses (start_date/end_date
+      also filter the status breakdown and top categories)
+    - limit: number of top expense categories (default 5)
+    - days: look-ahead window for upcoming payments (default 30)
+    """
+    
+    @cached_analytics_response
+    def get(self, request, format=None):
+        params, error = parse_bundle_params(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = {name: task() for name, task in bundle_tasks(request.user, params).items()}
+        
+        result, error = assemble_bundle(params['sections'], results)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
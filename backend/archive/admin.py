@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import ArchivedExpense, ArchivedInvoice, ArchivedYear
+
+
+@admin.register(ArchivedYear)
+class ArchivedYearAdmin(admin.ModelAdmin):
+    list_display = ('year', 'invoice_count', 'expense_count', 'archived_at')
+
+
+@admin.register(ArchivedInvoice)
+class ArchivedInvoiceAdmin(admin.ModelAdmin):
+    list_display = ('invoice_number', 'user', 'client_name', 'issue_date', 'total')
+    list_filter = ('issue_date',)
+    search_fields = ('invoice_number', 'client_name', 'user__username')
+    exclude = ('data',)
+
+
+@admin.register(ArchivedExpense)
+class ArchivedExpenseAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'category', 'amount', 'date')
+    list_filter = ('date',)
+    search_fields = ('user__username',)
+    exclude = ('data',)
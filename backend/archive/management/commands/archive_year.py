@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from archive.services import ARCHIVE_CHUNK_SIZE, archive_year, restore_year
+
+
+class Command(BaseCommand):
+    help = 'Move the paid invoices and the expenses of closed years to the archive tables (or restore them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('years', type=int, nargs='+', help='Years to archive, e.g. 2022 2023')
+        parser.add_argument('--restore', action='store_true', help='Move the archived rows back instead')
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE,
+                            help='Rows moved per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        action = restore_year if options['restore'] else archive_year
+        verb = 'Restored' if options['restore'] else 'Archived'
+
+        for year in options['years']:
+            started = time.monotonic()
+            try:
+                moved = action(year, chunk_size=chunk_size)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"{verb} {year}: {moved['invoices']} invoices, {moved['expenses']} expenses "
+                f"({time.monotonic() - started:.2f}s)"
+            ))
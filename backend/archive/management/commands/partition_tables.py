@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from archive.partitioning import (
+    PARTITIONABLE, add_year_partitions, is_partitioned, partition_blockers, partition_table, resolve,
+    unpartition_table,
+)
+
+
+class Command(BaseCommand):
+    help = 'Partition tables by year on Postgres, or add the partitions of coming years to partitioned ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tables', nargs='+', choices=sorted(PARTITIONABLE), help='Tables to partition')
+        parser.add_argument('--ahead', type=int, default=1,
+                            help='Create partitions up to this many years after the current one')
+        parser.add_argument('--revert', action='store_true', help='Turn partitioned tables back into plain ones')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(f'Partitioning needs Postgres; the database is {connection.vendor}')
+
+        last_year = timezone.now().year + max(0, options['ahead'])
+        for name in options['tables']:
+            model, column = resolve(name)
+            table = model._meta.db_table
+
+            if options['revert']:
+                if is_partitioned(model):
+                    unpartition_table(model)
+                    self.stdout.write(self.style.SUCCESS(f'{table} is a plain table again'))
+                else:
+                    self.stdout.write(f'{table} is not partitioned')
+                continue
+
+            blockers = partition_blockers(model, column)
+            if blockers:
+                raise CommandError(f'{table} cannot be partitioned: ' + '; '.join(blockers))
+
+            if is_partitioned(model):
+                added = add_year_partitions(model, column, range(timezone.now().year, last_year + 1))
+                self.stdout.write(self.style.SUCCESS(
+                    f"{table}: added partitions {', '.join(map(str, added)) or 'none'}"
+                ))
+                continue
+
+            first_day = model.objects.aggregate(first=Min(column))['first']
+            first_year = min(first_day.year if first_day else last_year, timezone.now().year)
+            partition_table(model, column, range(first_year, last_year + 1))
+            self.stdout.write(self.style.SUCCESS(
+                f'{table} is partitioned by year, {first_year} to {last_year} plus a default partition'
+            ))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('clients', '0002_alter_client_address_alter_client_city_and_more'),
+        ('expense', '0004_expensecategory_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(unique=True)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-year'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedExpense',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date', models.DateField()),
+                ('data', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='expense.expensecategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_expenses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['user', 'date'], name='archived_expense_user_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedInvoice',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('client_name', models.CharField(blank=True, max_length=255)),
+                ('invoice_number', models.CharField(blank=True, max_length=50)),
+                ('issue_date', models.DateField()),
+                ('status', models.CharField(max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('data', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clients.client')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_invoices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-issue_date'],
+                'indexes': [models.Index(fields=['user', 'issue_date'], name='archived_invoice_user_day_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,94 @@
+from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+
+from clients.models import Client
+from expense.models import ExpenseCategory
+
+User = get_user_model()
+
+
+class ArchivedYear(models.Model):
+    """A closed year whose paid invoices and expenses were moved to the archive tables"""
+    year = models.PositiveSmallIntegerField(unique=True)
+    invoice_count = models.PositiveIntegerField(default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Archive {self.year}"
+
+    class Meta:
+        ordering = ['-year']
+
+
+class ArchivedInvoice(models.Model):
+    """A paid invoice of a closed year.
+
+    The columns analytics and exports read are kept as plain columns; the
+    full invoice with its items and payments is the compressed ``data``
+    (see ``archive/services.py``), from which it can be restored.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_invoices')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='+')
+    client_name = models.CharField(max_length=255, blank=True)
+    invoice_number = models.CharField(max_length=50, blank=True)
+    issue_date = models.DateField()
+    status = models.CharField(max_length=10)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived invoice #{self.invoice_number}"
+
+    class Meta:
+        ordering = ['-issue_date']
+        indexes = [
+            # Rollup refreshes and status totals by issue date
+            models.Index(fields=['user', 'issue_date'], name='archived_invoice_user_day_idx'),
+        ]
+
+
+class ArchivedExpense(models.Model):
+    """An expense of a closed year; ``data`` holds the full compressed row"""
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_expenses')
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateField()
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived expense {self.id} - {self.amount}"
+
+    class Meta:
+        ordering = ['-date']
+        indexes = [
+            # Rollup refreshes and category totals by date
+            models.Index(fields=['user', 'date'], name='archived_expense_user_date_idx'),
+        ]
+
+
+# Archived rows are still counted in the daily rollups. When one goes away
+# with its client or user (a cascade, not an archive restore, which
+# deletes without signals) its day is recomputed like a deleted live row.
+
+@receiver(post_delete, sender=ArchivedInvoice)
+def update_rollup_for_archived_invoice(sender, instance, **kwargs):
+    from analytics.cache import bump_data_version_on_commit
+    from analytics.services import refresh_rollup_keys
+    refresh_rollup_keys([(instance.user_id, instance.issue_date)])
+    bump_data_version_on_commit(instance.user_id)
+
+
+@receiver(post_delete, sender=ArchivedExpense)
+def update_rollup_for_archived_expense(sender, instance, **kwargs):
+    from analytics.cache import bump_data_version_on_commit
+    from analytics.services import refresh_rollup_keys
+    refresh_rollup_keys([(instance.user_id, instance.date)])
+    bump_data_version_on_commit(instance.user_id)
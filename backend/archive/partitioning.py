@@ -0,0 +1,249 @@
+"""Optional yearly range partitioning on Postgres.
+
+``python manage.py partition_tables expense`` turns ``expense_expense`` into
+a table partitioned by ``RANGE (date)``, with one partition per year
+(``expense_expense_y2024``) and a default partition for dates outside them.
+Queries for a recent window only touch that year's partition and its
+indexes. Autovacuum works per partition, so closed years cost nothing once
+they stop changing. Archiving a year (``archive/services.py``) detaches and
+drops its whole partition instead of deleting rows one by one.
+
+Postgres requires every unique key of a partitioned table to include the
+partition column, so the primary key becomes ``(id, date)``. Django still
+treats ``id`` as the primary key; ids are UUID4s, so they stay unique
+without the database checking it across partitions. Tables that other
+tables reference (``invoice_invoice`` is referenced by items, payments and
+search documents) or whose unique constraints leave out the date cannot be
+partitioned; ``partition_blockers`` lists why. Those tables are kept small
+by the archive instead.
+
+Indexes and foreign keys are read back from the catalog and recreated on
+the new table, so later Django migrations (new columns, new indexes) keep
+working: Postgres applies them to every partition.
+"""
+import re
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import UniqueConstraint
+
+
+# Models that may be partitioned, with their partition column
+PARTITIONABLE = {
+    'expense': ('expense.Expense', 'date'),
+    'invoice': ('invoice.Invoice', 'issue_date'),
+    'invoiceitem': ('invoice.InvoiceItem', None),
+}
+
+PARTITION_NAME = re.compile(r'_y(\d{4})$')
+
+
+def resolve(name):
+    """``(model, column)`` for a ``PARTITIONABLE`` key"""
+    label, column = PARTITIONABLE[name]
+    return apps.get_model(label), column
+
+
+def partition_blockers(model, column):
+    """Reasons ``model`` cannot be range partitioned on ``column`` (empty if it can)"""
+    if column is None:
+        return [f'{model._meta.db_table} has no date column of its own to partition on']
+
+    reasons = []
+    for relation in model._meta.related_objects:
+        if relation.concrete or not relation.many_to_many:
+            reasons.append(
+                f'{relation.related_model._meta.db_table}.{relation.field.column} references it '
+                f'(a foreign key needs a unique key without {column})'
+            )
+    unique_sets = [set(fields) for fields in model._meta.unique_together]
+    unique_sets += [set(constraint.fields) for constraint in model._meta.constraints
+                    if isinstance(constraint, UniqueConstraint) and constraint.fields]
+    unique_sets += [{field.name} for field in model._meta.concrete_fields if field.unique and not field.primary_key]
+    for fields in unique_sets:
+        if column not in fields:
+            reasons.append(f"unique key ({', '.join(sorted(fields))}) does not include {column}")
+    return reasons
+
+
+def year_bounds(year):
+    return f'{year:04d}-01-01', f'{year + 1:04d}-01-01'
+
+
+def partition_name(table, year):
+    return f'{table}_y{year}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def _fetchall(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _execute(statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def is_partitioned(model):
+    if connection.vendor != 'postgresql':
+        return False
+    return bool(_fetchall('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)',
+                          [model._meta.db_table]))
+
+
+def table_exists(table):
+    return bool(_fetchall('SELECT to_regclass(%s) IS NOT NULL', [table])[0][0])
+
+
+def year_partitions(model):
+    """``{year: partition table}`` of the attached yearly partitions"""
+    rows = _fetchall(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = to_regclass(%s)',
+        [model._meta.db_table]
+    )
+    partitions = {}
+    for (name,) in rows:
+        match = PARTITION_NAME.search(name)
+        if match:
+            partitions[int(match.group(1))] = name
+    return partitions
+
+
+def _catalog(table):
+    """Primary key name, index definitions and foreign key definitions of ``table``"""
+    primary_key = _fetchall(
+        "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [table]
+    )[0][0]
+    indexes = [
+        # A partitioned table reports its indexes as ``ON ONLY``; recreated on the parent they cover every partition
+        definition.replace(' ON ONLY ', ' ON ')
+        for (definition,) in _fetchall(
+            'SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s '
+            'AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))',
+            [table, table]
+        )
+    ]
+    foreign_keys = _fetchall(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [table]
+    )
+    return primary_key, indexes, foreign_keys
+
+
+def _recreate(table, indexes, foreign_keys):
+    statements = list(indexes)
+    statements += [f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}' for name, definition in foreign_keys]
+    statements.append(f'ANALYZE {table}')
+    return statements
+
+
+def partition_statements(model, column, years):
+    """SQL converting ``model``'s table into yearly partitions for ``years`` plus a default partition"""
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    old = f'{table}_unpartitioned'
+    primary_key, indexes, foreign_keys = _catalog(table)
+
+    statements = [
+        f'ALTER TABLE {table} RENAME TO {old}',
+        # Frees the name so the new table's primary key can take it
+        f'ALTER TABLE {old} RENAME CONSTRAINT {primary_key} TO {old}_pkey',
+        f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMMENTS) '
+        f'PARTITION BY RANGE ({qn(column)})',
+        f'ALTER TABLE {table} ADD CONSTRAINT {primary_key} PRIMARY KEY ({qn(model._meta.pk.column)}, {qn(column)})',
+    ]
+    for year in sorted(years):
+        start, end = year_bounds(year)
+        statements.append(f"CREATE TABLE {partition_name(table, year)} PARTITION OF {table} "
+                          f"FOR VALUES FROM ('{start}') TO ('{end}')")
+    statements += [
+        f'CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT',
+        f'INSERT INTO {table} SELECT * FROM {old}',
+        # Drops the old indexes and foreign keys with it, so their names can be reused
+        f'DROP TABLE {old}',
+    ]
+    return statements + _recreate(table, indexes, foreign_keys)
+
+
+def unpartition_statements(model):
+    """SQL turning a partitioned table back into a plain one"""
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    plain = f'{table}_plain'
+    primary_key, indexes, foreign_keys = _catalog(table)
+
+    statements = [
+        f'CREATE TABLE {plain} (LIKE {table} INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMMENTS)',
+        f'INSERT INTO {plain} SELECT * FROM {table}',
+        f'DROP TABLE {table}',
+        f'ALTER TABLE {plain} RENAME TO {table}',
+        f'ALTER TABLE {table} ADD CONSTRAINT {primary_key} PRIMARY KEY ({qn(model._meta.pk.column)})',
+    ]
+    return statements + _recreate(table, indexes, foreign_keys)
+
+
+def add_year_statements(model, column, year):
+    """SQL adding the partition for ``year``, moving its rows out of the default partition if there are any"""
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    partition, default = partition_name(table, year), default_partition_name(table)
+    start, end = year_bounds(year)
+    in_year = f"{qn(column)} >= '{start}' AND {qn(column)} < '{end}'"
+    create = f"CREATE TABLE {partition} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')"
+
+    if not _fetchall(f'SELECT 1 FROM {default} WHERE {in_year} LIMIT 1'):
+        return [create]
+    # Postgres refuses a new partition while the default one holds rows for its range
+    return [
+        f'ALTER TABLE {table} DETACH PARTITION {default}',
+        create,
+        f'INSERT INTO {partition} SELECT * FROM {default} WHERE {in_year}',
+        f'DELETE FROM {default} WHERE {in_year}',
+        f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT',
+    ]
+
+
+def partition_table(model, column, years):
+    with transaction.atomic():
+        _execute(partition_statements(model, column, years))
+
+
+def unpartition_table(model):
+    with transaction.atomic():
+        _execute(unpartition_statements(model))
+
+
+def add_year_partitions(model, column, years):
+    """Create the missing partitions of ``years``; returns the years added"""
+    existing = year_partitions(model)
+    added = []
+    for year in sorted(set(years) - set(existing)):
+        with transaction.atomic():
+            _execute(add_year_statements(model, column, year))
+        added.append(year)
+    return added
+
+
+def detach_year_partition(model, year):
+    """Detach ``year``'s partition and return its table name (``None`` if there is none).
+
+    A partition detached by an earlier, interrupted archive run is returned
+    as well, so the run can finish copying it.
+    """
+    table = partition_name(model._meta.db_table, year)
+    if year in year_partitions(model):
+        _execute([f'ALTER TABLE {model._meta.db_table} DETACH PARTITION {table}'])
+        return table
+    return table if table_exists(table) else None
+
+
+def drop_detached_partition(table):
+    _execute([f'DROP TABLE {table}'])
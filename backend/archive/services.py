@@ -0,0 +1,454 @@
+"""Cold archive of closed years.
+
+``archive_year(2023)`` moves the paid invoices of 2023 (with their items
+and payments) and the expenses of 2023 out of the hot tables into
+``ArchivedInvoice`` and ``ArchivedExpense``. An archived row keeps the
+columns analytics and exports aggregate on (user, day, total, category)
+and stores the complete original rows as zlib-compressed JSON in ``data``.
+``restore_year`` puts them back unchanged, with the same primary keys and
+timestamps. Unpaid and overdue invoices are still being worked on, so they
+stay in the hot tables whatever their year.
+
+The hot tables and their indexes only hold the recent years plus open
+invoices, so index sizes, autovacuum and cache hit rates follow the active
+data instead of the whole history.
+
+The daily rollups are not touched. Archived rows are deleted from the hot
+tables without signals, so every rollup keeps counting them, and
+``refresh_daily_rollups`` adds the ``archived_daily_totals`` of a day when
+it recomputes one. The few analytics that read raw rows (top categories,
+status breakdown, category exports) add the ``archived_*_totals`` of their
+range. Years are archived ``MIN_KEEP_YEARS`` behind the current one at the
+earliest, so ranges starting on or after ``hot_from()`` (every default
+dashboard range) never query the archive.
+
+On Postgres, when ``expense_expense`` is partitioned by year (see
+``archive/partitioning.py``), the year's partition is detached and copied
+into the archive, then dropped, instead of deleting its rows one by one.
+"""
+import json
+import zlib
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from expense.models import Expense
+from invoice.models import Invoice, InvoiceItem, InvoiceSearchDocument, RecurringInvoice, invoices_bulk_created
+from payment.models import InvoicePayment, PaymentGatewayConfig, PaymentWebhookEvent
+from .models import ArchivedExpense, ArchivedInvoice, ArchivedYear
+
+
+ARCHIVE_CHUNK_SIZE = 500
+
+# The current and the previous year are never archived, whatever ARCHIVE_KEEP_YEARS says
+MIN_KEEP_YEARS = 2
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    """Keeps datetimes to the microsecond (``DjangoJSONEncoder`` cuts them to milliseconds)"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def pack(payload):
+    return zlib.compress(json.dumps(payload, cls=ArchiveJSONEncoder, separators=(',', ':')).encode())
+
+
+def unpack(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def snapshot(instance):
+    """Column values of a model instance, as stored in the database"""
+    return {
+        field.attname: field.get_prep_value(field.value_from_object(instance))
+        for field in instance._meta.concrete_fields
+    }
+
+
+def instantiate(model, values):
+    """Unsaved ``model`` instance from a ``snapshot``"""
+    return model(**{
+        field.attname: field.to_python(values[field.attname])
+        for field in model._meta.concrete_fields if field.attname in values
+    })
+
+
+def keep_years():
+    return max(MIN_KEEP_YEARS, getattr(settings, 'ARCHIVE_KEEP_YEARS', MIN_KEEP_YEARS))
+
+
+def latest_archivable_year(today=None):
+    return (today or timezone.now().date()).year - keep_years()
+
+
+def hot_from(today=None):
+    """First day that can never be archived; ranges from here on skip the archive"""
+    return date((today or timezone.now().date()).year - MIN_KEEP_YEARS + 1, 1, 1)
+
+
+def year_range(year):
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def _raw_delete(queryset):
+    # Skips the delete signals: rollups keep counting the archived rows
+    queryset._raw_delete(queryset.db)
+
+
+def _after_archive(invoice_ids, user_ids):
+    from analytics.cache import bump_data_version
+    from invoice.rendering import delete_cached_pdfs
+    for invoice_id in invoice_ids:
+        delete_cached_pdfs(invoice_id)
+    for user_id in user_ids:
+        bump_data_version(user_id)
+
+
+def archive_year(year, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Move the paid invoices and the expenses of ``year`` to the archive.
+
+    Works in chunks of ``chunk_size`` rows, each in its own transaction, so
+    an interrupted run loses nothing and the next run picks up where it
+    stopped. Archiving a year again moves what was added or paid since.
+    Returns ``{'invoices': n, 'expenses': n}``.
+    """
+    latest = latest_archivable_year()
+    if year > latest:
+        raise ValueError(f'{year} is not closed yet; only years up to {latest} can be archived')
+
+    invoices = 0
+    while True:
+        moved = _archive_invoice_chunk(year, chunk_size)
+        if not moved:
+            break
+        invoices += moved
+
+    from .partitioning import is_partitioned
+    if is_partitioned(Expense):
+        expenses = _archive_expense_partition(year, chunk_size)
+    else:
+        expenses = 0
+        while True:
+            moved = _archive_expense_chunk(year, chunk_size)
+            if not moved:
+                break
+            expenses += moved
+
+    archived_year, _ = ArchivedYear.objects.get_or_create(year=year)
+    archived_year.invoice_count += invoices
+    archived_year.expense_count += expenses
+    archived_year.save()
+    return {'invoices': invoices, 'expenses': expenses}
+
+
+def _archive_invoice_chunk(year, chunk_size):
+    start, end = year_range(year)
+    with transaction.atomic():
+        invoices = list(
+            Invoice.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status='paid', issue_date__gte=start, issue_date__lt=end)
+            .select_related('client')
+            .order_by('id')[:chunk_size]
+        )
+        if not invoices:
+            return 0
+        invoice_ids = [invoice.id for invoice in invoices]
+
+        items, payments = defaultdict(list), defaultdict(list)
+        for item in InvoiceItem.objects.filter(invoice_id__in=invoice_ids).order_by('id'):
+            items[item.invoice_id].append(snapshot(item))
+        payment_rows = list(InvoicePayment.objects.filter(invoice_id__in=invoice_ids).order_by('created_at'))
+        webhook_events = defaultdict(list)
+        for event_id, payment_id in PaymentWebhookEvent.objects.filter(
+            payment_id__in=[payment.id for payment in payment_rows]
+        ).values_list('id', 'payment_id'):
+            webhook_events[payment_id].append(str(event_id))
+        for payment in payment_rows:
+            payments[payment.invoice_id].append(
+                dict(snapshot(payment), webhook_events=webhook_events[payment.id])
+            )
+
+        ArchivedInvoice.objects.bulk_create([
+            ArchivedInvoice(
+                id=invoice.id, user_id=invoice.user_id, client_id=invoice.client_id,
+                client_name=invoice.client.name, invoice_number=invoice.invoice_number,
+                issue_date=invoice.issue_date, status=invoice.status, total=invoice.total,
+                amount_paid=invoice.amount_paid,
+                data=pack({
+                    'invoice': snapshot(invoice), 'items': items[invoice.id], 'payments': payments[invoice.id]
+                }),
+            )
+            for invoice in invoices
+        ])
+
+        # Webhook events outlive their payment (SET_NULL); restore links them again
+        PaymentWebhookEvent.objects.filter(payment_id__in=[payment.id for payment in payment_rows]).update(payment=None)
+        _raw_delete(InvoiceSearchDocument.objects.filter(invoice_id__in=invoice_ids))
+        _raw_delete(InvoiceItem.objects.filter(invoice_id__in=invoice_ids))
+        _raw_delete(InvoicePayment.objects.filter(invoice_id__in=invoice_ids))
+        _raw_delete(Invoice.objects.filter(id__in=invoice_ids))
+
+        user_ids = {invoice.user_id for invoice in invoices}
+        transaction.on_commit(lambda: _after_archive(invoice_ids, user_ids))
+    return len(invoices)
+
+
+def _archived_expense(expense):
+    return ArchivedExpense(
+        id=expense.id, user_id=expense.user_id, category_id=expense.category_id,
+        amount=expense.amount, date=expense.date, data=pack(snapshot(expense)),
+    )
+
+
+def _archive_expense_chunk(year, chunk_size):
+    start, end = year_range(year)
+    with transaction.atomic():
+        expenses = list(
+            Expense.objects.select_for_update(skip_locked=True)
+            .filter(date__gte=start, date__lt=end)
+            .order_by('id')[:chunk_size]
+        )
+        if not expenses:
+            return 0
+        ArchivedExpense.objects.bulk_create([_archived_expense(expense) for expense in expenses])
+        _raw_delete(Expense.objects.filter(id__in=[expense.id for expense in expenses]))
+
+        user_ids = {expense.user_id for expense in expenses}
+        transaction.on_commit(lambda: _after_archive([], user_ids))
+    return len(expenses)
+
+
+def _archive_expense_partition(year, chunk_size):
+    """Detach the year's partition, copy it into the archive and drop it.
+
+    The detach is its own short transaction; the copy is idempotent
+    (``ignore_conflicts``), so a run interrupted while copying finishes the
+    detached table the next time.
+    """
+    from .partitioning import detach_year_partition, drop_detached_partition
+
+    table = detach_year_partition(Expense, year)
+    copied, last_id, user_ids = 0, None, set()
+    if table is not None:
+        while True:
+            sql, params = f'SELECT * FROM {table} ORDER BY id LIMIT %s', [chunk_size]
+            if last_id is not None:
+                sql, params = f'SELECT * FROM {table} WHERE id > %s ORDER BY id LIMIT %s', [last_id, chunk_size]
+            expenses = list(Expense.objects.raw(sql, params))
+            if not expenses:
+                break
+            last_id = expenses[-1].id
+            ArchivedExpense.objects.bulk_create([_archived_expense(expense) for expense in expenses],
+                                                ignore_conflicts=True)
+            user_ids.update(expense.user_id for expense in expenses)
+            copied += len(expenses)
+        with transaction.atomic():
+            drop_detached_partition(table)
+            transaction.on_commit(lambda: _after_archive([], user_ids))
+
+    # Rows written to the default partition after the year was partitioned away
+    while True:
+        moved = _archive_expense_chunk(year, chunk_size)
+        if not moved:
+            break
+        copied += moved
+    return copied
+
+
+def restore_year(year, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Move the archived invoices and expenses of ``year`` back into the hot tables.
+
+    Rows come back with their original primary keys and timestamps.
+    Returns ``{'invoices': n, 'expenses': n}``.
+    """
+    invoices = expenses = 0
+    while True:
+        moved = _restore_invoice_chunk(year, chunk_size)
+        if not moved:
+            break
+        invoices += moved
+    while True:
+        moved = _restore_expense_chunk(year, chunk_size)
+        if not moved:
+            break
+        expenses += moved
+
+    ArchivedYear.objects.filter(year=year).delete()
+    return {'invoices': invoices, 'expenses': expenses}
+
+
+def _restore_timestamps(model, instances, timestamps):
+    # bulk_create stamps auto_now(_add) fields with the current time; put the originals back
+    for instance in instances:
+        for field, value in timestamps[instance.pk].items():
+            setattr(instance, field, value)
+    model.objects.bulk_update(instances, ['created_at', 'updated_at'])
+
+
+def _restore_invoice_chunk(year, chunk_size):
+    start, end = year_range(year)
+    with transaction.atomic():
+        archived = list(
+            ArchivedInvoice.objects.select_for_update()
+            .filter(issue_date__gte=start, issue_date__lt=end)
+            .order_by('id')[:chunk_size]
+        )
+        if not archived:
+            return 0
+        payloads = [(row, unpack(row.data)) for row in archived]
+
+        templates = set(RecurringInvoice.objects.filter(
+            id__in={payload['invoice']['recurring_invoice_id'] for _, payload in payloads} - {None}
+        ).values_list('id', flat=True))
+        gateways = set(PaymentGatewayConfig.objects.filter(
+            id__in={payment['gateway_id'] for _, payload in payloads for payment in payload['payments']} - {None}
+        ).values_list('id', flat=True))
+
+        invoices, items, payments, webhook_links, timestamps = [], [], [], {}, {}
+        for row, payload in payloads:
+            invoice = instantiate(Invoice, payload['invoice'])
+            # Templates and gateways may have been deleted since (both are SET_NULL on live rows)
+            if invoice.recurring_invoice_id not in templates:
+                invoice.recurring_invoice_id = None
+            invoices.append(invoice)
+            timestamps[invoice.pk] = {'created_at': invoice.created_at, 'updated_at': invoice.updated_at}
+            items.extend(instantiate(InvoiceItem, values) for values in payload['items'])
+            for values in payload['payments']:
+                payment = instantiate(InvoicePayment, values)
+                if payment.gateway_id not in gateways:
+                    payment.gateway_id = None
+                payments.append(payment)
+                timestamps[payment.pk] = {'created_at': payment.created_at, 'updated_at': payment.updated_at}
+                webhook_links.update((event_id, payment.pk) for event_id in values['webhook_events'])
+
+        _raw_delete(ArchivedInvoice.objects.filter(id__in=[row.id for row in archived]))
+        Invoice.objects.bulk_create(invoices)
+        _restore_timestamps(Invoice, invoices, timestamps)
+        InvoiceItem.objects.bulk_create(items)
+        InvoicePayment.objects.bulk_create(payments)
+        _restore_timestamps(InvoicePayment, payments, timestamps)
+
+        events = list(PaymentWebhookEvent.objects.filter(id__in=list(webhook_links), payment__isnull=True))
+        for event in events:
+            event.payment_id = webhook_links[str(event.id)]
+        PaymentWebhookEvent.objects.bulk_update(events, ['payment'])
+
+        # Search documents, rollups (unchanged totals) and caches, as for any bulk insert
+        by_user = defaultdict(list)
+        for invoice in invoices:
+            by_user[invoice.user_id].append(invoice)
+        for user_id, user_invoices in by_user.items():
+            invoices_bulk_created.send(sender=Invoice, user_id=user_id, invoices=user_invoices)
+    return len(archived)
+
+
+def _restore_expense_chunk(year, chunk_size):
+    from analytics.cache import bump_data_version_on_commit
+
+    start, end = year_range(year)
+    with transaction.atomic():
+        archived = list(
+            ArchivedExpense.objects.select_for_update()
+            .filter(date__gte=start, date__lt=end)
+            .order_by('id')[:chunk_size]
+        )
+        if not archived:
+            return 0
+
+        expenses, timestamps = [], {}
+        for row in archived:
+            expense = instantiate(Expense, unpack(row.data))
+            # The category may have been deleted since; the archived row was nulled like a live one
+            expense.category_id = row.category_id
+            expenses.append(expense)
+            timestamps[expense.pk] = {'created_at': expense.created_at, 'updated_at': expense.updated_at}
+
+        _raw_delete(ArchivedExpense.objects.filter(id__in=[row.id for row in archived]))
+        Expense.objects.bulk_create(expenses)
+        _restore_timestamps(Expense, expenses, timestamps)
+
+        for user_id in {expense.user_id for expense in expenses}:
+            bump_data_version_on_commit(user_id)
+    return len(archived)
+
+
+# Read side: analytics add these to what they aggregate from the hot tables
+
+def archived_daily_totals(user_id, days=None):
+    """Archived paid income and expenses per day, for ``days`` (default: all).
+
+    Returns ``(invoice_totals, expense_totals)``, each mapping a day to
+    ``{'total': ..., 'count': ...}``.
+    """
+    invoices = ArchivedInvoice.objects.filter(user_id=user_id)
+    expenses = ArchivedExpense.objects.filter(user_id=user_id)
+    if days is not None:
+        days = [day for day in days if day < hot_from()]
+        if not days:
+            return {}, {}
+        invoices = invoices.filter(issue_date__in=days)
+        expenses = expenses.filter(date__in=days)
+
+    invoice_totals = {
+        row['issue_date']: {'total': row['total'], 'count': row['count']}
+        for row in invoices.values('issue_date').annotate(total=Sum('total'), count=Count('id')).order_by()
+    }
+    expense_totals = {
+        row['date']: {'total': row['total'], 'count': row['count']}
+        for row in expenses.values('date').annotate(total=Sum('amount'), count=Count('id')).order_by()
+    }
+    return invoice_totals, expense_totals
+
+
+def archived_category_totals(user_id, start_date=None, end_date=None):
+    """Archived expense total and count per category between two dates (inclusive, default: all)"""
+    if start_date and start_date >= hot_from():
+        return []
+    expenses = ArchivedExpense.objects.filter(user_id=user_id)
+    if start_date and end_date:
+        expenses = expenses.filter(date__gte=start_date, date__lte=end_date)
+    return list(
+        expenses.values('category_id', 'category__name')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+
+def archived_invoice_totals(user_id, start_date=None, end_date=None):
+    """``(count, total)`` of the archived (paid) invoices issued between two dates (inclusive, default: all)"""
+    if start_date and start_date >= hot_from():
+        return 0, None
+    invoices = ArchivedInvoice.objects.filter(user_id=user_id)
+    if start_date and end_date:
+        invoices = invoices.filter(issue_date__gte=start_date, issue_date__lte=end_date)
+    totals = invoices.aggregate(count=Count('id'), total=Sum('total'))
+    return totals['count'], totals['total']
+
+
+def merge_category_totals(rows, archived_rows):
+    """Add archived category rows to live ones, largest total first.
+
+    ``rows`` is returned as it is when there is nothing archived, so a
+    streaming iterator stays streaming.
+    """
+    if not archived_rows:
+        return rows
+    merged = {}
+    for row in list(rows) + list(archived_rows):
+        current = merged.get(row['category_id'])
+        if current is None:
+            merged[row['category_id']] = dict(row)
+            continue
+        for field in ('total', 'count'):
+            if field in row:
+                current[field] = (current.get(field) or 0) + (row[field] or 0)
+    return sorted(merged.values(), key=lambda row: (-(row['total'] or 0), row['category__name'] or ''))
@@ -0,0 +1,159 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from analytics.cache import get_analytics_cache
+from analytics.export import iter_category_rows
+from analytics.models import DailyFinancialRollup
+from analytics.services import rebuild_user_rollups
+from clients.models import Client
+from expense.models import Expense, ExpenseCategory
+from invoice.models import Invoice, InvoiceItem, InvoiceSearchDocument
+from invoice.search import matching_invoice_ids
+from payment.models import InvoicePayment, PaymentWebhookEvent
+from .models import ArchivedExpense, ArchivedInvoice, ArchivedYear
+from .partitioning import partition_blockers
+from .services import archive_year, latest_archivable_year, restore_year
+
+
+class ArchiveTests(TestCase):
+    """Archiving a closed year moves its rows out of the hot tables without changing any analytics"""
+
+    def setUp(self):
+        get_analytics_cache().clear()
+        self.user = User.objects.create_user('archivist', 'archivist@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.category = ExpenseCategory.objects.create(user=self.user, name='Travel')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+        self.year = latest_archivable_year()
+        self.old_day = date(self.year, 3, 15)
+        self.today = timezone.now().date()
+
+        self.paid = self.create_invoice(self.old_day, Decimal('100.00'))
+        payment = InvoicePayment.objects.create(invoice=self.paid, gateway_name='manual', amount=Decimal('100.00'),
+                                                status='completed')
+        self.event = PaymentWebhookEvent.objects.create(gateway_name='stripe', event_type='checkout.completed',
+                                                        event_id='evt_1', payment=payment)
+        self.unpaid = self.create_invoice(self.old_day, Decimal('50.00'))
+        self.recent = self.create_invoice(self.today, Decimal('30.00'))
+        self.recent.status = 'paid'
+        self.recent.save()
+
+        self.old_expense = Expense.objects.create(user=self.user, category=self.category, amount=Decimal('20.00'),
+                                                  date=self.old_day, description='Flight')
+        Expense.objects.create(user=self.user, category=self.category, amount=Decimal('5.00'), date=self.today,
+                               description='Taxi')
+
+    def create_invoice(self, day, amount):
+        return Invoice.objects.create_with_items(
+            [{'description': 'Consulting', 'quantity': 1, 'unit_price': amount}],
+            user=self.user, client=self.client_obj, issue_date=day, due_date=day + timedelta(days=14)
+        )
+
+    def rollups(self):
+        return list(DailyFinancialRollup.objects.filter(user=self.user).order_by('day').values_list(
+            'day', 'income', 'invoice_count', 'expenses', 'expense_count'
+        ))
+
+    def analytics(self):
+        return [
+            self.api.get('/api/analytic/invoice-status-breakdown/').json(),
+            self.api.get('/api/analytic/top-expense-categories/').json(),
+            list(iter_category_rows(self.user, date(self.year, 1, 1), self.today)),
+        ]
+
+    def test_archive_moves_paid_invoices_and_expenses(self):
+        rollups, analytics = self.rollups(), self.analytics()
+
+        self.assertEqual(archive_year(self.year), {'invoices': 1, 'expenses': 1})
+
+        self.assertEqual(set(Invoice.objects.values_list('id', flat=True)), {self.unpaid.id, self.recent.id})
+        self.assertFalse(InvoiceItem.objects.filter(invoice_id=self.paid.id).exists())
+        self.assertFalse(InvoicePayment.objects.filter(invoice_id=self.paid.id).exists())
+        self.assertFalse(InvoiceSearchDocument.objects.filter(invoice_id=self.paid.id).exists())
+        self.assertFalse(Expense.objects.filter(id=self.old_expense.id).exists())
+        self.assertEqual(ArchivedInvoice.objects.get().client_name, 'Acme')
+        self.assertEqual(ArchivedExpense.objects.get().category, self.category)
+        self.assertEqual(ArchivedYear.objects.values_list('year', 'invoice_count', 'expense_count').get(),
+                         (self.year, 1, 1))
+
+        # Rollups keep counting the archived rows, rebuilt or refreshed, and raw-row analytics add them back
+        self.assertEqual(self.rollups(), rollups)
+        self.assertEqual(self.analytics(), analytics)
+        rebuild_user_rollups(self.user.id)
+        self.assertEqual(self.rollups(), rollups)
+        Expense.objects.create(user=self.user, amount=Decimal('1.00'), date=self.old_day, description='Coffee')
+        self.assertIn((self.old_day, Decimal('100.00'), 1, Decimal('21.00'), 2), self.rollups())
+
+        # Archiving again only moves what is left
+        self.assertEqual(archive_year(self.year), {'invoices': 0, 'expenses': 1})
+
+    def test_restore_puts_rows_back_unchanged(self):
+        invoice = Invoice.objects.values().get(id=self.paid.id)
+        expense = Expense.objects.values().get(id=self.old_expense.id)
+        payment = InvoicePayment.objects.values().get(invoice_id=self.paid.id)
+        rollups = self.rollups()
+
+        archive_year(self.year)
+        self.assertEqual(PaymentWebhookEvent.objects.get().payment_id, None)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(restore_year(self.year), {'invoices': 1, 'expenses': 1})
+
+        self.assertEqual(Invoice.objects.values().get(id=self.paid.id), invoice)
+        self.assertEqual(Expense.objects.values().get(id=self.old_expense.id), expense)
+        self.assertEqual(InvoicePayment.objects.values().get(invoice_id=self.paid.id), payment)
+        self.assertEqual(InvoiceItem.objects.get(invoice_id=self.paid.id).description, 'Consulting')
+        self.assertEqual(PaymentWebhookEvent.objects.get().payment_id, payment['id'])
+        found = Invoice.objects.filter(id__in=matching_invoice_ids(self.user, self.paid.invoice_number))
+        self.assertEqual(list(found.values_list('id', flat=True)), [self.paid.id])
+        self.assertFalse(ArchivedInvoice.objects.exists() or ArchivedExpense.objects.exists())
+        self.assertFalse(ArchivedYear.objects.exists())
+        self.assertEqual(self.rollups(), rollups)
+
+    def test_deleting_the_client_drops_archived_income(self):
+        archive_year(self.year)
+        self.client_obj.delete()
+
+        self.assertFalse(ArchivedInvoice.objects.exists())
+        # The archived expense of that day is still there
+        self.assertEqual(
+            DailyFinancialRollup.objects.values_list('income', 'invoice_count', 'expenses').get(day=self.old_day),
+            (Decimal('0.00'), 0, Decimal('20.00'))
+        )
+
+    def test_open_years_are_refused(self):
+        with self.assertRaises(ValueError):
+            archive_year(self.year + 1)
+        with self.assertRaises(CommandError):
+            call_command('archive_year', str(self.year + 1), stdout=StringIO())
+        self.assertEqual(Invoice.objects.count(), 3)
+
+        out = StringIO()
+        call_command('archive_year', str(self.year), stdout=out)
+        self.assertIn(f'Archived {self.year}: 1 invoices, 1 expenses', out.getvalue())
+
+
+class PartitioningTests(TestCase):
+    """Only tables nothing references, with the date in every unique key, can be partitioned"""
+
+    def test_blockers(self):
+        self.assertEqual(partition_blockers(Expense, 'date'), [])
+        blockers = partition_blockers(Invoice, 'issue_date')
+        self.assertTrue(any('invoice_invoiceitem.invoice_id' in reason for reason in blockers), blockers)
+        self.assertTrue(any('invoice_number' in reason for reason in blockers), blockers)
+        self.assertTrue(partition_blockers(InvoiceItem, None))
+
+    def test_command_needs_postgres(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_tables', 'expense', stdout=StringIO())
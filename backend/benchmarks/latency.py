@@ -0,0 +1,142 @@
+"""Request latency benchmark: gunicorn sync workers versus uvicorn with async views.
+
+Starts the application under each server mode, fires concurrent GET requests
+at the dashboard and analytics bundle endpoints and reports p50/p95/p99
+latency per mode and endpoint:
+
+- ``gunicorn``: ``gunicorn trackify.wsgi`` sync workers, sync views (current deployment)
+- ``uvicorn``:  ``uvicorn trackify.asgi:application`` with ``ASYNC_ANALYTICS_VIEWS=True``
+
+The analytics response cache is disabled so every request runs its queries.
+Point ``DATABASE_URL`` (with ``DEBUG=False``) at a Postgres copy with realistic
+data; on SQLite the async views run their queries serially and only the
+server overhead is compared.
+
+Usage (from the backend directory):
+    python benchmarks/latency.py --user demo
+    python benchmarks/latency.py --user demo --requests 500 --concurrency 16 --workers 4
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_PATHS = ['/api/users/dashboard/', '/api/analytic/bundle/']
+
+SERVER_MODES = {
+    'gunicorn': {
+        'command': ['gunicorn', 'trackify.wsgi', '--workers', '{workers}', '--bind', '127.0.0.1:{port}'],
+        'env': {'ASYNC_ANALYTICS_VIEWS': 'False'},
+    },
+    'uvicorn': {
+        'command': ['uvicorn', 'trackify.asgi:application', '--workers', '{workers}', '--port', '{port}',
+                    '--no-access-log'],
+        'env': {'ASYNC_ANALYTICS_VIEWS': 'True'},
+    },
+}
+
+
+def mint_token(username):
+    """Access token for an existing (email verified) user"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trackify.settings')
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import RefreshToken
+    return str(RefreshToken.for_user(User.objects.get(username=username)).access_token)
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'Server did not start listening on port {port}')
+
+
+def timed_get(url, token):
+    request = urllib.request.Request(url, headers={'Authorization': f'Bearer {token}'})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f'{url} returned {response.status}')
+    return time.perf_counter() - started
+
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        'p50_ms': round(cuts[49] * 1000, 1),
+        'p95_ms': round(cuts[94] * 1000, 1),
+        'p99_ms': round(cuts[98] * 1000, 1),
+    }
+
+
+def run_mode(mode, args, token):
+    config = SERVER_MODES[mode]
+    command = [part.format(workers=args.workers, port=args.port) for part in config['command']]
+    env = dict(os.environ, ANALYTICS_CACHE_ENABLED='False', **config['env'])
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        results = {}
+        for path in args.paths:
+            url = f'http://127.0.0.1:{args.port}{path}'
+            for _ in range(args.warmup):
+                timed_get(url, token)
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                started = time.perf_counter()
+                latencies = list(executor.map(lambda _: timed_get(url, token), range(args.requests)))
+                elapsed = time.perf_counter() - started
+            results[path] = {**percentiles(latencies), 'rps': round(args.requests / elapsed, 1)}
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', required=True, help='Username whose data is requested')
+    parser.add_argument('--path', action='append', dest='paths', help='Endpoint to load (can be repeated)')
+    parser.add_argument('--mode', action='append', dest='modes', choices=sorted(SERVER_MODES),
+                        help='Server mode to run (default: all)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client connections')
+    parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+    args.paths = args.paths or DEFAULT_PATHS
+
+    token = mint_token(args.user)
+    results = {mode: run_mode(mode, args, token) for mode in (args.modes or list(SERVER_MODES))}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"{'mode':<10} {'endpoint':<28} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for mode, endpoints in results.items():
+        for path, stats in endpoints.items():
+            print(f"{mode:<10} {path:<28} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['rps']:>8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Worker startup benchmark: import time and resident memory of a fresh Django worker.
+
+Each sample runs in a new interpreter that does what a gunicorn worker does on
+boot (load the WSGI application and the URLconf) and reports wall time, peak
+RSS and which heavy modules ended up imported. Results are compared against
+``startup_baseline.json``; the script exits non-zero on a regression.
+
+Usage (from the backend directory):
+    python benchmarks/startup.py               # compare against the baseline
+    python benchmarks/startup.py --update      # record a new baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / 'startup_baseline.json'
+
+# Libraries that must not be imported while a worker boots
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'stripe', 'cloudinary.api']
+
+PROBE = r"""
+import json, os, resource, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trackify.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'import_seconds': elapsed,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe():
+    env = dict(os.environ, DEBUG=os.environ.get('DEBUG', 'True'))
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env,
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(samples):
+    results = [run_probe() for _ in range(samples)]
+    return {
+        'import_seconds': round(statistics.median(r['import_seconds'] for r in results), 3),
+        'rss_mb': round(statistics.median(r['rss_mb'] for r in results), 1),
+        'heavy_modules': sorted({name for r in results for name in r['heavy_modules']}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--update', action='store_true', help='Write the measurement as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative regression over the baseline (default 25%%)')
+    args = parser.parse_args()
+
+    current = measure(args.samples)
+    print(json.dumps(current, indent=2))
+
+    if args.update:
+        BASELINE_PATH.write_text(json.dumps(current, indent=2) + '\n')
+        print(f'Baseline written to {BASELINE_PATH}')
+        return 0
+
+    baseline = json.loads(BASELINE_PATH.read_text())
+    failures = []
+    if current['heavy_modules']:
+        failures.append(f"heavy modules imported at startup: {', '.join(current['heavy_modules'])}")
+    for metric in ('import_seconds', 'rss_mb'):
+        limit = baseline[metric] * (1 + args.tolerance)
+        if current[metric] > limit:
+            failures.append(f'{metric} {current[metric]} exceeds baseline {baseline[metric]} (+{args.tolerance:.0%})')
+
+    for failure in failures:
+        print(f'REGRESSION: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
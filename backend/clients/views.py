@@ -3,20 +3,14 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from trackify.conditional import ConditionalGetMixin
+from trackify.pagination import StandardResultsSetPagination, PaginatedListMixin
 
 from .models import Client
 from .serializers import ClientSerializer, ClientDetailSerializer
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    """Standard pagination for list views"""
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
-class ClientView(APIView):
+class ClientView(ConditionalGetMixin, PaginatedListMixin, APIView):
     """Class-based view for client management
     
     Supports:
@@ -27,22 +21,17 @@ class ClientView(APIView):
     """
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
-    
-    def get_paginated_response(self, queryset, serializer_class):
-        """Helper method to paginate queryset"""
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(queryset, self.request)
-        serializer = serializer_class(page, many=True, context={'request': self.request})
-        return paginator.get_paginated_response(serializer.data)
+    cursor_ordering = ('-created_at', '-id')
     
     def get(self, request, client_id=None):
         """Get a list of clients or a specific client"""
         if client_id:
             # Get specific client
             try:
-                client = get_object_or_404(Client, id=client_id, user=request.user)
-                serializer = ClientDetailSerializer(client)
-                return Response(serializer.data)
+                clients = Client.objects.filter(id=client_id, user=request.user)
+                return self.conditional_get(
+                    clients, ('updated_at',), lambda: Response(ClientDetailSerializer(clients.get()).data)
+                )
             except Exception as e:
                 return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
         else:
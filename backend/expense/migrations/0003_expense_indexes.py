@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0002_alter_expense_receipt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date', 'id'], name='expense_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'created_at'], name='expense_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0003_expense_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expensecategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -11,6 +11,7 @@ class ExpenseCategory(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -38,3 +39,9 @@ class Expense(models.Model):
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Date range reports, lists and the (date, id) cursor
+            models.Index(fields=['user', 'date', 'id'], name='expense_user_date_idx'),
+            # Dashboard totals and recent expenses
+            models.Index(fields=['user', 'created_at'], name='expense_user_created_idx'),
+        ]
@@ -1,3 +1,39 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Expense, ExpenseCategory
+
+
+class ExpenseConditionalGetTests(TestCase):
+    """Expense details revalidate against the expense and its category"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('spender', 'spender@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.category = ExpenseCategory.objects.create(user=self.user, name='Travel')
+        self.expense = Expense.objects.create(user=self.user, category=self.category, amount=Decimal('12.50'),
+                                              date=timezone.now().date(), description='Taxi')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.url = f'/api/expense/{self.expense.id}/'
+
+    def test_category_rename_invalidates_the_expense_etag(self):
+        etag = self.api.get(self.url)['ETag']
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.category.name = 'Transport'
+        self.category.save()
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['category']['name'], 'Transport')
 
-# Create your tests here.
+    def test_other_users_expenses_are_404(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.api.force_authenticate(other)
+        self.assertEqual(self.api.get(self.url).status_code, 404)
@@ -3,23 +3,17 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
 from datetime import datetime
 from django.utils import timezone
 from django.db.models import Sum
+from trackify.conditional import ConditionalGetMixin
+from trackify.pagination import StandardResultsSetPagination, PaginatedListMixin
 
 from .models import Expense, ExpenseCategory
 from .serializers import ExpenseSerializer, ExpenseDetailSerializer, ExpenseCategorySerializer
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    """Standard pagination for list views"""
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
-class ExpenseView(APIView):
+class ExpenseView(ConditionalGetMixin, PaginatedListMixin, APIView):
     """Class-based view for expense management
     
     Supports:
@@ -30,22 +24,18 @@ class ExpenseView(APIView):
     """
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
-    
-    def get_paginated_response(self, queryset, serializer_class):
-        """Helper method to paginate queryset"""
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(queryset, self.request)
-        serializer = serializer_class(page, many=True, context={'request': self.request})
-        return paginator.get_paginated_response(serializer.data)
+    cursor_ordering = ('-date', '-id')
     
     def get(self, request, expense_id=None):
         """Get a list of expenses or a specific expense with optional date range filtering"""
         if expense_id:
             # Get specific expense
             try:
-                expense = get_object_or_404(Expense, id=expense_id, user=request.user)
-                serializer = ExpenseDetailSerializer(expense)
-                return Response(serializer.data)
+                expenses = Expense.objects.filter(id=expense_id, user=request.user)
+                return self.conditional_get(
+                    expenses, ('updated_at', 'category__updated_at'),
+                    lambda: Response(ExpenseDetailSerializer(expenses.get()).data)
+                )
             except Exception as e:
                 return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
         else:
@@ -132,7 +122,7 @@ class ExpenseView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
 
 
-class ExpenseCategoryView(APIView):
+class ExpenseCategoryView(ConditionalGetMixin, PaginatedListMixin, APIView):
     """Class-based view for expense category management
     
     Supports:
@@ -143,22 +133,17 @@ class ExpenseCategoryView(APIView):
     """
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
-    
-    def get_paginated_response(self, queryset, serializer_class):
-        """Helper method to paginate queryset"""
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(queryset, self.request)
-        serializer = serializer_class(page, many=True, context={'request': self.request})
-        return paginator.get_paginated_response(serializer.data)
+    cursor_ordering = ('name', 'id')
     
     def get(self, request, category_id=None):
         """Get a list of expense categories or a specific category"""
         if category_id:
             # Get specific expense category
             try:
-                category = get_object_or_404(ExpenseCategory, id=category_id, user=request.user)
-                serializer = ExpenseCategorySerializer(category)
-                return Response(serializer.data)
+                categories = ExpenseCategory.objects.filter(id=category_id, user=request.user)
+                return self.conditional_get(
+                    categories, ('updated_at',), lambda: Response(ExpenseCategorySerializer(categories.get()).data)
+                )
             except Exception as e:
                 return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
         else:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Invoice, InvoiceItem
+from .models import Invoice, InvoiceItem, InvoiceSequence, RecurringInvoice, RecurringInvoiceItem
 
 class InvoiceItemInline(admin.TabularInline):
     model = InvoiceItem
@@ -7,7 +7,7 @@ class InvoiceItemInline(admin.TabularInline):
 
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
-    list_display = ('invoice_number', 'client', 'issue_date', 'due_date', 'status', 'total')
+    list_display = ('invoice_number', 'client', 'issue_date', 'due_date', 'status', 'total', 'balance_due')
     list_filter = ('status', 'issue_date', 'due_date')
     search_fields = ('invoice_number', 'client__name', 'notes')
     inlines = [InvoiceItemInline]
@@ -16,3 +16,19 @@ class InvoiceAdmin(admin.ModelAdmin):
 class InvoiceItemAdmin(admin.ModelAdmin):
     list_display = ('description', 'invoice', 'quantity', 'unit_price', 'amount')
     search_fields = ('description', 'invoice__invoice_number')
+
+@admin.register(InvoiceSequence)
+class InvoiceSequenceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'period', 'last_number')
+    search_fields = ('user__username', 'period')
+
+class RecurringInvoiceItemInline(admin.TabularInline):
+    model = RecurringInvoiceItem
+    extra = 1
+
+@admin.register(RecurringInvoice)
+class RecurringInvoiceAdmin(admin.ModelAdmin):
+    list_display = ('client', 'frequency', 'interval', 'next_run', 'is_active', 'last_run_at')
+    list_filter = ('frequency', 'is_active')
+    search_fields = ('client__name', 'user__username')
+    inlines = [RecurringInvoiceItemInline]
@@ -0,0 +1,143 @@
+"""Denormalized payment balances of invoices.
+
+``Invoice.amount_paid`` is the sum of the invoice's completed payments and
+``last_payment_at`` the latest of their payment dates. ``balance_due`` is
+what is still owed: ``total - amount_paid``, never below zero. Outstanding-
+balance and aging reports read these columns from
+``invoice_open_balance_idx`` instead of aggregating payments; paid invoices
+are settled and never outstanding, whatever they recorded (``OPEN_BALANCE``).
+
+Every payment write calls ``refresh_invoice_balances`` in its own
+transaction. It locks the invoice rows, then recomputes the columns from
+the payments table, so concurrent payments of one invoice queue up instead
+of each adding to a stale sum. The payments also decide the status: an
+invoice whose amount paid changes becomes ``paid`` once the payments cover
+its total, and a paid invoice that a refund leaves short is reopened
+(``overdue`` past its due date, ``unpaid`` before). ``Invoice.save``
+re-reads ``amount_paid`` under the same lock before deriving
+``balance_due`` from a new total.
+
+``verify_invoice_balances`` finds rows that drifted anyway (raw SQL,
+restored backups). The ``repair_invoice_balances`` command reports or fixes
+them.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from payment.models import InvoicePayment
+from .models import Invoice, invoices_bulk_updated
+
+
+BALANCE_FIELDS = ['amount_paid', 'balance_due', 'last_payment_at']
+
+VERIFY_CHUNK_SIZE = 2000
+
+
+def payment_totals(invoice_ids):
+    """``{invoice_id: (amount_paid, last_payment_at)}`` from the completed payments"""
+    rows = (
+        InvoicePayment.objects.filter(invoice_id__in=invoice_ids, status='completed')
+        .values('invoice_id')
+        .annotate(amount_paid=Sum('amount'), last_payment_at=Max('payment_date'))
+        .order_by()
+    )
+    return {row['invoice_id']: (row['amount_paid'], row['last_payment_at']) for row in rows}
+
+
+def expected_balances(invoices, totals):
+    """Set the balance fields of ``invoices`` from ``totals``; returns the ones that changed"""
+    changed = []
+    for invoice in invoices:
+        stored = [getattr(invoice, field) for field in BALANCE_FIELDS]
+        invoice.amount_paid, invoice.last_payment_at = totals.get(invoice.id, (Decimal('0'), None))
+        invoice.calculate_balance()
+        if [getattr(invoice, field) for field in BALANCE_FIELDS] != stored:
+            changed.append(invoice)
+    return changed
+
+
+def settled_status(invoice, today):
+    """The status the payments give ``invoice``: paid when they cover the total, reopened when they no longer do"""
+    if invoice.total > 0 and invoice.amount_paid >= invoice.total:
+        return 'paid'
+    if invoice.status == 'paid':
+        return 'overdue' if invoice.due_date < today else 'unpaid'
+    return invoice.status
+
+
+def refresh_invoice_balances(invoice_ids, notify=True):
+    """Recompute the balance fields of ``invoice_ids`` from their payments.
+
+    Three queries for any number of invoices: lock the rows (in primary key
+    order, so concurrent refreshes cannot deadlock), sum the payments and
+    update the rows that changed. Invoices whose amount paid changed also
+    get the status their payments give them (``settled_status``). Changed
+    invoices get a new ``updated_at`` so detail ETags change with them.
+
+    Sends ``invoices_bulk_updated`` once per user unless ``notify`` is off,
+    for callers that send their own signal for the batch. Returns the
+    changed invoices; ``invoice._previous_status`` is the status before.
+    """
+    invoice_ids = list(invoice_ids)
+    if not invoice_ids:
+        return []
+
+    with transaction.atomic():
+        invoices = list(
+            Invoice.objects.select_for_update().filter(id__in=invoice_ids).order_by('id')
+            .only('id', 'user_id', 'issue_date', 'due_date', 'status', 'total', *BALANCE_FIELDS)
+        )
+        paid_before = {invoice.id: invoice.amount_paid for invoice in invoices}
+        changed = expected_balances(invoices, payment_totals(invoice_ids))
+        if changed:
+            now = timezone.now()
+            for invoice in changed:
+                invoice._previous_status = invoice.status
+                if invoice.amount_paid != paid_before[invoice.id]:
+                    invoice.status = settled_status(invoice, now.date())
+                invoice.updated_at = now
+            Invoice.objects.bulk_update(changed, BALANCE_FIELDS + ['status', 'updated_at'])
+
+            if notify:
+                # Settled or reopened invoices move income between rollup days; otherwise only caches are stale
+                by_user = defaultdict(list)
+                for invoice in changed:
+                    by_user[invoice.user_id].append(invoice)
+                for user_id, user_invoices in by_user.items():
+                    statuses = {
+                        status for invoice in user_invoices if invoice.status != invoice._previous_status
+                        for status in (invoice.status, invoice._previous_status)
+                    }
+                    invoices_bulk_updated.send(
+                        sender=Invoice, user_id=user_id, invoice_ids=[invoice.id for invoice in user_invoices],
+                        issue_dates=[invoice.issue_date for invoice in user_invoices],
+                        fields=BALANCE_FIELDS + (['status'] if statuses else []), statuses=statuses
+                    )
+    return changed
+
+
+def verify_invoice_balances(invoices=None, chunk_size=VERIFY_CHUNK_SIZE):
+    """Yield ``(invoice, stored values)`` for every invoice whose balance fields are wrong.
+
+    Walks ``invoices`` (default: all) in primary key order, one chunk and
+    one payments aggregate at a time, without locking anything. The yielded
+    invoices carry the corrected values.
+    """
+    invoices = (invoices if invoices is not None else Invoice.objects.all()).order_by('id').only(
+        'id', 'user_id', 'status', 'total', *BALANCE_FIELDS
+    )
+    last_id = None
+    while True:
+        chunk = invoices.filter(id__gt=last_id) if last_id is not None else invoices
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+
+        stored = {invoice.id: tuple(getattr(invoice, field) for field in BALANCE_FIELDS) for invoice in chunk}
+        for invoice in expected_balances(chunk, payment_totals([invoice.id for invoice in chunk])):
+            yield invoice, stored[invoice.id]
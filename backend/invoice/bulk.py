@@ -0,0 +1,267 @@
+"""Bulk invoice import.
+
+``/api/invoice/bulk/`` accepts:
+
+- JSON: an array of invoices (or ``{"invoices": [...]}``), each shaped like
+  the body of a single invoice create with ``client`` given by id or name
+- NDJSON (``application/x-ndjson``): one such invoice object per line
+- CSV (``text/csv``): one item per line with the columns in
+  ``CSV_INVOICE_FIELDS`` and ``CSV_ITEM_FIELDS``; consecutive lines sharing
+  a ``reference`` form one invoice (its fields are read from the first line)
+
+NDJSON and CSV bodies are parsed lazily while the import runs. Records are
+handled in chunks of ``IMPORT_CHUNK_SIZE``: a chunk is validated without
+queries (clients come from an in-memory map), gets all its invoice numbers
+from one sequence update and is written with one ``bulk_create`` for the
+invoices and one for the items inside a single transaction. Rows imported
+as ``paid`` are settled like a bulk status change: one more ``bulk_create``
+records a manual payment of each total. A failing row is reported and
+skipped; it does not stop the rest of the import.
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction, IntegrityError, DataError
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from clients.models import Client
+from payment.models import InvoicePayment
+from .models import Invoice, InvoiceItem, invoices_bulk_created
+from .numbering import allocate_invoice_numbers, reserve_invoice_numbers
+from .serializers import InvoiceImportSerializer
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+INSERT_BATCH_SIZE = 5000
+
+CSV_INVOICE_FIELDS = (
+    'client', 'invoice_number', 'issue_date', 'due_date', 'status', 'tax_rate', 'notes', 'payment_terms', 'conditions'
+)
+CSV_ITEM_FIELDS = ('description', 'quantity', 'unit_price')
+CSV_REQUIRED_FIELDS = ('client', 'due_date', 'description', 'quantity', 'unit_price')
+
+
+def _text_stream(stream, parser_context):
+    encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+    return codecs.getreader(encoding)(stream)
+
+
+def iter_ndjson(stream):
+    """``(row, data, error)`` per non-blank line"""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError as exc:
+            yield line_number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+
+
+def iter_csv(stream):
+    """``(row, data, error)`` per invoice, grouping consecutive lines by ``reference``"""
+    reader = csv.DictReader(stream)
+    missing = [field for field in CSV_REQUIRED_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ParseError(f"CSV is missing the columns: {', '.join(missing)}")
+
+    record = reference = None
+    for line_number, line in enumerate(reader, start=2):
+        line_reference = (line.get('reference') or '').strip()
+        if record is None or not line_reference or line_reference != reference:
+            if record is not None:
+                yield record
+            # Blank cells are left out so the serializer defaults apply
+            data = {field: line[field] for field in CSV_INVOICE_FIELDS if line.get(field) not in (None, '')}
+            data['items'] = []
+            record, reference = (line_number, data, None), line_reference
+        record[1]['items'].append({field: line.get(field) for field in CSV_ITEM_FIELDS})
+
+    if record is not None:
+        yield record
+
+
+class NDJSONParser(BaseParser):
+    """Lazily parsed newline delimited JSON, one invoice per line"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return iter_ndjson(_text_stream(stream, parser_context))
+
+
+class CSVParser(BaseParser):
+    """Lazily parsed CSV, one invoice item per line"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return iter_csv(_text_stream(stream, parser_context))
+
+
+def import_records(data):
+    """``(row, data, error)`` records from parsed request data, or None if it holds no invoices"""
+    if isinstance(data, dict):
+        data = data.get('invoices')
+    if isinstance(data, list):
+        return ((row, invoice, None) for row, invoice in enumerate(data, start=1))
+    if data is None or isinstance(data, (str, dict)):
+        return None
+    return data
+
+
+class ClientMap:
+    """The user's clients by id and by (case-insensitive) name"""
+
+    def __init__(self, user):
+        self.by_id = {}
+        self.by_name = {}
+        for client in Client.objects.filter(user=user).only('id', 'name'):
+            self.by_id[str(client.id)] = client
+            self.by_name.setdefault(client.name.strip().casefold(), []).append(client)
+
+    def resolve(self, value):
+        value = value.strip()
+        client = self.by_id.get(value.lower())
+        if client is not None:
+            return client
+
+        matches = self.by_name.get(value.casefold(), [])
+        if len(matches) > 1:
+            raise LookupError(f'Several clients are named "{value}"; use the client id.')
+        if not matches:
+            raise LookupError(f'Unknown client "{value}".')
+        return matches[0]
+
+
+class InvoiceImporter:
+    """Validates and writes import records chunk by chunk, collecting a per-row report"""
+
+    def __init__(self, user, dry_run=False):
+        self.user = user
+        self.dry_run = dry_run
+        self.serializer = InvoiceImportSerializer(context={'clients': ClientMap(user)})
+        self.used_numbers = set()
+        self.results = []
+
+    def run(self, records):
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, IMPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            accepted = self.validate_chunk(chunk)
+            if accepted:
+                self.write_chunk(accepted)
+        return self.report()
+
+    def fail(self, row, errors):
+        self.results.append({'row': row, 'status': 'failed', 'errors': errors})
+
+    def validate_chunk(self, chunk):
+        valid = []
+        for row, data, error in chunk:
+            if error is None and not isinstance(data, dict):
+                error = {'non_field_errors': ['Expected an invoice object.']}
+            if error is None:
+                try:
+                    data = self.serializer.run_validation(data)
+                except serializers.ValidationError as exc:
+                    error = exc.detail
+            if error is not None:
+                self.fail(row, error)
+            else:
+                valid.append((row, data))
+
+        # Given invoice numbers must be new, both to the user and within the import
+        given = [data['invoice_number'] for _, data in valid if data.get('invoice_number')]
+        taken = set()
+        if given:
+            taken = set(
+                Invoice.objects.filter(user=self.user, invoice_number__in=given).values_list('invoice_number', flat=True)
+            )
+
+        accepted = []
+        for row, data in valid:
+            number = data.get('invoice_number')
+            if number:
+                if number in taken or number in self.used_numbers:
+                    self.fail(row, {'invoice_number': [f'Invoice number "{number}" is already used.']})
+                    continue
+                self.used_numbers.add(number)
+            accepted.append((row, data))
+        return accepted
+
+    def write_chunk(self, accepted):
+        if self.dry_run:
+            self.results.extend({'row': row, 'status': 'valid'} for row, _ in accepted)
+            return
+
+        try:
+            with transaction.atomic():
+                invoices = self.build_invoices([data for _, data in accepted])
+        except (IntegrityError, DataError) as exc:
+            for row, _ in accepted:
+                self.fail(row, {'non_field_errors': [f'Could not save this chunk of invoices: {exc}']})
+            return
+
+        self.results.extend(
+            {'row': row, 'status': 'created', 'id': str(invoice.id), 'invoice_number': invoice.invoice_number}
+            for (row, _), invoice in zip(accepted, invoices)
+        )
+
+    def build_invoices(self, invoices_data):
+        """Write one chunk: one number allocation, one INSERT per batch for invoices, items and paid rows' payments"""
+        # Chosen numbers in the user's format are reserved first, so neither this chunk nor later invoices reuse them
+        given = [data['invoice_number'] for data in invoices_data if data.get('invoice_number')]
+        if given:
+            reserve_invoice_numbers(self.user.id, given)
+        unnumbered = sum(1 for data in invoices_data if not data.get('invoice_number'))
+        numbers = iter(allocate_invoice_numbers(self.user.id, unnumbered) if unnumbered else [])
+        today = timezone.localdate()
+        now = timezone.now()
+
+        invoices, items = [], []
+        for data in invoices_data:
+            fields = {field: value for field, value in data.items() if field != 'items'}
+            fields['invoice_number'] = fields.get('invoice_number') or next(numbers)
+            fields.setdefault('issue_date', today)
+
+            invoice = Invoice(user=self.user, **fields)
+            invoice_items = InvoiceItem.objects.build(invoice, data['items'])
+            invoice.calculate_totals(item.amount for item in invoice_items)
+            if invoice.status == 'paid':
+                # Settled by the payment recorded below, so it does not count as outstanding
+                invoice.amount_paid, invoice.last_payment_at = invoice.total, now
+                invoice.calculate_balance()
+            invoices.append(invoice)
+            items.extend(invoice_items)
+
+        Invoice.objects.bulk_create(invoices, batch_size=INSERT_BATCH_SIZE)
+        InvoiceItem.objects.bulk_create(items, batch_size=INSERT_BATCH_SIZE)
+        paid = [invoice for invoice in invoices if invoice.status == 'paid' and invoice.total > 0]
+        if paid:
+            currency = self.user.profile.currency or 'usd'
+            InvoicePayment.objects.bulk_create([
+                InvoicePayment(
+                    invoice=invoice, gateway_name='manual', amount=invoice.total, currency=currency.lower(),
+                    status='completed', payment_date=now, metadata={'source': 'import'}
+                )
+                for invoice in paid
+            ], batch_size=INSERT_BATCH_SIZE)
+        # bulk_create skips post_save: refresh rollups, caches and search here
+        invoices_bulk_created.send(sender=Invoice, user_id=self.user.id, invoices=invoices)
+        return invoices
+
+    def report(self):
+        self.results.sort(key=lambda result: result['row'])
+        succeeded = 'valid' if self.dry_run else 'created'
+        return {
+            succeeded: sum(1 for result in self.results if result['status'] == succeeded),
+            'failed': sum(1 for result in self.results if result['status'] == 'failed'),
+            'results': self.results,
+        }
@@ -0,0 +1,45 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from invoice.transitions import mark_overdue_invoices, OVERDUE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Move unpaid invoices past their due date to overdue (safe to run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=OVERDUE_CHUNK_SIZE,
+                            help='Invoices updated per transaction')
+        parser.add_argument('--date', help='Treat this day (YYYY-MM-DD) as today')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sweeping every --interval seconds (for a worker process)')
+        parser.add_argument('--interval', type=int, default=300, help='Seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        chunk_size = max(1, options['chunk_size'])
+
+        while True:
+            self.sweep(today, chunk_size)
+            if not options['loop']:
+                break
+            # Do not hold an idle connection between sweeps
+            connection.close()
+            time.sleep(options['interval'])
+
+    def sweep(self, today, chunk_size):
+        started = time.monotonic()
+        result = mark_overdue_invoices(today=today, chunk_size=chunk_size)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {result['updated']} invoices overdue for {result['users']} users "
+            f"in {result['chunks']} chunks ({elapsed:.2f}s)"
+        ))
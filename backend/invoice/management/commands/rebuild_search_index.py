@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from invoice.models import Invoice
+from invoice.search import refresh_search_documents, SEARCH_FTS_TABLE
+
+
+class Command(BaseCommand):
+    help = 'Rebuild InvoiceSearchDocument rows (and the SQLite FTS5 index) from the invoices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild the given user id (can be repeated)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        invoices = Invoice.objects.order_by('pk')
+        if options['user_ids']:
+            invoices = invoices.filter(user_id__in=options['user_ids'])
+
+        invoice_ids = list(invoices.values_list('id', flat=True))
+        refresh_search_documents(invoice_ids)
+
+        if connection.vendor == 'sqlite' and not options['user_ids']:
+            # Re-derive the external-content FTS5 index from the documents table
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}) VALUES ('rebuild')")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt search documents for {len(invoice_ids)} invoices in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice.balances import BALANCE_FIELDS, VERIFY_CHUNK_SIZE, refresh_invoice_balances, verify_invoice_balances
+from invoice.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Check amount_paid, balance_due and last_payment_at of invoices against their payments (and fix them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recompute the invoices that do not match')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only check the given user id (can be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=VERIFY_CHUNK_SIZE,
+                            help='Invoices read per query')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        chunk_size = max(1, options['chunk_size'])
+
+        invoices = Invoice.objects.all()
+        if options['user_ids']:
+            invoices = invoices.filter(user_id__in=options['user_ids'])
+
+        mismatched, fixed, pending = 0, 0, []
+        for invoice, stored in verify_invoice_balances(invoices, chunk_size=chunk_size):
+            mismatched += 1
+            if options['verbosity'] >= 2:
+                expected = ', '.join(
+                    f'{field} {old} -> {getattr(invoice, field)}' for field, old in zip(BALANCE_FIELDS, stored)
+                    if old != getattr(invoice, field)
+                )
+                self.stdout.write(f'{invoice.id}: {expected}')
+            if options['fix']:
+                pending.append(invoice.id)
+                if len(pending) >= chunk_size:
+                    fixed += len(refresh_invoice_balances(pending))
+                    pending = []
+        if pending:
+            fixed += len(refresh_invoice_balances(pending))
+
+        elapsed = time.monotonic() - started
+        if mismatched and not options['fix']:
+            raise CommandError(f'{mismatched} invoices have wrong balances ({elapsed:.2f}s); run with --fix to repair them')
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked invoice balances: {mismatched} wrong, {fixed} fixed ({elapsed:.2f}s)'
+        ))
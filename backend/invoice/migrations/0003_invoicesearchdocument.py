@@ -0,0 +1,101 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+DOCUMENTS_TABLE = 'invoice_invoicesearchdocument'
+
+FTS_TABLE = 'invoice_search_fts'
+
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"content, content='{DOCUMENTS_TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENTS_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content); END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENTS_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content); END",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENTS_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content); "
+    f"INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content); END",
+]
+
+SQLITE_REVERSE = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    f"ALTER TABLE {DOCUMENTS_TABLE} ADD COLUMN search_vector tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED",
+    f"CREATE INDEX invoice_search_vector_gin ON {DOCUMENTS_TABLE} USING gin (user_id, search_vector)",
+    f"CREATE INDEX invoice_search_content_trgm ON {DOCUMENTS_TABLE} USING gin (content gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS invoice_search_content_trgm",
+    "DROP INDEX IF EXISTS invoice_search_vector_gin",
+    f"ALTER TABLE {DOCUMENTS_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _execute_for_vendor(schema_editor, sqlite_statements, postgres_statements):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': sqlite_statements, 'postgresql': postgres_statements}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_indexes(apps, schema_editor):
+    _execute_for_vendor(schema_editor, SQLITE_FORWARD, POSTGRES_FORWARD)
+
+
+def drop_search_indexes(apps, schema_editor):
+    _execute_for_vendor(schema_editor, SQLITE_REVERSE, POSTGRES_REVERSE)
+
+
+def backfill_search_documents(apps, schema_editor):
+    """Create a search document for every existing invoice"""
+    Invoice = apps.get_model('invoice', 'Invoice')
+    InvoiceSearchDocument = apps.get_model('invoice', 'InvoiceSearchDocument')
+
+    invoices = Invoice.objects.select_related('client').prefetch_related('items').order_by('pk')
+    documents = []
+    for invoice in invoices.iterator(chunk_size=1000):
+        parts = [invoice.invoice_number, invoice.client.name, *[item.description for item in invoice.items.all()],
+                 invoice.notes]
+        documents.append(InvoiceSearchDocument(
+            invoice_id=invoice.pk, user_id=invoice.user_id, content=' '.join(part for part in parts if part)
+        ))
+        if len(documents) == 1000:
+            InvoiceSearchDocument.objects.bulk_create(documents)
+            documents = []
+    InvoiceSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0002_invoicesequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('invoice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='invoice.invoice')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
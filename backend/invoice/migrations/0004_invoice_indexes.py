@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_alter_client_address_alter_client_city_and_more'),
+        ('invoice', '0003_invoicesearchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['user', 'status', 'issue_date'], name='invoice_user_status_issue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='invoice_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['user', 'status', 'due_date'], name='invoice_user_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('status', 'unpaid')), fields=['user', 'due_date'], name='invoice_unpaid_due_idx'),
+        ),
+    ]
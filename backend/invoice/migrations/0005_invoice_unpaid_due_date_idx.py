@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_alter_client_address_alter_client_city_and_more'),
+        ('invoice', '0004_invoice_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('status', 'unpaid')), fields=['due_date', 'id'], name='invoice_unpaid_due_date_idx'),
+        ),
+    ]
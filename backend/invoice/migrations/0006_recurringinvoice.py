@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_alter_client_address_alter_client_city_and_more'),
+        ('invoice', '0005_invoice_unpaid_due_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringInvoiceItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=255)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='recurring_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RecurringInvoice',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('frequency', models.CharField(choices=[('weekly', 'Weekly'), ('monthly', 'Monthly'), ('quarterly', 'Quarterly'), ('yearly', 'Yearly')], default='monthly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Issue every N periods')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, help_text='No invoices are issued after this date', null=True)),
+                ('next_run', models.DateField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('days_until_due', models.PositiveSmallIntegerField(default=14)),
+                ('tax_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('notes', models.TextField(blank=True)),
+                ('payment_terms', models.CharField(blank=True, default='Payment due within 14 days of issue', max_length=255)),
+                ('conditions', models.TextField(blank=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_invoices', to='clients.client')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_invoices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='recurring_invoice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoices', to='invoice.recurringinvoice'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoice',
+            constraint=models.UniqueConstraint(fields=('recurring_invoice', 'recurring_date'), name='invoice_recurring_date_uniq'),
+        ),
+        migrations.AddField(
+            model_name='recurringinvoiceitem',
+            name='recurring_invoice',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='invoice.recurringinvoice'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringinvoice',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_run', 'id'], name='recurring_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringinvoice',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='recurring_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_balances(apps, schema_editor):
+    """Set amount_paid, last_payment_at and balance_due from the completed payments"""
+    Invoice = apps.get_model('invoice', 'Invoice')
+    InvoicePayment = apps.get_model('payment', 'InvoicePayment')
+    money = DecimalField(max_digits=10, decimal_places=2)
+
+    completed = InvoicePayment.objects.filter(invoice=OuterRef('pk'), status='completed').order_by().values('invoice')
+    Invoice.objects.update(
+        amount_paid=Coalesce(
+            Subquery(completed.annotate(amount=Sum('amount')).values('amount')), Value(0), output_field=money
+        ),
+        last_payment_at=Subquery(completed.annotate(latest=Max('payment_date')).values('latest')),
+    )
+    Invoice.objects.exclude(status='paid').update(
+        balance_due=Greatest(F('total') - F('amount_paid'), Value(0), output_field=money)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_alter_client_address_alter_client_city_and_more'),
+        ('invoice', '0006_recurringinvoice'),
+        ('payment', '0003_invoicepayment_manual_gateway'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='balance_due',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='last_payment_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('balance_due__gt', 0)), fields=['user', 'due_date', 'balance_due'], name='invoice_open_balance_idx'),
+        ),
+    ]
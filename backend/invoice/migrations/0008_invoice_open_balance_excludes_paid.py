@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_alter_client_address_alter_client_city_and_more'),
+        ('invoice', '0007_invoice_balances'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='invoice',
+            name='invoice_open_balance_idx',
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('balance_due__gt', 0), models.Q(('status', 'paid'), _negated=True)), fields=['user', 'due_date', 'balance_due'], name='invoice_open_balance_idx'),
+        ),
+    ]
@@ -1,10 +1,36 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
 from django.conf import settings
 from django.utils import timezone
 from clients.models import Client
+from decimal import Decimal
 import uuid
 
 
+# Invoices that still count as owed: a paid invoice is settled even when no payment was recorded for it
+# (marked paid by hand or imported), so only unpaid and overdue balances are outstanding
+OPEN_BALANCE = Q(balance_due__gt=0) & ~Q(status='paid')
+
+
+class InvoiceManager(models.Manager):
+    def create_with_items(self, items_data, **fields):
+        """Create an invoice and its items with one invoice INSERT and one bulk item INSERT.
+
+        Totals are computed in Python from the new items before the invoice is
+        written, so the invoice row (and its signals) is saved exactly once.
+        """
+        with transaction.atomic():
+            invoice = self.model(**fields)
+            items = InvoiceItem.objects.build(invoice, items_data)
+            invoice.calculate_totals(item.amount for item in items)
+            invoice.save()
+            InvoiceItem.objects.bulk_create(items)
+        return invoice
+
+
 class Invoice(models.Model):
     """Invoice model for storing invoice information"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -16,7 +42,7 @@ class Invoice(models.Model):
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='invoices')
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='invoices')
-    invoice_number = models.CharField(max_length=50, unique=True, blank=True)
+    invoice_number = models.CharField(max_length=50, blank=True)
     issue_date = models.DateField(default=timezone.now)
     due_date = models.DateField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='unpaid')
@@ -27,41 +53,138 @@ class Invoice(models.Model):
     tax_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Maintained from the completed payments by invoice/balances.py; never set these directly
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    balance_due = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    last_payment_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Set on invoices generated from a recurring template, for the scheduled date they were generated for
+    recurring_invoice = models.ForeignKey('RecurringInvoice', on_delete=models.SET_NULL, null=True, blank=True,
+                                          related_name='invoices')
+    recurring_date = models.DateField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = InvoiceManager()
+    
     def __str__(self):
         return f"Invoice #{self.invoice_number} - {self.client.name}"
     
+    def calculate_totals(self, amounts):
+        """Set subtotal, tax_amount and total from item amounts (does not save)"""
+        self.subtotal = sum(amounts, Decimal('0'))
+        self.tax_amount = self.subtotal * (Decimal(str(self.tax_rate)) / 100)
+        self.total = self.subtotal + self.tax_amount
+        self.calculate_balance()
+    
+    def calculate_balance(self):
+        """Set balance_due from total and amount_paid (does not save)"""
+        self.balance_due = max(Decimal(str(self.total)) - Decimal(str(self.amount_paid)), Decimal('0'))
+    
+    def recalculate_totals(self):
+        """Recompute the totals from the stored items with one aggregate query and save"""
+        subtotal = self.items.aggregate(subtotal=Sum('amount'))['subtotal']
+        self.calculate_totals([subtotal or Decimal('0')])
+        self.save()
+    
     def save(self, *args, **kwargs):
-        # Generate invoice number if not provided
+        # Generate invoice number if not provided, from the user's own sequence
         if not self.invoice_number:
-            # Format: INV-YEAR-MONTH-XXXX (e.g., INV-2025-09-0001)
-            today = timezone.now()
-            year_month = today.strftime('%Y-%m')
-            
-            # Get the latest invoice number for this user and month
-            latest_invoice = Invoice.objects.latest('invoice_number')
-
-            
-            if latest_invoice:
-                # Extract the last number and increment
-                try:
-                    last_number = int(latest_invoice.invoice_number.split('-')[-1])
-                    next_number = last_number + 1
-                except (ValueError, IndexError):
-                    next_number = 1
-            else:
-                next_number = 1
-            
-            # Create the new invoice number
-            self.invoice_number = f'INV-{year_month}-{next_number:04d}'
+            from .numbering import next_invoice_number
+            self.invoice_number = next_invoice_number(self.user_id)
+        
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding:
+            self.calculate_balance()
+        elif update_fields is None or 'total' in update_fields:
+            with transaction.atomic():
+                # Payments change amount_paid under this row lock, so read it fresh instead of writing back a stale copy
+                paid = Invoice.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'amount_paid', 'last_payment_at'
+                ).first()
+                if paid:
+                    self.amount_paid, self.last_payment_at = paid
+                self.calculate_balance()
+                if update_fields is not None:
+                    kwargs['update_fields'] = set(update_fields) | {'balance_due'}
+                super().save(*args, **kwargs)
+            return
         
         super().save(*args, **kwargs)
     
     class Meta:
         ordering = ['-created_at']
+        # Numbers come from per-user sequences, so they are only unique within a user
+        unique_together = ('user', 'invoice_number')
+        indexes = [
+            # Paid income by issue date (analytics, rollup rebuilds)
+            models.Index(fields=['user', 'status', 'issue_date'], name='invoice_user_status_issue_idx'),
+            # Lists, dashboard and the (created_at, id) cursor
+            models.Index(fields=['user', 'created_at', 'id'], name='invoice_user_created_idx'),
+            # Overdue invoices
+            models.Index(fields=['user', 'status', 'due_date'], name='invoice_user_status_due_idx'),
+            # Upcoming payments only ever look at unpaid invoices
+            models.Index(fields=['user', 'due_date'], condition=Q(status='unpaid'), name='invoice_unpaid_due_idx'),
+            # The cross-tenant overdue sweep; swept rows drop out of the index
+            models.Index(fields=['due_date', 'id'], condition=Q(status='unpaid'), name='invoice_unpaid_due_date_idx'),
+            # Outstanding balance and aging, read from the index alone; settled invoices drop out
+            models.Index(fields=['user', 'due_date', 'balance_due'], condition=OPEN_BALANCE,
+                         name='invoice_open_balance_idx'),
+        ]
+        constraints = [
+            # A template produces at most one invoice per scheduled date, however often the generator runs
+            models.UniqueConstraint(fields=['recurring_invoice', 'recurring_date'], name='invoice_recurring_date_uniq'),
+        ]
+
+
+class InvoiceItemManager(models.Manager):
+    def build(self, invoice, items_data):
+        """Unsaved items for ``invoice`` with their amounts calculated, ready for bulk_create"""
+        items = [
+            self.model(invoice=invoice, **{field: value for field, value in item_data.items() if field != 'id'})
+            for item_data in items_data
+        ]
+        for item in items:
+            item.calculate_amount()
+        return items
+    
+    def sync_for_invoice(self, invoice, items_data):
+        """Apply a submitted item list to a saved invoice, matching items by ``id``.
+        
+        Submitted items with an id are updated if a field changed, items
+        without one are created and stored items missing from the list are
+        deleted. Unchanged items keep their rows and primary keys. Costs one
+        read, one bulk UPDATE, one bulk INSERT, one DELETE and one invoice save
+        however many items there are.
+        """
+        with transaction.atomic():
+            existing = {item.pk: item for item in invoice.items.all()}
+            kept, changed, new_items_data = [], [], []
+            
+            for item_data in items_data:
+                item = existing.pop(item_data.get('id'), None)
+                if item is None:
+                    new_items_data.append(item_data)
+                    continue
+                
+                values = {field: value for field, value in item_data.items() if field != 'id'}
+                if any(getattr(item, field) != value for field, value in values.items()):
+                    for field, value in values.items():
+                        setattr(item, field, value)
+                    item.calculate_amount()
+                    changed.append(item)
+                kept.append(item)
+            
+            if existing:
+                # Through the related manager, so delete signals get the invoice without a query per item
+                invoice.items.filter(pk__in=list(existing)).delete()
+            if changed:
+                self.bulk_update(changed, ['description', 'quantity', 'unit_price', 'amount'])
+            created = self.bulk_create(self.build(invoice, new_items_data))
+            
+            invoice.calculate_totals(item.amount for item in kept + created)
+            invoice.save()
+        return kept + created
 
 
 class InvoiceItem(models.Model):
@@ -72,18 +195,212 @@ class InvoiceItem(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     
+    objects = InvoiceItemManager()
+    
     def __str__(self):
         return f"{self.description} - {self.invoice.invoice_number}"
     
-    def save(self, *args, **kwargs):
-        # Calculate amount
+    def calculate_amount(self):
         self.amount = self.quantity * self.unit_price
+    
+    def save(self, *args, **kwargs):
+        # Single item writes (e.g. the admin); bulk writes go through InvoiceItemManager
+        self.calculate_amount()
         super().save(*args, **kwargs)
         
         # Update invoice totals
-        invoice = self.invoice
-        items = invoice.items.all()
-        invoice.subtotal = sum(item.amount for item in items)
-        invoice.tax_amount = invoice.subtotal * (invoice.tax_rate / 100)
-        invoice.total = invoice.subtotal + invoice.tax_amount
-        invoice.save()
+        self.invoice.recalculate_totals()
+
+
+class InvoiceSequenceManager(models.Manager):
+    def allocate(self, user_id, period, count=1, seed=None):
+        """Reserve ``count`` consecutive numbers and return the first one.
+
+        The increment is a single ``UPDATE ... SET last_number = last_number + count``.
+        The row lock it takes is held until the surrounding transaction ends, so
+        concurrent workers allocating for the same user and period queue up on
+        the row instead of reading the same value. ``seed`` (a number or a
+        callable) is the last number already in use when the row is created.
+        """
+        with transaction.atomic():
+            updated = self.filter(user_id=user_id, period=period).update(last_number=F('last_number') + count)
+            if not updated:
+                start = seed() if callable(seed) else (seed or 0)
+                try:
+                    with transaction.atomic():
+                        self.create(user_id=user_id, period=period, last_number=start + count)
+                    return start + 1
+                except IntegrityError:
+                    # Another worker created the row first, increment theirs
+                    self.filter(user_id=user_id, period=period).update(last_number=F('last_number') + count)
+            
+            last_number = self.filter(user_id=user_id, period=period).values_list('last_number', flat=True).get()
+        return last_number - count + 1
+    
+    def advance(self, user_id, period, number):
+        """Make sure the sequence hands out numbers above ``number``, one used without ``allocate``.
+        
+        Never moves the sequence back; creates the row at ``number`` if the
+        period has none yet.
+        """
+        with transaction.atomic():
+            updated = self.filter(user_id=user_id, period=period).update(last_number=Greatest(F('last_number'), number))
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        self.create(user_id=user_id, period=period, last_number=number)
+                except IntegrityError:
+                    # Created by a concurrent allocation in the meantime
+                    self.filter(user_id=user_id, period=period).update(last_number=Greatest(F('last_number'), number))
+
+
+class InvoiceSequence(models.Model):
+    """Last invoice number handed out per user and numbering period.
+
+    ``period`` is ``YYYY-MM`` or ``YYYY`` when the user's number format resets
+    monthly or yearly, and empty for a continuous sequence.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='invoice_sequences')
+    period = models.CharField(max_length=7, blank=True)
+    last_number = models.PositiveIntegerField(default=0)
+    
+    objects = InvoiceSequenceManager()
+    
+    def __str__(self):
+        return f"{self.user} - {self.period or 'all'}: {self.last_number}"
+    
+    class Meta:
+        unique_together = ('user', 'period')
+
+
+class RecurringInvoice(models.Model):
+    """Template for an invoice that is issued on a schedule (e.g. a monthly retainer).
+
+    ``next_run`` is the next scheduled issue date. The generator
+    (``invoice/recurring.py``) creates the invoice for every due date up to
+    today and moves ``next_run`` past them in the same transaction.
+    Monthly and longer schedules keep the day of ``start_date`` (clamped to
+    the end of shorter months).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    FREQUENCY_CHOICES = (
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('quarterly', 'Quarterly'),
+        ('yearly', 'Yearly'),
+    )
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recurring_invoices')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='recurring_invoices')
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='monthly')
+    interval = models.PositiveSmallIntegerField(default=1, help_text='Issue every N periods')
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True, help_text='No invoices are issued after this date')
+    next_run = models.DateField()
+    is_active = models.BooleanField(default=True)
+    days_until_due = models.PositiveSmallIntegerField(default=14)
+    tax_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    notes = models.TextField(blank=True)
+    payment_terms = models.CharField(max_length=255, blank=True, default='Payment due within 14 days of issue')
+    conditions = models.TextField(blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.get_frequency_display()} invoice for {self.client.name}"
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Due templates for the generator; paused and finished templates drop out
+            models.Index(fields=['next_run', 'id'], condition=Q(is_active=True), name='recurring_due_idx'),
+            # Template list and its (created_at, id) cursor
+            models.Index(fields=['user', 'created_at', 'id'], name='recurring_user_created_idx'),
+        ]
+
+
+class RecurringInvoiceItem(models.Model):
+    """Line copied onto every invoice generated from a template"""
+    recurring_invoice = models.ForeignKey(RecurringInvoice, on_delete=models.CASCADE, related_name='items')
+    description = models.CharField(max_length=255)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.description} - {self.recurring_invoice_id}"
+
+
+class InvoiceSearchDocument(models.Model):
+    """Denormalized search text of one invoice.
+
+    ``content`` joins the invoice number, client name, item descriptions and
+    notes. The database indexes it: a tsvector plus trigram GIN indexes on
+    Postgres, an FTS5 table kept in sync by triggers on SQLite (see
+    ``invoice/search.py`` and migration 0003).
+    """
+    invoice = models.OneToOneField(Invoice, on_delete=models.CASCADE, related_name='search_document')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    content = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Search document for {self.invoice_id}"
+
+
+# Sent after invoices (and their items) are written with bulk_create, which
+# skips post_save. Receivers get ``user_id`` and the saved ``invoices``.
+invoices_bulk_created = Signal()
+
+# Sent after a set-based QuerySet.update() of a user's invoices. Receivers get
+# ``user_id``, ``invoice_ids``, their ``issue_dates``, the updated ``fields``
+# and, for status changes, the old and new ``statuses`` involved.
+invoices_bulk_updated = Signal()
+
+
+# Keep search documents in sync. Refreshes run after commit, so bulk item
+# writes that save the invoice before inserting its items are indexed too.
+
+def schedule_search_refresh(invoice_ids):
+    invoice_ids = [invoice_id for invoice_id in invoice_ids if invoice_id is not None]
+    if invoice_ids:
+        from .search import refresh_search_documents
+        transaction.on_commit(lambda: refresh_search_documents(invoice_ids))
+
+
+@receiver(post_save, sender=Invoice)
+def refresh_invoice_search_document(sender, instance, **kwargs):
+    schedule_search_refresh([instance.pk])
+
+
+@receiver(invoices_bulk_created)
+def refresh_bulk_created_search_documents(sender, invoices, **kwargs):
+    schedule_search_refresh([invoice.pk for invoice in invoices])
+
+
+@receiver(post_delete, sender=InvoiceItem)
+def refresh_search_document_for_item(sender, instance, **kwargs):
+    # Item saves already save the invoice; only deletes need their own refresh
+    schedule_search_refresh([instance.invoice_id])
+
+
+@receiver(post_delete, sender=Invoice)
+def discard_cached_invoice_pdfs(sender, instance, **kwargs):
+    from .rendering import delete_cached_pdfs
+    invoice_id = instance.pk
+    transaction.on_commit(lambda: delete_cached_pdfs(invoice_id))
+
+
+@receiver(pre_save, sender=Client)
+def remember_client_name(sender, instance, **kwargs):
+    instance._previous_name = None
+    if not instance._state.adding:
+        instance._previous_name = Client.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Client)
+def refresh_search_documents_for_client(sender, instance, created, **kwargs):
+    # Only a rename changes the indexed text of the client's invoices
+    if not created and getattr(instance, '_previous_name', None) != instance.name:
+        schedule_search_refresh(list(instance.invoices.values_list('id', flat=True)))
@@ -0,0 +1,167 @@
+"""Invoice number generation from per-user sequences.
+
+A user's number format (``UserProfile.invoice_number_format``) is a Python
+format string with the placeholders ``{year}``, ``{month}`` and ``{number}``,
+e.g. ``INV-{year}-{month:02d}-{number:04d}``. The placeholders used decide
+when numbering restarts: monthly if ``{month}`` appears, yearly if only
+``{year}`` does, never otherwise. Each (user, period) pair has one
+``InvoiceSequence`` row, so handing out a number is a single-row update no
+matter how many invoices exist.
+"""
+import re
+import string
+from datetime import date
+
+from django.utils import timezone
+
+from users.models import UserProfile, DEFAULT_INVOICE_NUMBER_FORMAT
+from .models import Invoice, InvoiceSequence
+
+
+NUMBER_FORMAT_FIELDS = ('year', 'month', 'number')
+
+MAX_INVOICE_NUMBER_LENGTH = 50
+
+
+class _NumberMarker:
+    """Stands in for ``{number}`` so the text around it can be rendered"""
+    MARK = '\x00'
+
+    def __format__(self, format_spec):
+        return self.MARK
+
+
+def _format_fields(number_format):
+    return [field for _, field, _, _ in string.Formatter().parse(number_format) if field is not None]
+
+
+def validate_number_format(number_format):
+    """Raise ValueError unless ``number_format`` renders a usable invoice number"""
+    fields = _format_fields(number_format)
+    unknown = sorted({field for field in fields if field not in NUMBER_FORMAT_FIELDS})
+    if unknown:
+        placeholders = ', '.join('{' + field + '}' for field in unknown)
+        raise ValueError(f'Unknown placeholders: {placeholders}. Use {{year}}, {{month}} and {{number}}.')
+    if fields.count('number') != 1:
+        raise ValueError('The format must contain {number} exactly once.')
+
+    sample = format_invoice_number(number_format, timezone.now(), 999999)
+    if len(sample) > MAX_INVOICE_NUMBER_LENGTH:
+        raise ValueError(f'Invoice numbers may be at most {MAX_INVOICE_NUMBER_LENGTH} characters long.')
+
+
+def format_invoice_number(number_format, issued_at, number):
+    return number_format.format(year=issued_at.year, month=issued_at.month, number=number)
+
+
+def number_period(number_format, issued_at):
+    """Sequence period key: ``YYYY-MM`` for monthly, ``YYYY`` for yearly, ``''`` for continuous numbering"""
+    fields = _format_fields(number_format)
+    if 'month' in fields:
+        return f'{issued_at.year:04d}-{issued_at.month:02d}'
+    if 'year' in fields:
+        return f'{issued_at.year:04d}'
+    return ''
+
+
+def get_number_format(user_id):
+    number_format = UserProfile.objects.filter(user_id=user_id).values_list('invoice_number_format', flat=True).first()
+    return number_format or DEFAULT_INVOICE_NUMBER_FORMAT
+
+
+def highest_existing_number(user_id, number_format, issued_at):
+    """Largest number already used by the user's invoices in this format and period.
+
+    Seeds a sequence the first time it is used, so numbers created before the
+    sequence existed (or by another format with the same shape) are skipped.
+    """
+    rendered = number_format.format(year=issued_at.year, month=issued_at.month, number=_NumberMarker())
+    prefix, suffix = rendered.split(_NumberMarker.MARK)
+
+    existing = (
+        Invoice.objects.filter(user_id=user_id, invoice_number__startswith=prefix, invoice_number__endswith=suffix)
+        .values_list('invoice_number', flat=True)
+        .iterator()
+    )
+    highest = 0
+    for invoice_number in existing:
+        digits = invoice_number[len(prefix):len(invoice_number) - len(suffix)]
+        if digits.isdigit():
+            highest = max(highest, int(digits))
+    return highest
+
+
+def allocate_invoice_numbers(user_id, count=1, issued_at=None):
+    """Reserve ``count`` consecutive invoice numbers for a user with one sequence update.
+
+    Numbers can also be written without the sequence (imported invoices,
+    admin edits). If one of the reserved numbers is already taken, the
+    sequence is moved past the highest number in use and the block is
+    reserved again, so callers never hit the ``(user, invoice_number)``
+    unique constraint.
+    """
+    issued_at = issued_at or timezone.now()
+    number_format = get_number_format(user_id)
+    period = number_period(number_format, issued_at)
+    seed = lambda: highest_existing_number(user_id, number_format, issued_at)
+
+    first = InvoiceSequence.objects.allocate(user_id, period, count, seed=seed)
+    numbers = [format_invoice_number(number_format, issued_at, number) for number in range(first, first + count)]
+    if Invoice.objects.filter(user_id=user_id, invoice_number__in=numbers).exists():
+        InvoiceSequence.objects.advance(user_id, period, seed())
+        first = InvoiceSequence.objects.allocate(user_id, period, count, seed=seed)
+        numbers = [format_invoice_number(number_format, issued_at, number) for number in range(first, first + count)]
+    return numbers
+
+
+def _number_pattern(number_format):
+    """Regex matching the numbers ``number_format`` renders, capturing year, month and number"""
+    parts, seen = [], set()
+    for literal, field, format_spec, _ in string.Formatter().parse(number_format):
+        parts.append(re.escape(literal))
+        if field is None:
+            continue
+        if field in seen:
+            parts.append(f'(?P={field})')
+            continue
+        seen.add(field)
+        width = re.fullmatch(r'0?(\d+)d', format_spec or '')
+        digits = {'year': r'\d{4}', 'month': r'\d{1,2}'}.get(field, r'\d+')
+        if width:
+            digits = rf'\d{{{width.group(1)},}}'
+        parts.append(f'(?P<{field}>{digits})')
+    return re.compile(''.join(parts))
+
+
+def parse_invoice_number(number_format, invoice_number):
+    """``(period, number)`` if ``invoice_number`` has the shape of ``number_format``, else ``None``"""
+    match = _number_pattern(number_format).fullmatch(invoice_number)
+    if not match:
+        return None
+    values = match.groupdict()
+    year = int(values.get('year') or timezone.now().year)
+    month = int(values.get('month') or 1)
+    if not 1 <= month <= 12:
+        return None
+    return number_period(number_format, date(year, month, 1)), int(values['number'])
+
+
+def reserve_invoice_numbers(user_id, invoice_numbers):
+    """Move the user's sequences past chosen numbers (e.g. imported ones) that have the user's format.
+
+    One sequence update per numbering period involved, so the allocator
+    never hands these numbers out again.
+    """
+    number_format = get_number_format(user_id)
+    highest = {}
+    for invoice_number in invoice_numbers:
+        parsed = parse_invoice_number(number_format, invoice_number)
+        if parsed:
+            period, number = parsed
+            highest[period] = max(highest.get(period, 0), number)
+    for period, number in highest.items():
+        InvoiceSequence.objects.advance(user_id, period, number)
+
+
+def next_invoice_number(user_id, issued_at=None):
+    return allocate_invoice_numbers(user_id, 1, issued_at)[0]
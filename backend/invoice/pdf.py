@@ -0,0 +1,253 @@
+"""Invoice PDF layout and a minimal PDF writer.
+
+Pages are drawn with the standard Helvetica fonts, which every PDF reader
+ships, so nothing has to be embedded and no PDF library is needed. Text is
+encoded as WinAnsi (characters outside it print as ``?``).
+
+This module has no Django imports: ``render_invoice`` takes the plain dict
+built by ``invoice.rendering.invoice_pdf_data`` so it can run in the
+render pool's worker processes.
+"""
+import zlib
+
+
+PAGE_WIDTH, PAGE_HEIGHT = 595.28, 841.89  # A4 in points
+MARGIN = 50
+
+# Advance widths (1/1000 em) of the printable ASCII characters, from the Adobe AFM files
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+
+FONTS = {
+    'regular': ('F1', 'Helvetica', HELVETICA_WIDTHS),
+    'bold': ('F2', 'Helvetica-Bold', HELVETICA_BOLD_WIDTHS),
+}
+
+
+def _winansi(value):
+    """``value`` as a str of WinAnsi byte values (one char per byte)"""
+    return str(value).encode('cp1252', 'replace').decode('latin-1')
+
+
+def text_width(value, size, font='regular'):
+    widths = FONTS[font][2]
+    units = sum(widths[ord(char) - 32] if 32 <= ord(char) < 127 else 556 for char in _winansi(value))
+    return units * size / 1000
+
+
+def wrap_text(value, width, size, font='regular'):
+    """Split ``value`` into lines no wider than ``width`` (long words are not broken)"""
+    lines = []
+    for paragraph in str(value).splitlines() or ['']:
+        line = ''
+        for word in paragraph.split():
+            candidate = f'{line} {word}' if line else word
+            if line and text_width(candidate, size, font) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+class PDFDocument:
+    """Pages of text, lines and filled boxes, serialized with ``to_bytes``"""
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+
+    def text(self, x, y, value, size=10, font='regular', align='left'):
+        if align == 'right':
+            x -= text_width(value, size, font)
+        escaped = _winansi(value).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        self.ops.append(f'BT /{FONTS[font][0]} {size} Tf {x:.2f} {y:.2f} Td ({escaped}) Tj ET')
+
+    def line(self, x1, y1, x2, y2, width=0.5, gray=0.75):
+        self.ops.append(f'{gray} G {width} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S')
+
+    def box(self, x, y, width, height, gray=0.94):
+        self.ops.append(f'{gray} g {x:.2f} {y:.2f} {width:.2f} {height:.2f} re f 0 g')
+
+    def to_bytes(self):
+        objects = [
+            '<< /Type /Catalog /Pages 2 0 R >>',
+            None,  # page tree, filled in once the page object numbers are known
+        ]
+        for resource, name, _ in FONTS.values():
+            objects.append(f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>')
+        fonts = ' '.join(f'/{resource} {index} 0 R' for index, (resource, _, _) in enumerate(FONTS.values(), start=3))
+
+        page_numbers = []
+        for ops in self.pages:
+            stream = zlib.compress('\n'.join(ops).encode('latin-1'))
+            objects.append(
+                f'<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'.encode('latin-1') + stream + b'\nendstream'
+            )
+            objects.append(
+                f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                f'/Resources << /Font << {fonts} >> >> /Contents {len(objects)} 0 R >>'
+            )
+            page_numbers.append(len(objects))
+        kids = ' '.join(f'{number} 0 R' for number in page_numbers)
+        objects[1] = f'<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>'
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            if isinstance(body, str):
+                body = body.encode('latin-1')
+            output += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+
+        xref = len(output)
+        output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+        output += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+        output += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+        return bytes(output)
+
+
+class InvoiceLayout:
+    """Draws one invoice onto a ``PDFDocument``, starting new pages as needed"""
+    RIGHT = PAGE_WIDTH - MARGIN
+    BOTTOM = MARGIN + 30
+    DESCRIPTION_WIDTH = 250
+    # Right edges of the quantity, unit price and amount columns
+    COLUMNS = (360, 450, PAGE_WIDTH - MARGIN - 6)
+
+    def __init__(self, data):
+        self.data = data
+        self.pdf = PDFDocument()
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def money(self, value):
+        return f"{self.data['currency']} {value}"
+
+    def ensure_space(self, height, table_header=False):
+        if self.y - height >= self.BOTTOM:
+            return
+        self.pdf.new_page()
+        self.y = PAGE_HEIGHT - MARGIN
+        if table_header:
+            self.draw_table_header()
+
+    def draw_header(self):
+        data, pdf = self.data, self.pdf
+        seller = data['seller']
+        pdf.text(MARGIN, self.y - 16, seller['name'], size=16, font='bold')
+        pdf.text(self.RIGHT, self.y - 18, 'INVOICE', size=22, font='bold', align='right')
+
+        y = self.y - 34
+        for line in seller['lines']:
+            pdf.text(MARGIN, y, line, size=9)
+            y -= 12
+
+        meta = [
+            ('Invoice #', data['invoice_number']),
+            ('Issue date', data['issue_date']),
+            ('Due date', data['due_date']),
+            ('Status', data['status']),
+        ]
+        meta_y = self.y - 40
+        for label, value in meta:
+            pdf.text(self.RIGHT - 110, meta_y, label, size=9, align='right')
+            pdf.text(self.RIGHT, meta_y, value, size=9, font='bold', align='right')
+            meta_y -= 13
+        self.y = min(y, meta_y) - 16
+
+        pdf.text(MARGIN, self.y, 'BILL TO', size=8, font='bold')
+        self.y -= 14
+        pdf.text(MARGIN, self.y, data['client']['name'], size=11, font='bold')
+        for line in data['client']['lines']:
+            self.y -= 12
+            pdf.text(MARGIN, self.y, line, size=9)
+        self.y -= 26
+
+    def draw_table_header(self):
+        pdf = self.pdf
+        pdf.box(MARGIN, self.y - 6, self.RIGHT - MARGIN, 20)
+        pdf.text(MARGIN + 6, self.y, 'Description', size=9, font='bold')
+        for right, label in zip(self.COLUMNS, ('Qty', 'Unit price', 'Amount')):
+            pdf.text(right, self.y, label, size=9, font='bold', align='right')
+        self.y -= 22
+
+    def draw_items(self):
+        self.draw_table_header()
+        for item in self.data['items']:
+            lines = wrap_text(item['description'], self.DESCRIPTION_WIDTH, 10)
+            self.ensure_space(len(lines) * 12 + 8, table_header=True)
+            for right, value in zip(self.COLUMNS, (item['quantity'], item['unit_price'], self.money(item['amount']))):
+                self.pdf.text(right, self.y, value, size=10, align='right')
+            for line in lines:
+                self.pdf.text(MARGIN + 6, self.y, line, size=10)
+                self.y -= 12
+            self.pdf.line(MARGIN, self.y + 4, self.RIGHT, self.y + 4)
+            self.y -= 8
+
+    def draw_totals(self):
+        data = self.data
+        rows = [
+            ('Subtotal', self.money(data['subtotal']), 'regular'),
+            (f"Tax ({data['tax_rate']}%)", self.money(data['tax_amount']), 'regular'),
+            ('Total', self.money(data['total']), 'bold'),
+        ]
+        self.ensure_space(len(rows) * 16 + 10)
+        self.y -= 6
+        for label, value, font in rows:
+            self.pdf.text(self.COLUMNS[1], self.y, label, size=10, font=font, align='right')
+            self.pdf.text(self.COLUMNS[2], self.y, value, size=10, font=font, align='right')
+            self.y -= 16
+        self.y -= 14
+
+    def draw_section(self, title, value):
+        if not value:
+            return
+        lines = wrap_text(value, self.RIGHT - MARGIN, 9)
+        self.ensure_space(26)
+        self.pdf.text(MARGIN, self.y, title, size=9, font='bold')
+        self.y -= 13
+        for line in lines:
+            self.ensure_space(12)
+            self.pdf.text(MARGIN, self.y, line, size=9)
+            self.y -= 12
+        self.y -= 10
+
+    def draw_page_numbers(self):
+        count = len(self.pdf.pages)
+        for number, ops in enumerate(self.pdf.pages, start=1):
+            self.pdf.ops = ops
+            self.pdf.text(self.RIGHT, MARGIN - 10, f'Page {number} of {count}', size=8, align='right')
+
+    def render(self):
+        self.draw_header()
+        self.draw_items()
+        self.draw_totals()
+        self.draw_section('Notes', self.data['notes'])
+        self.draw_section('Payment terms', self.data['payment_terms'])
+        self.draw_section('Terms and conditions', self.data['conditions'])
+        self.draw_page_numbers()
+        return self.pdf.to_bytes()
+
+
+def render_invoice(data):
+    """PDF bytes for the invoice described by ``data`` (see ``invoice_pdf_data``)"""
+    return InvoiceLayout(data).render()
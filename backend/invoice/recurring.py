@@ -0,0 +1,159 @@
+"""Invoice generation from recurring templates.
+
+``RecurringInvoiceGenerator`` works through the due templates (active, with
+``next_run`` on or before today, found through the partial
+``recurring_due_idx``) in chunks. For each chunk, in one transaction, it:
+
+- locks the templates (skipping ones another run holds)
+- works out every missed scheduled date up to today
+- reserves invoice numbers with one sequence update per user and month
+- writes all invoices with one ``bulk_create`` and all items with another
+- moves each template's ``next_run`` past the dates it generated
+
+A crashed run leaves its open chunk untouched, so the next run resumes
+there. Generated invoices record their template and scheduled date under
+a unique constraint, and dates that already have an invoice are skipped,
+so running twice (or moving ``next_run`` back) never duplicates invoices.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Invoice, InvoiceItem, RecurringInvoice, RecurringInvoiceItem, invoices_bulk_created
+from .numbering import allocate_invoice_numbers
+
+
+RECURRING_CHUNK_SIZE = 500
+
+INSERT_BATCH_SIZE = 5000
+
+# Dates generated per template and chunk when catching up on a long backlog;
+# the template stays due, so the same run comes back for the rest
+MAX_OCCURRENCES_PER_CHUNK = 60
+
+FREQUENCY_MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+
+
+def next_occurrence(template, occurrence):
+    """The scheduled date after ``occurrence``"""
+    if template.frequency == 'weekly':
+        return occurrence + timedelta(weeks=template.interval)
+    # Count months from the start date so short months do not shift later dates (Jan 31, Feb 28, Mar 31)
+    start = template.start_date
+    months = (occurrence.year - start.year) * 12 + occurrence.month - start.month
+    return start + relativedelta(months=months + FREQUENCY_MONTHS[template.frequency] * template.interval)
+
+
+def first_occurrence_from(template, day):
+    """The first scheduled date on or after ``day``"""
+    occurrence = template.start_date
+    while occurrence < day:
+        occurrence = next_occurrence(template, occurrence)
+    return occurrence
+
+
+def due_occurrences(template, today):
+    """``(dates to generate, next_run after them)`` for one template"""
+    occurrences = []
+    occurrence = template.next_run
+    while (occurrence <= today and (template.end_date is None or occurrence <= template.end_date)
+           and len(occurrences) < MAX_OCCURRENCES_PER_CHUNK):
+        occurrences.append(occurrence)
+        occurrence = next_occurrence(template, occurrence)
+    return occurrences, occurrence
+
+
+class RecurringInvoiceGenerator:
+    """Generates the invoices of all due templates, chunk by chunk"""
+
+    def __init__(self, today=None, chunk_size=RECURRING_CHUNK_SIZE):
+        self.today = today or timezone.now().date()
+        self.chunk_size = chunk_size
+        self.stats = {'templates': 0, 'invoices': 0, 'items': 0, 'skipped': 0, 'chunks': 0}
+
+    def due_templates(self):
+        return (
+            RecurringInvoice.objects.filter(is_active=True, next_run__lte=self.today)
+            .order_by('next_run', 'id')
+            .select_for_update(skip_locked=True)
+            .prefetch_related(Prefetch('items', queryset=RecurringInvoiceItem.objects.order_by('id')))
+        )
+
+    def run(self):
+        while True:
+            with transaction.atomic():
+                templates = list(self.due_templates()[:self.chunk_size])
+                if not templates:
+                    break
+                self.generate_chunk(templates)
+        return self.stats
+
+    def generate_chunk(self, templates):
+        now = timezone.now()
+        planned = []
+        for template in templates:
+            occurrences, template.next_run = due_occurrences(template, self.today)
+            if template.end_date and template.next_run > template.end_date:
+                template.is_active = False
+            template.last_run_at = template.updated_at = now
+            planned.extend((template, occurrence) for occurrence in occurrences)
+
+        # Dates that already have an invoice (e.g. next_run was moved back) are not generated again
+        existing = set(
+            Invoice.objects.filter(recurring_invoice__in=templates, recurring_date__in={day for _, day in planned})
+            .values_list('recurring_invoice_id', 'recurring_date')
+        )
+        skipped = len(planned)
+        planned = [(template, day) for template, day in planned if (template.id, day) not in existing]
+        skipped -= len(planned)
+
+        invoices, items = self.build_invoices(planned)
+        Invoice.objects.bulk_create(invoices, batch_size=INSERT_BATCH_SIZE)
+        InvoiceItem.objects.bulk_create(items, batch_size=INSERT_BATCH_SIZE)
+        RecurringInvoice.objects.bulk_update(
+            templates, ['next_run', 'is_active', 'last_run_at', 'updated_at'], batch_size=INSERT_BATCH_SIZE
+        )
+
+        # bulk_create skips post_save: refresh rollups, caches and search per user
+        by_user = defaultdict(list)
+        for invoice in invoices:
+            by_user[invoice.user_id].append(invoice)
+        for user_id, user_invoices in by_user.items():
+            invoices_bulk_created.send(sender=Invoice, user_id=user_id, invoices=user_invoices)
+
+        self.stats['templates'] += len(templates)
+        self.stats['invoices'] += len(invoices)
+        self.stats['items'] += len(items)
+        self.stats['skipped'] += skipped
+        self.stats['chunks'] += 1
+
+    def build_invoices(self, planned):
+        # Invoice numbers depend on the issue month, so reserve one block per user and month
+        blocks = defaultdict(list)
+        for index, (template, day) in enumerate(planned):
+            blocks[(template.user_id, day.year, day.month)].append(index)
+        numbers = {}
+        for (user_id, _, _), indexes in blocks.items():
+            issued_at = planned[indexes[0]][1]
+            numbers.update(zip(indexes, allocate_invoice_numbers(user_id, len(indexes), issued_at)))
+
+        invoices, items = [], []
+        for index, (template, day) in enumerate(planned):
+            invoice = Invoice(
+                user_id=template.user_id, client_id=template.client_id, invoice_number=numbers[index],
+                issue_date=day, due_date=day + timedelta(days=template.days_until_due),
+                tax_rate=template.tax_rate, notes=template.notes, payment_terms=template.payment_terms,
+                conditions=template.conditions, recurring_invoice=template, recurring_date=day,
+            )
+            invoice_items = InvoiceItem.objects.build(invoice, [
+                {'description': item.description, 'quantity': item.quantity, 'unit_price': item.unit_price}
+                for item in template.items.all()
+            ])
+            invoice.calculate_totals(item.amount for item in invoice_items)
+            invoices.append(invoice)
+            items.extend(invoice_items)
+        return invoices, items
@@ -0,0 +1,268 @@
+"""Cached invoice PDFs.
+
+A PDF is rendered from a plain snapshot of the invoice, its items, its
+client and the owner's profile (``invoice_pdf_data``). The snapshot's digest
+names the cached file ``<invoice id>/<digest>.pdf``, so any change that
+would alter the document (including a client rename or profile edit, which
+do not touch the invoice's ``updated_at``) renders a new file, while
+unchanged invoices are served straight from the cache. The digest is also
+the endpoint's ``ETag``. So that revalidations need not load the snapshot,
+the digest is remembered in the default cache under the invoice's
+``pdf_fingerprint`` (the timestamps and user fields the snapshot depends on).
+
+Renders run in a bounded pool of worker processes so CPU-heavy rendering
+never blocks more than ``INVOICE_PDF_WORKERS`` cores. Files are kept in
+``INVOICE_PDF_CACHE_DIR`` or, when ``INVOICE_PDF_STORAGE`` names an entry of
+``settings.STORAGES``, in that storage.
+"""
+import hashlib
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, TimeoutError as RenderTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, storages
+from django.db.models import Prefetch
+from rest_framework.renderers import BaseRenderer
+
+from .models import Invoice, InvoiceItem
+from .pdf import render_invoice
+
+
+# Bump when the layout changes so cached files are rendered again
+RENDERER_VERSION = 1
+
+# Raised by ``render_pdf`` when the pool cannot render right now
+RENDER_UNAVAILABLE = (RenderTimeout, BrokenProcessPool)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PDFRenderer(BaseRenderer):
+    """Lets clients send ``Accept: application/pdf``; the view returns the bytes itself"""
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, bytes) else json.dumps(data).encode()
+
+
+def pdf_storage():
+    alias = getattr(settings, 'INVOICE_PDF_STORAGE', None)
+    if alias:
+        return storages[alias]
+    return FileSystemStorage(location=settings.INVOICE_PDF_CACHE_DIR)
+
+
+def pdf_queryset():
+    """Invoices with everything ``invoice_pdf_data`` reads"""
+    return Invoice.objects.select_related('client', 'user__profile').prefetch_related(
+        Prefetch('items', queryset=InvoiceItem.objects.order_by('id'))
+    )
+
+
+def _address_lines(address, city, state, zip_code, country):
+    lines = [line.strip() for line in (address or '').splitlines() if line.strip()]
+    locality = ', '.join(part for part in [city, ' '.join(part for part in [state, zip_code] if part)] if part)
+    return lines + [line for line in [locality, country] if line]
+
+
+def invoice_pdf_data(invoice):
+    """Everything printed on the invoice, as plain strings (picklable and hashable)"""
+    user, client = invoice.user, invoice.client
+    profile = getattr(user, 'profile', None)
+
+    seller_lines = []
+    if profile is not None:
+        seller_lines = _address_lines(profile.address, profile.city, profile.state, profile.zip_code, profile.country)
+    seller_lines += [value for value in [user.email, getattr(profile, 'phone_number', '')] if value]
+
+    client_lines = [client.company_name] if client.company_name and client.company_name != client.name else []
+    client_lines += _address_lines(client.address, client.city, client.state, client.zip_code, client.country)
+    client_lines += [value for value in [client.email, client.phone_number] if value]
+
+    return {
+        'invoice_number': invoice.invoice_number,
+        'status': invoice.get_status_display(),
+        'issue_date': str(invoice.issue_date),
+        'due_date': str(invoice.due_date),
+        'currency': (getattr(profile, 'currency', '') or '').upper(),
+        'seller': {
+            'name': getattr(profile, 'company_name', '') or user.get_full_name() or user.username,
+            'lines': seller_lines,
+        },
+        'client': {'name': client.name, 'lines': client_lines},
+        'items': [
+            {
+                'description': item.description,
+                'quantity': f'{item.quantity.normalize():f}',
+                'unit_price': f'{item.unit_price:,.2f}',
+                'amount': f'{item.amount:,.2f}',
+            }
+            for item in invoice.items.all()
+        ],
+        'subtotal': f'{invoice.subtotal:,.2f}',
+        'tax_rate': f'{invoice.tax_rate.normalize():f}',
+        'tax_amount': f'{invoice.tax_amount:,.2f}',
+        'total': f'{invoice.total:,.2f}',
+        'notes': invoice.notes,
+        'payment_terms': invoice.payment_terms,
+        'conditions': invoice.conditions,
+    }
+
+
+def pdf_digest(data):
+    payload = json.dumps([RENDERER_VERSION, data], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def pdf_fingerprint(invoice_id):
+    """What the snapshot of an invoice depends on, in one light query (``None`` if it does not exist)
+
+    Item edits, payments and status changes all bump the invoice's
+    ``updated_at``, client and profile edits their own.
+    """
+    return Invoice.objects.filter(id=invoice_id).values_list(
+        'updated_at', 'client__updated_at', 'user__profile__updated_at',
+        'user__username', 'user__email', 'user__first_name', 'user__last_name',
+    ).first()
+
+
+def digest_cache_key(invoice_id, fingerprint):
+    payload = json.dumps([RENDERER_VERSION, str(invoice_id), fingerprint], default=str)
+    return f'invoice-pdf-digest:{hashlib.sha256(payload.encode()).hexdigest()[:32]}'
+
+
+def known_pdf_digest(invoice_id, fingerprint):
+    """The digest last computed for this fingerprint, if still cached"""
+    return cache.get(digest_cache_key(invoice_id, fingerprint))
+
+
+def remember_pdf_digest(invoice_id, fingerprint, digest):
+    cache.set(digest_cache_key(invoice_id, fingerprint), digest)
+
+
+def pdf_path(invoice_id, digest):
+    return f'{invoice_id}/{digest}.pdf'
+
+
+def render_pool():
+    """The process-wide render pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned (not forked) workers: forking a threaded server process is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.INVOICE_PDF_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def render_pdf(data):
+    """Render in the pool (or inline when ``INVOICE_PDF_WORKERS`` is 0)
+
+    Raises one of ``RENDER_UNAVAILABLE`` when the render takes longer than
+    ``INVOICE_PDF_TIMEOUT`` or the pool is broken.
+    """
+    global _pool
+    if settings.INVOICE_PDF_WORKERS <= 0:
+        return render_invoice(data)
+    pool = render_pool()
+    try:
+        return pool.submit(render_invoice, data).result(timeout=settings.INVOICE_PDF_TIMEOUT)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool on the next render
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
+
+
+def store_pdf(storage, invoice_id, digest, content):
+    """Save a rendered file and drop the invoice's older renders"""
+    path = pdf_path(invoice_id, digest)
+    if not storage.exists(path):
+        saved = storage.save(path, ContentFile(content))
+        if saved != path:
+            # Another worker stored the same render meanwhile
+            storage.delete(saved)
+
+    _, files = storage.listdir(str(invoice_id))
+    for name in files:
+        if name != f'{digest}.pdf':
+            storage.delete(f'{invoice_id}/{name}')
+
+
+def delete_cached_pdfs(invoice_id):
+    storage = pdf_storage()
+    try:
+        _, files = storage.listdir(str(invoice_id))
+    except FileNotFoundError:
+        return
+    for name in files:
+        storage.delete(f'{invoice_id}/{name}')
+
+
+class InvoicePDF:
+    """The cached PDF of one invoice; ``digest`` is known before anything is rendered"""
+
+    def __init__(self, invoice):
+        self.invoice = invoice
+        self.data = invoice_pdf_data(invoice)
+        self.digest = pdf_digest(self.data)
+        self.filename = f'{invoice.invoice_number or invoice.id}.pdf'
+
+    def content(self):
+        storage = pdf_storage()
+        path = pdf_path(self.invoice.id, self.digest)
+        if storage.exists(path):
+            with storage.open(path, 'rb') as cached:
+                return cached.read()
+
+        content = render_pdf(self.data)
+        store_pdf(storage, self.invoice.id, self.digest, content)
+        return content
+
+
+def render_invoice_pdfs(invoices, workers=None, force=False, chunk_size=500):
+    """Render and cache the PDFs of many invoices; returns ``{'rendered': n, 'cached': n}``.
+
+    Snapshots are built in this process while up to ``4 * workers`` renders
+    run in a dedicated pool, so memory stays bounded for any number of
+    invoices.
+    """
+    workers = workers or max(settings.INVOICE_PDF_WORKERS, 1)
+    storage = pdf_storage()
+    rendered = cached = 0
+    pending = {}
+
+    def collect(done):
+        nonlocal rendered
+        for future in done:
+            invoice_id, digest = pending.pop(future)
+            store_pdf(storage, invoice_id, digest, future.result())
+            rendered += 1
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for invoice in invoices.iterator(chunk_size=chunk_size):
+            data = invoice_pdf_data(invoice)
+            digest = pdf_digest(data)
+            if not force and storage.exists(pdf_path(invoice.id, digest)):
+                cached += 1
+                continue
+
+            if len(pending) >= workers * 4:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(render_invoice, data)] = (invoice.id, digest)
+
+        collect(wait(pending)[0])
+
+    return {'rendered': rendered, 'cached': cached}
@@ -0,0 +1,176 @@
+"""Indexed invoice search.
+
+Every invoice has an ``InvoiceSearchDocument`` whose ``content`` joins the
+invoice number, client name, item descriptions and notes. How it is
+searched depends on the database:
+
+- Postgres: a generated ``search_vector`` tsvector column with a GIN index
+  (word matches ranked with ``ts_rank``) and a trigram GIN index on
+  ``content`` that serves substring matches such as partial invoice numbers
+  (``ILIKE '%...%'``, ranked with ``word_similarity``).
+- SQLite: an external-content FTS5 table maintained by triggers, queried
+  with prefix tokens and ranked with ``bm25``.
+- Anything else: a plain ``icontains`` scan over ``content``.
+
+The indexes are created by migration ``0003_invoicesearchdocument``.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import Invoice, InvoiceSearchDocument
+
+
+SEARCH_FTS_TABLE = 'invoice_search_fts'
+
+REFRESH_CHUNK_SIZE = 1000
+
+
+def build_search_content(invoice_number, client_name, descriptions, notes):
+    return ' '.join(part for part in [invoice_number, client_name, *descriptions, notes] if part)
+
+
+def refresh_search_documents(invoice_ids):
+    """Rebuild the search documents of the given invoices (deleted ids are skipped)"""
+    invoice_ids = list(dict.fromkeys(invoice_ids))
+    for offset in range(0, len(invoice_ids), REFRESH_CHUNK_SIZE):
+        _refresh_chunk(invoice_ids[offset:offset + REFRESH_CHUNK_SIZE])
+
+
+def _refresh_chunk(invoice_ids):
+    invoices = (
+        Invoice.objects.filter(id__in=invoice_ids)
+        .select_related('client')
+        .prefetch_related('items')
+        .only('id', 'user_id', 'invoice_number', 'notes', 'client__name')
+    )
+    documents = {
+        document.invoice_id: document
+        for document in InvoiceSearchDocument.objects.filter(invoice_id__in=invoice_ids)
+    }
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for invoice in invoices:
+        content = build_search_content(
+            invoice.invoice_number, invoice.client.name,
+            [item.description for item in invoice.items.all()], invoice.notes
+        )
+        document = documents.get(invoice.id)
+        if document is None:
+            to_create.append(InvoiceSearchDocument(invoice=invoice, user_id=invoice.user_id, content=content))
+        elif document.content != content or document.user_id != invoice.user_id:
+            document.content = content
+            document.user_id = invoice.user_id
+            document.updated_at = now
+            to_update.append(document)
+
+    InvoiceSearchDocument.objects.bulk_create(to_create)
+    InvoiceSearchDocument.objects.bulk_update(to_update, ['content', 'user_id', 'updated_at'])
+
+
+def fts5_match_expression(query):
+    """AND of prefix terms, e.g. ``acme 0042`` -> ``"acme"* "0042"*``"""
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+
+
+def _ranked_sql(user_id, query):
+    """SQL selecting ``(invoice_id, rank)`` for a user's matches, best first, plus its params"""
+    documents = InvoiceSearchDocument._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return (
+            f"SELECT d.invoice_id, "
+            f"ts_rank(d.search_vector, websearch_to_tsquery('simple', %s)) + word_similarity(%s, d.content) AS rank "
+            f"FROM {documents} d "
+            f"WHERE d.user_id = %s "
+            f"AND (d.search_vector @@ websearch_to_tsquery('simple', %s) OR d.content ILIKE %s) "
+            f"ORDER BY rank DESC, d.invoice_id",
+            [query, query, user_id, query, pattern]
+        )
+
+    if connection.vendor == 'sqlite':
+        return (
+            f"SELECT d.invoice_id, bm25({SEARCH_FTS_TABLE}) AS rank "
+            f"FROM {SEARCH_FTS_TABLE} JOIN {documents} d ON d.id = {SEARCH_FTS_TABLE}.rowid "
+            f"WHERE {SEARCH_FTS_TABLE} MATCH %s AND d.user_id = %s "
+            f"ORDER BY rank, d.invoice_id",
+            [fts5_match_expression(query), user_id]
+        )
+
+    return None, None
+
+
+def _match_terms(query):
+    # FTS5 needs at least one word token; Postgres and the fallback take any text
+    return bool(re.findall(r'\w+', query)) if connection.vendor == 'sqlite' else bool(query.strip())
+
+
+class InvoiceSearchResults:
+    """Lazily evaluated, ranked search results.
+
+    Supports ``count()`` and slicing, so it can be handed to Django's
+    ``Paginator`` (and DRF's pagination classes) like a queryset. Slices
+    return ``Invoice`` objects with their client loaded, in rank order.
+    """
+
+    def __init__(self, user, query):
+        self.user_id = user.id
+        self.query = query.strip()
+
+    def _fallback(self):
+        return Invoice.objects.filter(
+            user_id=self.user_id, search_document__content__icontains=self.query
+        ).order_by('-created_at')
+
+    def count(self):
+        if not _match_terms(self.query):
+            return 0
+        sql, params = _ranked_sql(self.user_id, self.query)
+        if sql is None:
+            return self._fallback().count()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql}) ranked', params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not _match_terms(self.query):
+            return []
+
+        sql, params = _ranked_sql(self.user_id, self.query)
+        if sql is None:
+            return list(self._fallback().select_related('client')[key])
+
+        start = key.start or 0
+        stop = key.stop if key.stop is not None else self.count()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{sql} LIMIT %s OFFSET %s', params + [max(stop - start, 0), start])
+            invoice_ids = _as_pk(row[0] for row in cursor.fetchall())
+
+        invoices = Invoice.objects.select_related('client').in_bulk(invoice_ids)
+        return [invoices[invoice_id] for invoice_id in invoice_ids if invoice_id in invoices]
+
+
+def _as_pk(values):
+    """Raw cursors return UUIDs as strings on SQLite"""
+    field = Invoice._meta.pk
+    return [field.to_python(value) for value in values]
+
+
+def matching_invoice_ids(user, query):
+    """Subquery expression for ``Invoice.objects.filter(id__in=...)`` matching ``query``"""
+    query = query.strip()
+    sql, params = _ranked_sql(user.id, query)
+    if sql is None:
+        return InvoiceSearchDocument.objects.filter(user=user, content__icontains=query).values('invoice_id')
+    if not _match_terms(query):
+        return Invoice.objects.none().values('id')
+    return RawSQL(f'SELECT invoice_id FROM ({sql}) ranked', params)
@@ -1,17 +1,52 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Invoice, InvoiceItem
+from .models import Invoice, InvoiceItem, RecurringInvoice, RecurringInvoiceItem
+from .recurring import first_occurrence_from
+from .transitions import BULK_STATUS_MAX_INVOICES
 from clients.serializers import ClientSerializer
 from clients.models import Client
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
     """Serializer for invoice items"""
+    # Writable so updates can refer to existing items; omitted for new items
+    id = serializers.IntegerField(required=False)
     
     class Meta:
         depth = 1
         model = InvoiceItem
         fields = ['id', 'description', 'quantity', 'unit_price', 'amount']
-        read_only_fields = ['id', 'amount']
+        read_only_fields = ['amount']
+
+
+# Optional blocks of the invoice list representation, requested with ?expand=items,user
+LIST_EXPANSIONS = ('items', 'user')
+
+
+def parse_expand(value):
+    """Known expansions named in a comma separated ``expand`` parameter"""
+    requested = {name.strip() for name in (value or '').split(',')}
+    return {name for name in LIST_EXPANSIONS if name in requested}
+
+
+def invoice_owner_summary(user):
+    """User block shown on invoices"""
+    profile = getattr(user, 'profile', None)
+    profile_picture_url = None
+    if profile and profile.profile_picture and hasattr(profile.profile_picture, 'url'):
+        profile_picture_url = profile.profile_picture.url
+        
+    return {
+        'id': user.id,
+        'email': user.email,
+        'username': user.username,
+        'first_name': getattr(user, 'first_name', ''),
+        'last_name': getattr(user, 'last_name', ''),
+        'company_name': getattr(profile, 'company_name', '') if profile else '',
+        'address': getattr(profile, 'address', '') if profile else '',
+        'profile_picture': profile_picture_url
+    }
 
 
 class InvoiceSerializer(serializers.ModelSerializer):
@@ -25,25 +60,14 @@ class InvoiceSerializer(serializers.ModelSerializer):
         model = Invoice
         fields = ['id', 'invoice_number', 'client', 'client_name', 'user', 'issue_date', 
                  'due_date', 'status', 'notes', 'payment_terms', 'conditions', 'subtotal', 'tax_rate', 
-                 'tax_amount', 'total', 'items', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'invoice_number', 'subtotal', 'tax_amount', 'total', 'created_at', 'updated_at']
+                 'tax_amount', 'total', 'amount_paid', 'balance_due', 'last_payment_at', 'items', 'created_at',
+                 'updated_at']
+        read_only_fields = ['id', 'invoice_number', 'subtotal', 'tax_amount', 'total', 'amount_paid', 'balance_due',
+                            'last_payment_at', 'created_at', 'updated_at']
         depth = 1
         
     def get_user(self, obj):
-        profile_picture_url = None
-        if hasattr(obj.user, 'profile') and obj.user.profile.profile_picture and hasattr(obj.user.profile.profile_picture, 'url'):
-            profile_picture_url = obj.user.profile.profile_picture.url
-            
-        return {
-            'id': obj.user.id,
-            'email': obj.user.email,
-            'username': obj.user.username,
-            'first_name': getattr(obj.user, 'first_name', ''),
-            'last_name': getattr(obj.user, 'last_name', ''),
-            'company_name': getattr(obj.user.profile, 'company_name', '') if hasattr(obj.user, 'profile') else '',
-            'address': getattr(obj.user.profile, 'address', '') if hasattr(obj.user, 'profile') else '',
-            'profile_picture': profile_picture_url
-        }
+        return invoice_owner_summary(obj.user)
     
     def create(self, validated_data):
         # Associate the invoice with the current user
@@ -52,6 +76,50 @@ class InvoiceSerializer(serializers.ModelSerializer):
         return invoice
 
 
+class InvoiceListSerializer(serializers.ModelSerializer):
+    """Slim invoice representation for lists
+    
+    Items and the owner block are left out unless named in the ``expand``
+    context entry (see ``parse_expand``). Load the rows with
+    ``prepare_queryset`` so a page costs the same few queries at any size.
+    """
+    client = serializers.PrimaryKeyRelatedField(read_only=True)
+    client_name = serializers.CharField(source='client.name', read_only=True)
+    items = InvoiceItemSerializer(many=True, read_only=True)
+    user = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Invoice
+        fields = ['id', 'invoice_number', 'client', 'client_name', 'user', 'issue_date', 'due_date',
+                  'status', 'subtotal', 'tax_rate', 'tax_amount', 'total', 'amount_paid', 'balance_due',
+                  'last_payment_at', 'items', 'created_at', 'updated_at']
+        read_only_fields = fields
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get('expand', ())
+        for name in LIST_EXPANSIONS:
+            if name not in expand:
+                self.fields.pop(name)
+    
+    @staticmethod
+    def related_lookups(expand=()):
+        """``(select_related, prefetch_related)`` lookups needed for ``expand``"""
+        select = ['client']
+        if 'user' in expand:
+            select.append('user__profile')
+        prefetch = ['items'] if 'items' in expand else []
+        return select, prefetch
+    
+    @classmethod
+    def prepare_queryset(cls, queryset, expand=()):
+        select, prefetch = cls.related_lookups(expand)
+        return queryset.select_related(*select).prefetch_related(*prefetch)
+    
+    def get_user(self, obj):
+        return invoice_owner_summary(obj.user)
+
+
 class InvoiceDetailSerializer(serializers.ModelSerializer):
     """Serializer for detailed invoice information"""
     items = InvoiceItemSerializer(many=True)
@@ -73,8 +141,9 @@ class InvoiceDetailSerializer(serializers.ModelSerializer):
         model = Invoice
         fields = ['id', 'invoice_number', 'client', 'client_details', 'user', 'issue_date', 'due_date', 
                  'status', 'notes', 'payment_terms', 'conditions', 'subtotal', 'tax_rate', 'tax_amount', 
-                 'total', 'items', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'invoice_number', 'subtotal', 'tax_amount', 'total', 'created_at', 'updated_at']
+                 'total', 'amount_paid', 'balance_due', 'last_payment_at', 'items', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'invoice_number', 'subtotal', 'tax_amount', 'total', 'amount_paid', 'balance_due',
+                            'last_payment_at', 'created_at', 'updated_at']
         depth = 1
         
     def get_user(self, obj):
@@ -99,16 +168,22 @@ class InvoiceDetailSerializer(serializers.ModelSerializer):
             'is_email_verified': obj.user.profile.is_email_verified
         }
     
+    def validate_items(self, items):
+        """Item ids must be unique and belong to the invoice being updated"""
+        item_ids = [item['id'] for item in items if item.get('id') is not None]
+        if len(item_ids) != len(set(item_ids)):
+            raise serializers.ValidationError('Each item id may only appear once.')
+        if item_ids:
+            known_ids = set(self.instance.items.values_list('id', flat=True)) if self.instance else set()
+            unknown_ids = sorted(set(item_ids) - known_ids)
+            if unknown_ids:
+                raise serializers.ValidationError(f"Unknown item ids: {', '.join(map(str, unknown_ids))}")
+        return items
+    
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         user = self.context['request'].user
-        invoice = Invoice.objects.create(user=user, **validated_data)
-
-        
-        for item_data in items_data:
-            InvoiceItem.objects.create(invoice=invoice, **item_data)
-        
-        return invoice
+        return Invoice.objects.create_with_items(items_data, user=user, **validated_data)
     
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', None)
@@ -116,15 +191,133 @@ class InvoiceDetailSerializer(serializers.ModelSerializer):
         # Update invoice fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
         
-        # Update items if provided
-        if items_data is not None:
-            # Remove existing items
-            instance.items.all().delete()
-            
-            # Create new items
-            for item_data in items_data:
-                InvoiceItem.objects.create(invoice=instance, **item_data)
+        if items_data is None:
+            if 'tax_rate' in validated_data:
+                instance.recalculate_totals()
+            else:
+                instance.save()
+        else:
+            # Diffs the items by id and saves the invoice once with the new totals
+            InvoiceItem.objects.sync_for_invoice(instance, items_data)
+        
+        return instance
+
+
+class InvoiceImportSerializer(serializers.Serializer):
+    """One invoice of a bulk import (see ``invoice/bulk.py``)
+    
+    ``client`` is a client id or name, resolved through the
+    ``clients`` map in the context so validation runs no queries.
+    """
+    client = serializers.CharField()
+    invoice_number = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    issue_date = serializers.DateField(required=False)
+    due_date = serializers.DateField()
+    status = serializers.ChoiceField(choices=Invoice.STATUS_CHOICES, default='unpaid')
+    tax_rate = serializers.DecimalField(max_digits=5, decimal_places=2, default=0)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    payment_terms = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    conditions = serializers.CharField(required=False, allow_blank=True, default='')
+    items = InvoiceItemSerializer(many=True, allow_empty=False)
+    
+    def validate_client(self, value):
+        try:
+            return self.context['clients'].resolve(value)
+        except LookupError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
+class InvoiceBulkStatusSerializer(serializers.Serializer):
+    """Body of a bulk status change (see ``invoice/transitions.py``)"""
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=BULK_STATUS_MAX_INVOICES)
+    status = serializers.ChoiceField(choices=Invoice.STATUS_CHOICES)
+    from_status = serializers.ListField(
+        child=serializers.ChoiceField(choices=Invoice.STATUS_CHOICES), required=False, allow_empty=False
+    )
+    record_payment = serializers.BooleanField(default=True)
+    payment_method = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+    payment_date = serializers.DateTimeField(required=False)
+
+
+
+class RecurringInvoiceItemSerializer(serializers.ModelSerializer):
+    """Serializer for the lines of a recurring invoice template"""
+    
+    class Meta:
+        model = RecurringInvoiceItem
+        fields = ['id', 'description', 'quantity', 'unit_price']
+        read_only_fields = ['id']
+
+
+class RecurringInvoiceSerializer(serializers.ModelSerializer):
+    """Serializer for recurring invoice templates
+    
+    ``next_run`` defaults to ``start_date``. When the schedule of an
+    existing template changes without a new ``next_run``, it moves to the
+    first scheduled date from today. Sent ``items`` replace all items.
+    """
+    items = RecurringInvoiceItemSerializer(many=True, allow_empty=False)
+    client_name = serializers.CharField(source='client.name', read_only=True)
+    client = serializers.PrimaryKeyRelatedField(queryset=Client.objects.none())
+    next_run = serializers.DateField(required=False)
+    
+    SCHEDULE_FIELDS = ('frequency', 'interval', 'start_date')
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Templates may only bill the user's own clients
+        if 'context' in kwargs and 'request' in kwargs['context']:
+            self.fields['client'].queryset = Client.objects.filter(user=kwargs['context']['request'].user)
+    
+    class Meta:
+        model = RecurringInvoice
+        fields = ['id', 'client', 'client_name', 'frequency', 'interval', 'start_date', 'end_date', 'next_run',
+                  'is_active', 'days_until_due', 'tax_rate', 'notes', 'payment_terms', 'conditions', 'items',
+                  'last_run_at', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'last_run_at', 'created_at', 'updated_at']
+    
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Must be at least 1.')
+        return value
+    
+    def validate(self, attrs):
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        next_run = attrs.get('next_run')
+        if end_date and start_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': 'Must not be before start_date.'})
+        if next_run and start_date and next_run < start_date:
+            raise serializers.ValidationError({'next_run': 'Must not be before start_date.'})
+        return attrs
+    
+    def create(self, validated_data):
+        items_data = validated_data.pop('items')
+        validated_data.setdefault('next_run', validated_data['start_date'])
+        with transaction.atomic():
+            template = RecurringInvoice.objects.create(user=self.context['request'].user, **validated_data)
+            RecurringInvoiceItem.objects.bulk_create(
+                RecurringInvoiceItem(recurring_invoice=template, **item) for item in items_data
+            )
+        return template
+    
+    def update(self, instance, validated_data):
+        items_data = validated_data.pop('items', None)
+        schedule_changed = any(
+            field in validated_data and validated_data[field] != getattr(instance, field)
+            for field in self.SCHEDULE_FIELDS
+        )
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if schedule_changed and 'next_run' not in validated_data:
+            instance.next_run = first_occurrence_from(instance, max(instance.start_date, timezone.now().date()))
         
+        with transaction.atomic():
+            instance.save()
+            if items_data is not None:
+                instance.items.all().delete()
+                RecurringInvoiceItem.objects.bulk_create(
+                    RecurringInvoiceItem(recurring_invoice=instance, **item) for item in items_data
+                )
         return instance
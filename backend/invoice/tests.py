@@ -1,3 +1,1027 @@
-from django.test import TestCase
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+import os
+import shutil
+import tempfile
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from clients.models import Client
+from analytics.cache import get_analytics_cache, get_data_version
+from payment.models import InvoicePayment
+from .models import OPEN_BALANCE, Invoice, InvoiceItem, InvoiceSequence, RecurringInvoice, RecurringInvoiceItem
+from .numbering import allocate_invoice_numbers, next_invoice_number
+from . import rendering
+from .pdf import render_invoice
+from .recurring import RecurringInvoiceGenerator
+from .rendering import invoice_pdf_data, pdf_queryset
+from .transitions import mark_overdue_invoices
+
+
+class InvoiceItemWriteTests(TestCase):
+    """Item writes must cost a constant number of queries, whatever the item count"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def invoice_payload(self, item_count):
+        return {
+            'client': str(self.client_obj.id),
+            'issue_date': timezone.now().date().isoformat(),
+            'due_date': timezone.now().date().isoformat(),
+            'tax_rate': '10.00',
+            'items': [
+                {'description': f'Item {index}', 'quantity': '2', 'unit_price': '12.50'}
+                for index in range(item_count)
+            ],
+        }
+
+    def count_create_queries(self, item_count):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.post('/api/invoice/', self.invoice_payload(item_count), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return len(queries)
+
+    def test_create_query_count_is_independent_of_item_count(self):
+        # Warm up one-off queries (e.g. the invoice number sequence row)
+        self.count_create_queries(1)
+
+        self.assertEqual(self.count_create_queries(2), self.count_create_queries(50))
+
+    def test_create_computes_totals_once(self):
+        response = self.api.post('/api/invoice/', self.invoice_payload(4), format='json')
+
+        invoice = Invoice.objects.get(id=response.data['id'])
+        self.assertEqual(invoice.items.count(), 4)
+        self.assertEqual(invoice.subtotal, Decimal('100.00'))
+        self.assertEqual(invoice.tax_amount, Decimal('10.00'))
+        self.assertEqual(invoice.total, Decimal('110.00'))
+        self.assertEqual(set(invoice.items.values_list('amount', flat=True)), {Decimal('25.00')})
+
+    def test_replacing_items_query_count_is_independent_of_item_count(self):
+        invoice_id = self.api.post('/api/invoice/', self.invoice_payload(3), format='json').data['id']
+
+        def count_update_queries(item_count):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api.patch(f'/api/invoice/{invoice_id}/',
+                                          {'items': self.invoice_payload(item_count)['items']}, format='json')
+            self.assertEqual(response.status_code, 200, response.content)
+            return len(queries)
+
+        self.assertEqual(count_update_queries(2), count_update_queries(40))
+        self.assertEqual(InvoiceItem.objects.filter(invoice_id=invoice_id).count(), 40)
+        self.assertEqual(Invoice.objects.get(id=invoice_id).subtotal, Decimal('1000.00'))
+
+    def test_item_updates_are_diffed_by_id(self):
+        invoice_id = self.api.post('/api/invoice/', self.invoice_payload(3), format='json').data['id']
+        first, second, third = InvoiceItem.objects.filter(invoice_id=invoice_id).order_by('id')
+
+        response = self.api.patch(f'/api/invoice/{invoice_id}/', {'items': [
+            {'id': first.id, 'description': first.description, 'quantity': '2', 'unit_price': '12.50'},
+            {'id': second.id, 'description': 'Changed', 'quantity': '4', 'unit_price': '12.50'},
+            {'description': 'New', 'quantity': '1', 'unit_price': '5.00'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        items = {item.id: item for item in InvoiceItem.objects.filter(invoice_id=invoice_id)}
+        self.assertIn(first.id, items)
+        self.assertIn(second.id, items)
+        self.assertNotIn(third.id, items)
+        self.assertEqual(items[second.id].amount, Decimal('50.00'))
+        self.assertEqual(len(items), 3)
+        self.assertEqual(Invoice.objects.get(id=invoice_id).subtotal, Decimal('80.00'))
+
+    def test_diffed_update_query_count_is_independent_of_item_count(self):
+        def count_edit_queries(item_count):
+            invoice_id = self.api.post('/api/invoice/', self.invoice_payload(item_count), format='json').data['id']
+            items = [
+                {'id': item_id, 'description': 'Edited', 'quantity': '1', 'unit_price': '1.00'}
+                for item_id in InvoiceItem.objects.filter(invoice_id=invoice_id).values_list('id', flat=True)
+            ]
+            # Keep half, drop the other half and add as many new ones
+            payload = items[:item_count // 2] + self.invoice_payload(item_count // 2)['items']
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api.patch(f'/api/invoice/{invoice_id}/', {'items': payload}, format='json')
+            self.assertEqual(response.status_code, 200, response.content)
+            return len(queries)
+
+        self.assertEqual(count_edit_queries(4), count_edit_queries(40))
+
+    def test_unknown_item_ids_are_rejected(self):
+        invoice_id = self.api.post('/api/invoice/', self.invoice_payload(1), format='json').data['id']
+        other_id = self.api.post('/api/invoice/', self.invoice_payload(1), format='json').data['items'][0]['id']
+
+        response = self.api.patch(f'/api/invoice/{invoice_id}/', {'items': [
+            {'id': other_id, 'description': 'Hijack', 'quantity': '1', 'unit_price': '1.00'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(InvoiceItem.objects.get(id=other_id).description, 'Item 0')
+
+
+class InvoiceNumberingTests(TestCase):
+    """Invoice numbers come from per-user sequences and never collide with numbers written elsewhere"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('numbered', 'numbered@example.com', 'password')
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.now = timezone.now()
+        self.prefix = f'INV-{self.now.year}-{self.now.month:02d}-'
+
+    def create_invoice(self, user=None, **fields):
+        user = user or self.user
+        client = self.client_obj if user == self.user else Client.objects.create(user=user, name='Other')
+        return Invoice.objects.create(user=user, client=client, due_date=self.now.date(), **fields)
+
+    def test_sequences_are_consecutive_per_user(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+
+        numbers = [self.create_invoice().invoice_number for _ in range(3)]
+        self.assertEqual(numbers, [f'{self.prefix}{number:04d}' for number in (1, 2, 3)])
+        self.assertEqual(self.create_invoice(other).invoice_number, f'{self.prefix}0001')
+        self.assertEqual(allocate_invoice_numbers(self.user.id, 2), [f'{self.prefix}0004', f'{self.prefix}0005'])
+
+    def test_format_decides_when_numbering_restarts(self):
+        self.user.profile.invoice_number_format = 'ACME-{year}-{number}'
+        self.user.profile.save()
+
+        self.assertEqual(next_invoice_number(self.user.id, date(2025, 1, 10)), 'ACME-2025-1')
+        self.assertEqual(next_invoice_number(self.user.id, date(2025, 12, 10)), 'ACME-2025-2')
+        self.assertEqual(next_invoice_number(self.user.id, date(2026, 1, 10)), 'ACME-2026-1')
+
+    def test_numbers_written_outside_the_sequence_are_skipped(self):
+        self.assertEqual(self.create_invoice().invoice_number, f'{self.prefix}0001')
+        # e.g. an admin edit or an imported invoice taking the next numbers
+        self.create_invoice(invoice_number=f'{self.prefix}0002')
+        self.create_invoice(invoice_number=f'{self.prefix}0005')
+
+        self.assertEqual(self.create_invoice().invoice_number, f'{self.prefix}0006')
+        self.assertEqual(InvoiceSequence.objects.get(user=self.user).last_number, 6)
+
+
+class InvoiceSearchTests(TestCase):
+    """The search index follows invoice, item and client changes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('searcher', 'searcher@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.acme = Client.objects.create(user=self.user, name='Acme Corporation')
+        self.globex = Client.objects.create(user=self.user, name='Globex')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def create_invoice(self, client, descriptions, notes=''):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post('/api/invoice/', {
+                'client': str(client.id),
+                'issue_date': timezone.now().date().isoformat(),
+                'due_date': timezone.now().date().isoformat(),
+                'notes': notes,
+                'items': [{'description': text, 'quantity': '1', 'unit_price': '10.00'} for text in descriptions],
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Invoice.objects.get(id=response.data['id'])
+
+    def search(self, query):
+        response = self.api.get('/api/invoice/search/', {'q': query})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [result['id'] for result in response.data['results']]
+
+    def test_matches_number_client_items_and_notes(self):
+        first = self.create_invoice(self.acme, ['Website redesign'])
+        second = self.create_invoice(self.globex, ['Hosting'], notes='Quarterly retainer')
+
+        self.assertEqual(self.search('acme'), [str(first.id)])
+        self.assertEqual(self.search('redesign'), [str(first.id)])
+        self.assertEqual(self.search('retain'), [str(second.id)])
+        # Partial invoice numbers match as prefixes: INV-2026-10 finds both, INV-2026-10-0002 only one
+        self.assertCountEqual(self.search(second.invoice_number.rsplit('-', 1)[0]), [str(first.id), str(second.id)])
+        self.assertEqual(self.search(second.invoice_number), [str(second.id)])
+
+    def test_results_are_ranked_and_scoped_to_the_user(self):
+        strong = self.create_invoice(self.globex, ['Consulting', 'Consulting follow-up'], notes='Consulting')
+        weak = self.create_invoice(self.globex, ['Consulting', 'Hardware', 'Shipping', 'Installation'])
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        other_client = Client.objects.create(user=other, name='Consulting Ltd')
+        with self.captureOnCommitCallbacks(execute=True):
+            Invoice.objects.create(user=other, client=other_client, due_date=timezone.now().date())
+
+        self.assertEqual(self.search('consulting'), [str(strong.id), str(weak.id)])
+
+    def test_index_follows_item_deletes_and_client_renames(self):
+        invoice = self.create_invoice(self.acme, ['Logo design', 'Printing'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice.items.get(description='Printing').delete()
+        self.assertEqual(self.search('printing'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.acme.name = 'Initech'
+            self.acme.save()
+        self.assertEqual(self.search('initech'), [str(invoice.id)])
+        self.assertEqual(self.search('acme'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice.delete()
+        self.assertEqual(self.search('logo'), [])
+
+    def test_list_search_uses_the_index(self):
+        invoice = self.create_invoice(self.acme, ['Website redesign'])
+        self.create_invoice(self.globex, ['Hosting'])
+
+        response = self.api.get('/api/invoice/', {'search': 'redesign'})
+
+        self.assertEqual([result['id'] for result in response.data['results']], [str(invoice.id)])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.api.get('/api/invoice/search/').status_code, 400)
+
+
+class InvoiceListTests(TestCase):
+    """A page of the invoice list costs a fixed number of queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('lister', 'lister@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def create_invoices(self, count):
+        for _ in range(count):
+            Invoice.objects.create_with_items(
+                [{'description': 'Work', 'quantity': 1, 'unit_price': Decimal('10.00')}],
+                user=self.user, client=self.client_obj, due_date=timezone.now().date()
+            )
+
+    def count_list_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get('/api/invoice/', {'page_size': 100, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries), response.data['results']
+
+    def test_rows_are_slim_by_default(self):
+        self.create_invoices(1)
+
+        _, results = self.count_list_queries()
+
+        self.assertEqual(results[0]['client_name'], 'Acme')
+        self.assertNotIn('items', results[0])
+        self.assertNotIn('user', results[0])
+
+    def test_expand_adds_items_and_user(self):
+        self.create_invoices(1)
+
+        _, results = self.count_list_queries(expand='items,user')
+
+        self.assertEqual(results[0]['items'][0]['description'], 'Work')
+        self.assertEqual(results[0]['user']['username'], 'lister')
+
+    def test_query_count_is_independent_of_page_size(self):
+        self.create_invoices(3)
+        small = [self.count_list_queries()[0], self.count_list_queries(expand='items,user')[0]]
+
+        self.create_invoices(40)
+        large = [self.count_list_queries()[0], self.count_list_queries(expand='items,user')[0]]
+
+        self.assertEqual(small, large)
+
+    def walk(self, url, params=None):
+        pages = []
+        response = self.api.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            pages.append(response.data)
+            if not response.data['next']:
+                return pages
+            response = self.api.get(response.data['next'])
+
+    def test_cursor_pages_cover_every_invoice_once(self):
+        self.create_invoices(23)
+        # Equal timestamps must still page in a stable order
+        Invoice.objects.filter(user=self.user).update(created_at=timezone.now())
+
+        pages = self.walk('/api/invoice/', {'pagination': 'cursor', 'page_size': 5})
+
+        ids = [row['id'] for page in pages for row in page['results']]
+        self.assertEqual(len(pages), 5)
+        self.assertEqual(len(ids), 23)
+        self.assertEqual(len(set(ids)), 23)
+        self.assertNotIn('count', pages[0])
+        self.assertIsNone(pages[0]['previous'])
+
+        by_page_number = self.walk('/api/invoice/', {'page_size': 5})
+        self.assertEqual(ids, [row['id'] for page in by_page_number for row in page['results']])
+
+    def test_cursor_previous_link_returns_the_previous_page(self):
+        self.create_invoices(12)
+        first = self.api.get('/api/invoice/', {'pagination': 'cursor', 'page_size': 5}).data
+        second = self.api.get(first['next']).data
+
+        back = self.api.get(second['previous']).data
+
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_cursor_total_is_optional(self):
+        self.create_invoices(3)
+
+        response = self.api.get('/api/invoice/', {'pagination': 'cursor', 'include_total': 'true'})
+
+        self.assertEqual(response.data['approximate_count'], 3)
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.api.get('/api/invoice/', {'cursor': 'garbage'}).status_code, 404)
+
+
+class InvoiceBulkImportTests(TestCase):
+    """Bulk imports write in batches and report every row"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('importer', 'importer@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.acme = Client.objects.create(user=self.user, name='Acme')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def invoice(self, client, **fields):
+        return {
+            'client': client,
+            'issue_date': '2025-03-01',
+            'due_date': '2025-04-01',
+            'items': [{'description': 'Work', 'quantity': '2', 'unit_price': '10.00'}],
+            **fields,
+        }
+
+    def test_json_import_reports_each_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post('/api/invoice/bulk/', [
+                self.invoice('acme', tax_rate='10'),
+                self.invoice(str(self.acme.id), invoice_number='LEGACY-1'),
+                self.invoice('Unknown Ltd'),
+                self.invoice('Acme', invoice_number='LEGACY-1'),
+            ], format='json')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'created', 'failed', 'failed'])
+        self.assertIn('client', response.data['results'][2]['errors'])
+        self.assertIn('invoice_number', response.data['results'][3]['errors'])
+
+        first = Invoice.objects.get(id=response.data['results'][0]['id'])
+        self.assertTrue(first.invoice_number)
+        self.assertEqual(first.total, Decimal('22.00'))
+        self.assertEqual(first.search_document.content.split()[1:], ['Acme', 'Work'])
+
+    def test_paid_rows_are_settled(self):
+        get_analytics_cache().clear()
+        response = self.api.post('/api/invoice/bulk/', [
+            self.invoice('Acme', status='paid'),
+            self.invoice('Acme'),
+        ], format='json')
+
+        self.assertEqual(response.data['created'], 2, response.content)
+        paid, unpaid = (Invoice.objects.get(id=result['id']) for result in response.data['results'])
+        self.assertEqual((paid.amount_paid, paid.balance_due), (Decimal('20.00'), Decimal('0.00')))
+        self.assertEqual(paid.payments.values_list('gateway_name', 'status', 'amount').get(),
+                         ('manual', 'completed', Decimal('20.00')))
+        self.assertEqual((unpaid.amount_paid, unpaid.balance_due), (Decimal('0.00'), Decimal('20.00')))
+        self.assertFalse(unpaid.payments.exists())
+        self.assertEqual(self.api.get('/api/analytic/aging/').data['total_outstanding'], 20.0)
+
+    def test_imported_numbers_are_reserved_in_the_sequence(self):
+        prefix = f'INV-{timezone.now():%Y-%m}-'
+        response = self.api.post('/api/invoice/bulk/', [
+            self.invoice('Acme', invoice_number=f'{prefix}0007'),
+            self.invoice('Acme'),
+        ], format='json')
+
+        self.assertEqual(response.data['created'], 2, response.content)
+        self.assertEqual(Invoice.objects.get(id=response.data['results'][1]['id']).invoice_number, f'{prefix}0008')
+        self.assertEqual(InvoiceSequence.objects.get(user=self.user).last_number, 8)
+
+        # Later invoices continue after the imported number instead of colliding with it
+        response = self.api.post('/api/invoice/bulk/', [self.invoice('Acme', invoice_number=f'{prefix}0012')],
+                                 format='json')
+        self.assertEqual(response.data['created'], 1, response.content)
+        self.assertEqual(next_invoice_number(self.user.id), f'{prefix}0013')
+
+    def test_query_count_is_independent_of_row_count(self):
+        def count_import_queries(count):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.api.post('/api/invoice/bulk/', [self.invoice('Acme')] * count, format='json')
+            self.assertEqual(response.data['created'], count)
+            return len(queries)
+
+        # The first import seeds the number sequence
+        count_import_queries(1)
+
+        # Both sizes fit in one INSERT batch even under SQLite's variable limit
+        self.assertEqual(count_import_queries(5), count_import_queries(40))
+
+    def test_csv_lines_are_grouped_by_reference(self):
+        body = '\n'.join([
+            'reference,client,issue_date,due_date,status,description,quantity,unit_price',
+            'A,Acme,2025-03-01,2025-04-01,paid,Design,1,100.00',
+            'A,,,,,Hosting,1,20.00',
+            'B,Acme,2025-03-02,2025-04-02,,Support,3,10.00',
+        ])
+
+        response = self.api.post('/api/invoice/bulk/', body, content_type='text/csv')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual([result['row'] for result in response.data['results']], [2, 4])
+        paid = Invoice.objects.get(id=response.data['results'][0]['id'])
+        self.assertEqual((paid.status, paid.items.count(), paid.total), ('paid', 2, Decimal('120.00')))
+        self.assertEqual(self.user.daily_rollups.get().income, Decimal('120.00'))
+
+    def test_dry_run_writes_nothing(self):
+        response = self.api.post('/api/invoice/bulk/?dry_run=true', [self.invoice('Acme')], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['valid'], 1)
+        self.assertFalse(Invoice.objects.exists())
+
+
+class InvoiceBulkStatusTests(TestCase):
+    """Bulk status changes are one UPDATE and one payment INSERT per request"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('payer', 'payer@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def create_invoices(self, count, status='unpaid'):
+        return [
+            Invoice.objects.create_with_items(
+                [{'description': 'Work', 'quantity': 1, 'unit_price': Decimal('50.00')}],
+                user=self.user, client=self.client_obj, status=status,
+                issue_date=timezone.now().date(), due_date=timezone.now().date()
+            )
+            for _ in range(count)
+        ]
+
+    def mark_paid(self, invoices, **fields):
+        return self.api.post('/api/invoice/bulk/status/', {
+            'ids': [str(invoice.id) for invoice in invoices], 'status': 'paid', **fields
+        }, format='json')
+
+    def test_mark_paid_records_payments_and_rollups(self):
+        unpaid = self.create_invoices(2)
+        overdue = self.create_invoices(1, status='overdue')
+
+        response = self.mark_paid(unpaid + overdue, from_status=['unpaid'], payment_method='bank_transfer')
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCountEqual(response.data['updated'], [invoice.id for invoice in unpaid])
+        self.assertEqual(response.data['skipped'],
+                         [{'id': overdue[0].id, 'reason': 'precondition_failed', 'status': 'overdue'}])
+        self.assertEqual(response.data['payments_created'], 2)
+        self.assertEqual(Invoice.objects.filter(status='paid').count(), 2)
+
+        payment = unpaid[0].payments.get()
+        self.assertEqual((payment.gateway_name, payment.status, payment.amount), ('manual', 'completed', Decimal('50.00')))
+        self.assertEqual(self.user.daily_rollups.get().income, Decimal('100.00'))
+
+    def test_partly_paid_invoices_get_the_balance_and_one_version_bump(self):
+        partly, settled = self.create_invoices(2)
+        InvoicePayment.objects.create(invoice=partly, gateway_name='manual', amount=Decimal('20.00'), status='completed')
+        # Already covered by payments but reopened by hand: nothing left to record
+        InvoicePayment.objects.create(invoice=settled, gateway_name='manual', amount=Decimal('50.00'), status='completed')
+        Invoice.objects.filter(id=settled.id).update(status='unpaid')
+        version = get_data_version(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.mark_paid([partly, settled])
+
+        self.assertEqual(response.data['payments_created'], 1)
+        self.assertEqual(partly.payments.order_by('created_at').last().amount, Decimal('30.00'))
+        self.assertEqual(Invoice.objects.values_list('amount_paid', 'balance_due').get(id=partly.id),
+                         (Decimal('50.00'), Decimal('0.00')))
+        self.assertEqual(get_data_version(self.user.id), version + 1)
+
+    def test_other_users_and_unchanged_invoices_are_skipped(self):
+        paid = self.create_invoices(1, status='paid')
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        foreign = Invoice.objects.create(user=other, client=Client.objects.create(user=other, name='X'),
+                                         issue_date=timezone.now().date(), due_date=timezone.now().date())
+
+        response = self.mark_paid(paid + [foreign])
+
+        self.assertEqual(response.data['updated'], [])
+        self.assertEqual([skip['reason'] for skip in response.data['skipped']], ['unchanged', 'not_found'])
+        self.assertEqual(Invoice.objects.get(id=foreign.id).status, 'unpaid')
+
+    def test_query_count_is_independent_of_invoice_count(self):
+        def count_queries(invoices):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.mark_paid(invoices)
+            self.assertEqual(len(response.data['updated']), len(invoices))
+            return len(queries)
+
+        # The first payment of the day creates the rollup row; later ones update it
+        count_queries(self.create_invoices(1))
+        self.assertEqual(count_queries(self.create_invoices(2)), count_queries(self.create_invoices(30)))
+
+
+class OverdueSweepTests(TestCase):
+    """The overdue sweep flips every tenant's past-due unpaid invoices in chunks"""
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.users = [User.objects.create_user(f'sweep{index}', f'sweep{index}@example.com', 'password')
+                      for index in range(2)]
+
+    def create_invoice(self, user, days_overdue, status='unpaid'):
+        client = Client.objects.get_or_create(user=user, name='Acme')[0]
+        return Invoice.objects.create(user=user, client=client, status=status, issue_date=self.today,
+                                      due_date=self.today - timedelta(days=days_overdue))
+
+    def test_sweeps_past_due_unpaid_invoices_of_all_users(self):
+        overdue = [self.create_invoice(user, days) for user in self.users for days in (1, 5, 30)]
+        due_today = self.create_invoice(self.users[0], 0)
+        paid = self.create_invoice(self.users[0], 10, status='paid')
+        version = get_data_version(self.users[1].id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = mark_overdue_invoices(chunk_size=4)
+
+        self.assertEqual(result, {'updated': 6, 'chunks': 2, 'users': 2})
+        self.assertEqual(Invoice.objects.filter(id__in=[invoice.id for invoice in overdue], status='overdue').count(), 6)
+        self.assertEqual(Invoice.objects.get(id=due_today.id).status, 'unpaid')
+        self.assertEqual(Invoice.objects.get(id=paid.id).status, 'paid')
+        self.assertGreater(get_data_version(self.users[1].id), version)
+
+    def test_query_count_per_chunk_is_constant(self):
+        for days in range(1, 11):
+            self.create_invoice(self.users[days % 2], days)
+
+        with CaptureQueriesContext(connection) as queries:
+            mark_overdue_invoices(chunk_size=10)
+        self.assertEqual(Invoice.objects.filter(status='overdue').count(), 10)
+        # Chunk select and update, then the empty probe that ends the sweep
+        self.assertEqual(len([query for query in queries if 'invoice_invoice' in query['sql']]), 3)
+
+    def test_command_reports_and_is_idempotent(self):
+        self.create_invoice(self.users[0], 3)
+
+        out = StringIO()
+        call_command('mark_overdue_invoices', stdout=out)
+        call_command('mark_overdue_invoices', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('Marked 1 invoices overdue for 1 users in 1 chunks'))
+        self.assertTrue(lines[1].startswith('Marked 0 invoices overdue for 0 users in 0 chunks'))
+
+
+class InvoicePDFTests(TestCase):
+    """PDFs are rendered once per content version and served from the cache"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        settings_override = override_settings(INVOICE_PDF_CACHE_DIR=self.cache_dir, INVOICE_PDF_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('renderer', 'renderer@example.com', 'password')
+        self.client_obj = Client.objects.create(user=self.user, name='Acme (Intl)', email='billing@acme.test')
+        self.invoice = Invoice.objects.create_with_items(
+            [{'description': 'Design', 'quantity': 2, 'unit_price': Decimal('50.00')}],
+            user=self.user, client=self.client_obj, issue_date=timezone.now().date(), due_date=timezone.now().date()
+        )
+        self.url = f'/api/invoice/{self.invoice.id}/pdf/'
+
+    def cached_files(self):
+        directory = os.path.join(self.cache_dir, str(self.invoice.id))
+        return os.listdir(directory) if os.path.isdir(directory) else []
+
+    def test_public_pdf_with_etag_revalidation(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF-1.4'))
+        self.assertIn(f'filename="{self.invoice.invoice_number}.pdf"', response['Content-Disposition'])
+        self.assertEqual(len(self.cached_files()), 1)
+
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+        cached = self.client.get(self.url, HTTP_ACCEPT='application/pdf')
+        self.assertEqual(cached.content, response.content)
+
+    def test_revalidation_skips_the_snapshot(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], etag)
+
+    def test_render_timeout_answers_503(self):
+        for error in [FuturesTimeoutError(), BrokenProcessPool('worker died')]:
+            with self.subTest(error=type(error).__name__), \
+                    mock.patch('invoice.rendering.render_pdf', side_effect=error):
+                response = self.client.get(self.url)
+
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], str(settings.INVOICE_PDF_RETRY_AFTER))
+            self.assertEqual(self.cached_files(), [])
+
+    def test_broken_pool_is_replaced(self):
+        broken = mock.Mock()
+        broken.submit.return_value.result.side_effect = BrokenProcessPool('worker died')
+
+        with override_settings(INVOICE_PDF_WORKERS=1), \
+                mock.patch('invoice.rendering._pool', broken), \
+                mock.patch('invoice.rendering.ProcessPoolExecutor') as executor:
+            with self.assertRaises(BrokenProcessPool):
+                rendering.render_pdf({})
+            rendering.render_pool()
+
+            executor.assert_called_once()
+
+    def test_client_rename_renders_a_new_version(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client_obj.name = 'Acme Holdings'
+        self.client_obj.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(self.cached_files()), 1)
+
+    def test_deleting_the_invoice_drops_its_pdfs(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invoice.delete()
+        self.assertEqual(self.cached_files(), [])
+
+    def test_long_invoices_break_into_pages(self):
+        data = invoice_pdf_data(pdf_queryset().get(id=self.invoice.id))
+        data['items'] = data['items'] * 80
+
+        pdf = render_invoice(data)
+
+        self.assertGreater(pdf.count(b'/Type /Page '), 1)
+        self.assertTrue(pdf.rstrip().endswith(b'%%EOF'))
+
+    def test_batch_command_renders_in_a_pool_and_skips_cached(self):
+        out = StringIO()
+        month = self.invoice.issue_date.strftime('%Y-%m')
+        call_command('render_invoice_pdfs', '--month', month, '--workers', '1', stdout=out)
+        call_command('render_invoice_pdfs', '--month', month, '--workers', '1', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('Rendered 1 invoice PDFs (0 already cached)'))
+        self.assertTrue(lines[1].startswith('Rendered 0 invoice PDFs (1 already cached)'))
+        self.assertEqual(len(self.cached_files()), 1)
+
+
+class InvoiceConditionalGetTests(TestCase):
+    """The public invoice detail answers revalidations without serializing"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.invoice = Invoice.objects.create_with_items(
+            [{'description': 'Design', 'quantity': 1, 'unit_price': Decimal('50.00')}],
+            user=self.user, client=self.client_obj, issue_date=timezone.now().date(), due_date=timezone.now().date()
+        )
+        self.url = f'/api/invoice/{self.invoice.id}/'
+
+    def test_matching_etag_returns_304_with_one_query(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connection) as queries:
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], etag)
+        self.assertEqual(len(queries), 1)
+
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes_to_any_rendered_row_change_the_etag(self):
+        etags = [self.client.get(self.url)['ETag']]
+
+        api = APIClient()
+        api.force_authenticate(self.user)
+        item = self.invoice.items.get()
+        api.patch(self.url, {'items': [{'id': item.id, 'description': 'Design', 'quantity': 2, 'unit_price': '50.00'}]},
+                  format='json')
+        etags.append(self.client.get(self.url)['ETag'])
+
+        self.client_obj.name = 'Acme Holdings'
+        self.client_obj.save()
+        etags.append(self.client.get(self.url)['ETag'])
+
+        self.user.profile.company_name = 'Studio'
+        self.user.profile.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[-1])
+        etags.append(response['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['company_name'], 'Studio')
+        self.assertEqual(len(set(etags)), 4)
+
+    def test_missing_invoice_is_404(self):
+        response = self.client.get(f'/api/invoice/{uuid.uuid4()}/')
+        self.assertEqual(response.status_code, 404)
+
+
+class RecurringInvoiceTests(TestCase):
+    """Templates generate one invoice per scheduled date, in batches"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('retainer', 'retainer@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def create_template(self, start_date, **fields):
+        template = RecurringInvoice.objects.create(
+            user=self.user, client=self.client_obj, start_date=start_date, next_run=start_date,
+            tax_rate=Decimal('10.00'), **fields
+        )
+        RecurringInvoiceItem.objects.create(recurring_invoice=template, description='Retainer',
+                                            quantity=Decimal('1'), unit_price=Decimal('1000.00'))
+        return template
+
+    def test_create_through_the_api(self):
+        response = self.api.post('/api/invoice/recurring/', {
+            'client': str(self.client_obj.id), 'frequency': 'monthly', 'start_date': '2025-01-31',
+            'items': [{'description': 'Retainer', 'quantity': 1, 'unit_price': '1000.00'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['next_run'], '2025-01-31')
+        self.assertEqual(len(response.data['items']), 1)
+
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        foreign = self.api.post('/api/invoice/recurring/', {
+            'client': str(Client.objects.create(user=other, name='X').id), 'start_date': '2025-01-31',
+            'items': [{'description': 'Retainer', 'quantity': 1, 'unit_price': '1000.00'}],
+        }, format='json')
+        self.assertEqual(foreign.status_code, 400)
+        self.assertIn('client', foreign.data)
+
+    def test_monthly_catch_up_keeps_the_start_day_and_is_idempotent(self):
+        template = self.create_template(date(2025, 1, 31))
+
+        stats = RecurringInvoiceGenerator(today=date(2025, 4, 15)).run()
+
+        self.assertEqual((stats['templates'], stats['invoices'], stats['items']), (1, 3, 3))
+        invoices = Invoice.objects.filter(recurring_invoice=template).order_by('issue_date')
+        self.assertEqual([invoice.issue_date for invoice in invoices],
+                         [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31)])
+        self.assertEqual(invoices[0].due_date, date(2025, 2, 14))
+        self.assertEqual(invoices[0].total, Decimal('1100.00'))
+        self.assertEqual(len({invoice.invoice_number for invoice in invoices}), 3)
+        template.refresh_from_db()
+        self.assertEqual(template.next_run, date(2025, 4, 30))
+
+        # A second run has nothing to do; moving next_run back does not duplicate invoices
+        self.assertEqual(RecurringInvoiceGenerator(today=date(2025, 4, 15)).run()['invoices'], 0)
+        RecurringInvoice.objects.filter(id=template.id).update(next_run=date(2025, 1, 31))
+        stats = RecurringInvoiceGenerator(today=date(2025, 4, 15)).run()
+        self.assertEqual((stats['invoices'], stats['skipped']), (0, 3))
+        self.assertEqual(invoices.count(), 3)
+
+    def test_end_date_finishes_the_template(self):
+        template = self.create_template(date(2025, 3, 3), frequency='weekly', interval=2, end_date=date(2025, 3, 20))
+
+        RecurringInvoiceGenerator(today=date(2025, 6, 1)).run()
+
+        template.refresh_from_db()
+        self.assertFalse(template.is_active)
+        self.assertEqual(sorted(template.invoices.values_list('issue_date', flat=True)),
+                         [date(2025, 3, 3), date(2025, 3, 17)])
+
+    def test_query_count_is_independent_of_template_count(self):
+        def count_queries(templates):
+            with self.captureOnCommitCallbacks(execute=False), CaptureQueriesContext(connection) as queries:
+                stats = RecurringInvoiceGenerator(today=date(2025, 1, 10)).run()
+            self.assertEqual(stats['invoices'], templates)
+            return len(queries)
+
+        # The first run of the month creates the number sequence; later runs only increment it
+        self.create_template(date(2025, 1, 1))
+        count_queries(1)
+        for _ in range(5):
+            self.create_template(date(2025, 1, 1))
+        few = count_queries(5)
+        # 40 invoices still fit in one INSERT batch under SQLite's variable limit
+        for _ in range(40):
+            self.create_template(date(2025, 1, 2))
+        self.assertEqual(few, count_queries(40))
+
+    def test_command_reports_throughput(self):
+        self.create_template(date(2025, 1, 1))
+        out = StringIO()
+        call_command('generate_recurring_invoices', '--date', '2025-01-01', stdout=out)
+        self.assertIn('Generated 1 invoices (1 items) from 1 templates in 1 chunks', out.getvalue())
+
+
+class InvoiceBalanceTests(TestCase):
+    """amount_paid, balance_due and last_payment_at follow the invoice's payments"""
+
+    def setUp(self):
+        get_analytics_cache().clear()
+        self.user = User.objects.create_user('debtor', 'debtor@example.com', 'password')
+        self.user.profile.is_email_verified = True
+        self.user.profile.save()
+        self.client_obj = Client.objects.create(user=self.user, name='Acme')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.invoice = self.create_invoice(Decimal('100.00'))
+
+    def create_invoice(self, amount, due_in=14):
+        today = timezone.now().date()
+        return Invoice.objects.create_with_items(
+            [{'description': 'Work', 'quantity': 1, 'unit_price': amount}],
+            user=self.user, client=self.client_obj, issue_date=today, due_date=today + timedelta(days=due_in)
+        )
+
+    def pay(self, invoice, amount, status='completed'):
+        return InvoicePayment.objects.create(invoice=invoice, gateway_name='manual', amount=amount, status=status)
+
+    def balances(self, invoice):
+        return Invoice.objects.values_list('status', 'amount_paid', 'balance_due').get(id=invoice.id)
+
+    def test_new_invoices_owe_their_total(self):
+        self.assertEqual(self.balances(self.invoice), ('unpaid', Decimal('0.00'), Decimal('100.00')))
+
+    def test_completed_and_refunded_payments(self):
+        pending = self.pay(self.invoice, Decimal('100.00'), status='pending')
+        self.assertEqual(self.balances(self.invoice), ('unpaid', Decimal('0.00'), Decimal('100.00')))
+
+        pending.status = 'completed'
+        pending.save()
+        self.assertEqual(self.balances(self.invoice), ('paid', Decimal('100.00'), Decimal('0.00')))
+        self.assertEqual(Invoice.objects.get(id=self.invoice.id).last_payment_at, pending.payment_date)
+
+        pending.status = 'refunded'
+        pending.save()
+        invoice = Invoice.objects.get(id=self.invoice.id)
+        self.assertEqual(self.balances(invoice), ('unpaid', Decimal('0.00'), Decimal('100.00')))
+        self.assertIsNone(invoice.last_payment_at)
+
+    def test_partial_payments_leave_the_invoice_open(self):
+        first = self.pay(self.invoice, Decimal('30.00'))
+        self.assertEqual(self.balances(self.invoice), ('unpaid', Decimal('30.00'), Decimal('70.00')))
+
+        self.pay(self.invoice, Decimal('70.00'))
+        self.assertEqual(self.balances(self.invoice), ('paid', Decimal('100.00'), Decimal('0.00')))
+
+        # Refunding part of it reopens the invoice, overdue once it is past due
+        Invoice.objects.filter(id=self.invoice.id).update(due_date=timezone.now().date() - timedelta(days=1))
+        first.status = 'refunded'
+        first.save()
+        self.assertEqual(self.balances(self.invoice), ('overdue', Decimal('70.00'), Decimal('30.00')))
+
+    def test_overpayments_settle_without_a_negative_balance(self):
+        self.pay(self.invoice, Decimal('120.00'))
+        self.assertEqual(self.balances(self.invoice), ('paid', Decimal('120.00'), Decimal('0.00')))
+
+    def test_invoices_marked_paid_by_hand_are_not_outstanding(self):
+        overdue = self.create_invoice(Decimal('40.00'), due_in=-10)
+        response = self.api.patch(f'/api/invoice/{self.invoice.id}/', {'status': 'paid'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        overdue.status = 'paid'
+        overdue.save()
+
+        aging = self.api.get('/api/analytic/aging/').data
+        self.assertEqual((aging['total_outstanding'], aging['overdue'], aging['invoice_count']), (0, 0, 0))
+        self.assertFalse(Invoice.objects.filter(OPEN_BALANCE, user=self.user).exists())
+
+        # Reopened, the amount nothing was recorded against is owed again
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.patch(f'/api/invoice/{self.invoice.id}/', {'status': 'unpaid'}, format='json')
+        self.assertEqual(self.api.get('/api/analytic/aging/').data['total_outstanding'], 100.0)
+
+    def test_stale_invoice_saves_keep_the_amount_paid(self):
+        stale = Invoice.objects.get(id=self.invoice.id)
+        payment = self.pay(self.invoice, Decimal('30.00'), status='pending')
+        Invoice.objects.filter(id=self.invoice.id).update(status='overdue')
+        payment.status = 'completed'
+        payment.payment_date = timezone.now()
+        payment.save()
+
+        stale.status = 'overdue'
+        stale.notes = 'Reminder sent'
+        stale.save()
+        self.assertEqual(self.balances(stale), ('overdue', Decimal('30.00'), Decimal('70.00')))
+
+    def test_deleting_payments_and_invoices(self):
+        payment = self.pay(self.invoice, Decimal('100.00'))
+        self.assertEqual(Invoice.objects.get(id=self.invoice.id).amount_paid, Decimal('100.00'))
+
+        payment.delete()
+        self.assertEqual(Invoice.objects.get(id=self.invoice.id).amount_paid, Decimal('0.00'))
+
+        self.pay(self.invoice, Decimal('100.00'))
+        Invoice.objects.filter(id=self.invoice.id).delete()
+        self.assertFalse(InvoicePayment.objects.exists())
+
+    def test_bulk_status_changes_settle_and_reopen(self):
+        other = self.create_invoice(Decimal('50.00'))
+        ids = [str(self.invoice.id), str(other.id)]
+
+        self.api.post('/api/invoice/bulk/status/', {'ids': ids, 'status': 'paid'}, format='json')
+        self.assertEqual(self.balances(other), ('paid', Decimal('50.00'), Decimal('0.00')))
+
+        # Reopening takes the manual payments back, so the invoices owe their totals again
+        response = self.api.post('/api/invoice/bulk/status/', {'ids': ids, 'status': 'unpaid'}, format='json')
+        self.assertEqual(response.data['payments_refunded'], 2)
+        self.assertEqual(self.balances(other), ('unpaid', Decimal('0.00'), Decimal('50.00')))
+        self.assertEqual(self.api.get('/api/analytic/aging/').data['total_outstanding'], 150.0)
+
+    def test_invoices_paid_through_a_gateway_are_not_reopened(self):
+        InvoicePayment.objects.create(invoice=self.invoice, gateway_name='stripe', amount=Decimal('100.00'),
+                                      status='completed')
+
+        response = self.api.post('/api/invoice/bulk/status/', {'ids': [str(self.invoice.id)], 'status': 'unpaid'},
+                                 format='json')
+
+        self.assertEqual(response.data['skipped'],
+                         [{'id': self.invoice.id, 'reason': 'paid_by_gateway', 'status': 'paid'}])
+        self.assertEqual(self.balances(self.invoice), ('paid', Decimal('100.00'), Decimal('0.00')))
+
+    def test_detail_exposes_balances_and_changes_etag(self):
+        url = f'/api/invoice/{self.invoice.id}/'
+        response = self.api.get(url)
+        self.assertEqual(response.data['balance_due'], '100.00')
+
+        self.pay(self.invoice, Decimal('100.00'))
+        revalidated = self.api.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertEqual(revalidated.data['amount_paid'], '100.00')
+
+    def test_aging_report(self):
+        self.create_invoice(Decimal('20.00'), due_in=-10)
+        self.create_invoice(Decimal('30.00'), due_in=-45)
+        self.create_invoice(Decimal('40.00'), due_in=-120)
+        self.pay(self.create_invoice(Decimal('50.00'), due_in=-5), Decimal('50.00'))
+
+        response = self.api.get('/api/analytic/aging/')
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual({bucket['bucket']: bucket['amount'] for bucket in response.data['buckets']},
+                         {'current': 100.0, '1-30': 20.0, '31-60': 30.0, '61-90': 0.0, '90+': 40.0})
+        self.assertEqual((response.data['total_outstanding'], response.data['overdue']), (190.0, 90.0))
+        self.assertEqual(response.data['invoice_count'], 4)
+
+    def test_repair_command(self):
+        self.pay(self.invoice, Decimal('100.00'))
+        other = self.create_invoice(Decimal('25.00'))
+        Invoice.objects.filter(id=self.invoice.id).update(amount_paid=0)
+        Invoice.objects.filter(id=other.id).update(balance_due=0)
+
+        with self.assertRaisesMessage(CommandError, '2 invoices have wrong balances'):
+            call_command('repair_invoice_balances', '--chunk-size', '1', stdout=StringIO())
+
+        out = StringIO()
+        call_command('repair_invoice_balances', '--fix', stdout=out)
+        self.assertIn('2 wrong, 2 fixed', out.getvalue())
+        self.assertEqual(Invoice.objects.get(id=self.invoice.id).amount_paid, Decimal('100.00'))
+        self.assertEqual(Invoice.objects.get(id=other.id).balance_due, Decimal('25.00'))
+
+        out = StringIO()
+        call_command('repair_invoice_balances', stdout=out)
+        self.assertIn('0 wrong, 0 fixed', out.getvalue())
@@ -0,0 +1,160 @@
+"""Set-based invoice status changes.
+
+``apply_bulk_status`` moves many invoices of one user to a new status with a
+single ``UPDATE``, optionally only from given statuses, records a manual
+payment of the balance due of each invoice marked paid with one
+``bulk_create`` (and marks those manual payments refunded when a paid invoice
+is reopened, so it owes its balance again), refreshes their balances (``invoice/balances.py``) in one
+pass and sends ``invoices_bulk_updated`` once so rollups and cached
+analytics refresh once per batch instead of once per invoice.
+
+``mark_overdue_invoices`` is the periodic sweep that moves every tenant's
+unpaid invoices past their due date to ``overdue``, in short chunks.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from payment.models import InvoicePayment
+from users.models import UserProfile
+from .balances import BALANCE_FIELDS, refresh_invoice_balances
+from .models import Invoice, invoices_bulk_updated
+
+
+BULK_STATUS_MAX_INVOICES = 1000
+
+OVERDUE_CHUNK_SIZE = 2000
+
+
+def apply_bulk_status(user, invoice_ids, new_status, from_statuses=None, record_payment=False,
+                      payment_method='', paid_at=None):
+    """Move the user's ``invoice_ids`` to ``new_status``; returns the per-invoice outcome.
+
+    Invoices that are missing (or belong to someone else), already have
+    ``new_status`` or are not in one of ``from_statuses`` are skipped with a
+    reason. Payments are only recorded when marking invoices paid.
+
+    Reopening a paid invoice refunds its manual payments. An invoice whose
+    gateway payments alone cover the total stays paid and is skipped.
+    """
+    invoice_ids = list(dict.fromkeys(invoice_ids))
+    paid_at = paid_at or timezone.now()
+
+    with transaction.atomic():
+        # Lock the rows so a concurrent change cannot slip between the checks and the update
+        current = {
+            invoice_id: (invoice_status, issue_date, balance_due, total)
+            for invoice_id, invoice_status, issue_date, balance_due, total in Invoice.objects.select_for_update()
+            .filter(user=user, id__in=invoice_ids)
+            .values_list('id', 'status', 'issue_date', 'balance_due', 'total')
+        }
+        gateway_paid = {}
+        if new_status != 'paid' and any(values[0] == 'paid' for values in current.values()):
+            gateway_paid = dict(
+                InvoicePayment.objects.filter(invoice_id__in=current, status='completed')
+                .exclude(gateway_name='manual')
+                .values('invoice_id').annotate(paid=Sum('amount')).order_by()
+                .values_list('invoice_id', 'paid')
+            )
+
+        changed, skipped = [], []
+        for invoice_id in invoice_ids:
+            if invoice_id not in current:
+                skipped.append({'id': invoice_id, 'reason': 'not_found'})
+                continue
+            invoice_status = current[invoice_id][0]
+            if invoice_status == new_status:
+                skipped.append({'id': invoice_id, 'reason': 'unchanged', 'status': invoice_status})
+            elif from_statuses and invoice_status not in from_statuses:
+                skipped.append({'id': invoice_id, 'reason': 'precondition_failed', 'status': invoice_status})
+            elif invoice_status == 'paid' and gateway_paid.get(invoice_id, 0) >= current[invoice_id][3] > 0:
+                skipped.append({'id': invoice_id, 'reason': 'paid_by_gateway', 'status': invoice_status})
+            else:
+                changed.append(invoice_id)
+
+        payments, reversed_count = [], 0
+        if changed:
+            Invoice.objects.filter(user=user, id__in=changed).update(status=new_status, updated_at=timezone.now())
+
+            if record_payment and new_status == 'paid':
+                currency = UserProfile.objects.filter(user=user).values_list('currency', flat=True).first() or 'usd'
+                payments = InvoicePayment.objects.bulk_create([
+                    # Only what is still owed; earlier partial payments already count
+                    InvoicePayment(
+                        invoice_id=invoice_id, gateway_name='manual', amount=current[invoice_id][2],
+                        currency=currency.lower(), status='completed', payment_method=payment_method or None,
+                        payment_date=paid_at, metadata={'source': 'bulk_status'}
+                    )
+                    for invoice_id in changed if current[invoice_id][2] > 0
+                ])
+            reopened = [invoice_id for invoice_id in changed if current[invoice_id][0] == 'paid']
+            if reopened:
+                # The paid mark is taken back, so what was recorded by hand no longer counts
+                reversed_count = InvoicePayment.objects.filter(
+                    invoice_id__in=reopened, gateway_name='manual', status='completed'
+                ).update(status='refunded', updated_at=timezone.now())
+
+            # Covered by the signal below, so the batch bumps the analytics version once
+            refresh_invoice_balances(changed, notify=False)
+
+            invoices_bulk_updated.send(
+                sender=Invoice, user_id=user.id, invoice_ids=changed,
+                issue_dates=[current[invoice_id][1] for invoice_id in changed], fields=['status', *BALANCE_FIELDS],
+                statuses={new_status} | {current[invoice_id][0] for invoice_id in changed}
+            )
+
+    return {
+        'updated': changed,
+        'skipped': skipped,
+        'payments_created': len(payments),
+        'payments_refunded': reversed_count,
+    }
+
+
+def mark_overdue_invoices(today=None, chunk_size=OVERDUE_CHUNK_SIZE):
+    """Move unpaid invoices due before ``today`` to ``overdue``, for all users.
+
+    Each chunk locks up to ``chunk_size`` candidates (skipping rows another
+    transaction holds), flips them with one ``UPDATE`` by primary key and
+    commits, so no lock is held for longer than one chunk. Candidates come
+    from the partial ``invoice_unpaid_due_date_idx``; flipped rows leave it,
+    so a run with nothing to do is a single empty index probe.
+    Returns ``{'updated': rows, 'chunks': chunks, 'users': users}``.
+    """
+    today = today or timezone.now().date()
+    candidates = Invoice.objects.filter(status='unpaid', due_date__lt=today).order_by('due_date', 'id')
+    updated = chunks = 0
+    user_ids = set()
+
+    while True:
+        with transaction.atomic():
+            rows = list(
+                candidates.select_for_update(skip_locked=True)
+                .values_list('id', 'user_id', 'issue_date')[:chunk_size]
+            )
+            if not rows:
+                break
+            count = Invoice.objects.filter(
+                id__in=[row[0] for row in rows], status='unpaid', due_date__lt=today
+            ).update(status='overdue', updated_at=timezone.now())
+
+            by_user = defaultdict(list)
+            for invoice_id, user_id, issue_date in rows:
+                by_user[user_id].append((invoice_id, issue_date))
+            for user_id, invoices in by_user.items():
+                invoices_bulk_updated.send(
+                    sender=Invoice, user_id=user_id, invoice_ids=[invoice[0] for invoice in invoices],
+                    issue_dates=[invoice[1] for invoice in invoices], fields=['status'],
+                    statuses={'unpaid', 'overdue'}
+                )
+
+        updated += count
+        chunks += 1
+        user_ids.update(by_user)
+        if not count:
+            # Everything left is held by other transactions; the next run picks it up
+            break
+
+    return {'updated': updated, 'chunks': chunks, 'users': len(user_ids)}
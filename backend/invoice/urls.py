@@ -1,10 +1,23 @@
 from django.urls import path
-from .views import InvoiceView
+from .views import (
+    InvoiceView, InvoiceSearchView, InvoiceBulkImportView, InvoiceBulkStatusView, InvoicePDFView, RecurringInvoiceView
+)
 
 
 urlpatterns = [
     # Invoice list and create
     path('', InvoiceView.as_view(), name='invoice-list-create'),
+    # Ranked invoice search
+    path('search/', InvoiceSearchView.as_view(), name='invoice-search'),
+    # Bulk import (JSON array, NDJSON or CSV)
+    path('bulk/', InvoiceBulkImportView.as_view(), name='invoice-bulk-import'),
+    # Status change for many invoices (mark as paid)
+    path('bulk/status/', InvoiceBulkStatusView.as_view(), name='invoice-bulk-status'),
+    # Recurring invoice templates
+    path('recurring/', RecurringInvoiceView.as_view(), name='recurring-invoice-list-create'),
+    path('recurring/<uuid:recurring_id>/', RecurringInvoiceView.as_view(), name='recurring-invoice-detail'),
     # Invoice detail, update, delete
     path('<uuid:invoice_id>/', InvoiceView.as_view(), name='invoice-detail'),
+    # Rendered PDF, public like the invoice detail
+    path('<uuid:invoice_id>/pdf/', InvoicePDFView.as_view(), name='invoice-pdf'),
 ]
\ No newline at end of file
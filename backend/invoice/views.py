@@ -1,24 +1,32 @@
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponse
+from django.utils.http import parse_etags
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from datetime import datetime
 from django.utils import timezone
+from trackify.conditional import ConditionalGetMixin
+from trackify.pagination import StandardResultsSetPagination, PaginatedListMixin
 
-from .models import Invoice
-from .serializers import InvoiceSerializer, InvoiceDetailSerializer
+from .bulk import CSVParser, NDJSONParser, InvoiceImporter, import_records
+from .models import Invoice, RecurringInvoice
+from .rendering import (
+    RENDER_UNAVAILABLE, InvoicePDF, PDFRenderer, known_pdf_digest, pdf_fingerprint, pdf_queryset, remember_pdf_digest
+)
+from .search import InvoiceSearchResults, matching_invoice_ids
+from .serializers import (
+    InvoiceDetailSerializer, InvoiceListSerializer, InvoiceBulkStatusSerializer, RecurringInvoiceSerializer, parse_expand
+)
+from .transitions import apply_bulk_status
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    """Standard pagination for list views"""
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
-class InvoiceView(APIView):
+class InvoiceView(ConditionalGetMixin, PaginatedListMixin, APIView):
     """Class-based view for invoice management
     
     Supports:
@@ -29,13 +37,7 @@ class InvoiceView(APIView):
     """
     permission_classes = [IsAuthenticated]  # This will be overridden for specific methods
     pagination_class = StandardResultsSetPagination
-    
-    def get_paginated_response(self, queryset, serializer_class):
-        """Helper method to paginate queryset"""
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(queryset, self.request)
-        serializer = serializer_class(page, many=True, context={'request': self.request})
-        return paginator.get_paginated_response(serializer.data)
+    cursor_ordering = ('-created_at', '-id')
     
     def get_permissions(self):
         """Override permissions based on action"""
@@ -50,10 +52,15 @@ class InvoiceView(APIView):
         if invoice_id:
             # Get specific invoice with detailed information
             try:
-                # Remove user filter to allow public access to any invoice by ID
-                invoice = get_object_or_404(Invoice, id=invoice_id)
-                serializer = InvoiceDetailSerializer(invoice)
-                return Response(serializer.data)
+                # Remove user filter to allow public access to any invoice by ID.
+                # Item changes save the invoice and user changes save the profile,
+                # so these timestamps cover everything the serializer reads
+                invoices = Invoice.objects.filter(id=invoice_id)
+                return self.conditional_get(
+                    invoices,
+                    ('updated_at', 'client__updated_at', 'user__profile__updated_at'),
+                    lambda: Response(InvoiceDetailSerializer(invoices.get()).data)
+                )
             except Exception as e:
                 return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
         else:
@@ -92,14 +99,15 @@ class InvoiceView(APIView):
             # Apply search filter if provided
             search_term = request.query_params.get('search', None)
             if search_term:
-                queryset = queryset.filter(
-                    invoice_number__icontains=search_term
-                ) | queryset.filter(
-                    client__name__icontains=search_term
-                )
+                # Served by the search index (see invoice/search.py)
+                queryset = queryset.filter(id__in=matching_invoice_ids(request.user, search_term))
                 
+            # Slim rows; items and the user block only with ?expand=items,user
+            expand = parse_expand(request.query_params.get('expand'))
+            queryset = InvoiceListSerializer.prepare_queryset(queryset, expand)
+            
             # Return paginated response
-            return self.get_paginated_response(queryset, InvoiceSerializer)
+            return self.get_paginated_response(queryset, InvoiceListSerializer, {'expand': expand})
     
     def post(self, request):
         """Create a new invoice with items"""
@@ -152,3 +160,210 @@ class InvoiceView(APIView):
 
 # InvoiceItemView removed - items are now managed through the InvoiceView
 # using nested serializers
+
+
+class InvoiceSearchView(APIView):
+    """Ranked search over the user's invoices
+    
+    Matches the invoice number, client name, item descriptions and notes
+    through the search index, best matches first.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'The q parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        expand = parse_expand(request.query_params.get('expand'))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(InvoiceSearchResults(request.user, query), request)
+        # Results come with their client loaded; fetch the rest per page
+        select, prefetch = InvoiceListSerializer.related_lookups(expand)
+        prefetch_related_objects(page, *[lookup for lookup in select if lookup != 'client'], *prefetch)
+        serializer = InvoiceListSerializer(page, many=True, context={'request': request, 'expand': expand})
+        return paginator.get_paginated_response(serializer.data)
+
+
+class InvoiceBulkImportView(APIView):
+    """Import many invoices in one request
+    
+    Takes a JSON array, NDJSON or CSV body (see ``invoice/bulk.py``) and
+    answers with one result per row. ``?dry_run=true`` only validates.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser, CSVParser]
+    
+    def post(self, request):
+        records = import_records(request.data)
+        if records is None:
+            return Response({'error': 'Send a JSON array of invoices, NDJSON or CSV'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        report = InvoiceImporter(request.user, dry_run=dry_run).run(records)
+        
+        if not report['results']:
+            return Response({'error': 'No invoices to import'}, status=status.HTTP_400_BAD_REQUEST)
+        if report.get('created'):
+            return Response(report, status=status.HTTP_201_CREATED)
+        if report['failed'] and not report.get('valid'):
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+
+class InvoiceBulkStatusView(APIView):
+    """Change the status of many invoices at once
+    
+    One UPDATE for all invoices, optionally only from the statuses in
+    ``from_status``. Marking invoices paid records a manual payment for
+    each of them unless ``record_payment`` is false.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = InvoiceBulkStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        result = apply_bulk_status(
+            request.user,
+            data['ids'],
+            data['status'],
+            from_statuses=data.get('from_status'),
+            record_payment=data['record_payment'],
+            payment_method=data['payment_method'],
+            paid_at=data.get('payment_date'),
+        )
+        return Response(result)
+
+
+
+class InvoicePDFView(APIView):
+    """The invoice as a PDF, public like the invoice detail
+    
+    Served from the render cache; ``ETag`` is the digest of the rendered
+    content, so ``If-None-Match`` revalidations answer 304 without reading
+    or rendering the file. The digest is looked up by the invoice's
+    fingerprint first, so a 304 costs one light query instead of loading
+    the invoice, its items and the profile. ``?download=true`` asks for an
+    attachment. When the render pool times out or is broken the answer is
+    503 with ``Retry-After``.
+    """
+    permission_classes = []
+    renderer_classes = [JSONRenderer, PDFRenderer]
+    
+    def get(self, request, invoice_id):
+        fingerprint = pdf_fingerprint(invoice_id)
+        if fingerprint is None:
+            raise Http404
+        
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        digest = known_pdf_digest(invoice_id, fingerprint)
+        if digest is not None and f'"{digest}"' in etags:
+            return self.finalize(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), digest)
+        
+        pdf = InvoicePDF(get_object_or_404(pdf_queryset(), id=invoice_id))
+        remember_pdf_digest(invoice_id, fingerprint, pdf.digest)
+        if f'"{pdf.digest}"' in etags:
+            return self.finalize(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), pdf.digest)
+        
+        try:
+            content = pdf.content()
+        except RENDER_UNAVAILABLE:
+            response = Response(
+                {'error': 'The PDF could not be rendered right now, please retry'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = str(settings.INVOICE_PDF_RETRY_AFTER)
+            return response
+        
+        response = HttpResponse(content, content_type='application/pdf')
+        disposition = 'attachment' if request.query_params.get('download') == 'true' else 'inline'
+        response['Content-Disposition'] = f'{disposition}; filename="{pdf.filename}"'
+        return self.finalize(response, pdf.digest)
+    
+    def finalize(self, response, digest):
+        response['ETag'] = f'"{digest}"'
+        # Cache, but revalidate every time: the invoice may have changed
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class RecurringInvoiceView(ConditionalGetMixin, PaginatedListMixin, APIView):
+    """Recurring invoice templates
+    
+    Supports:
+    - GET: List the user's templates or get a specific one
+    - POST: Create a template with its items
+    - PUT/PATCH: Update a template (sent items replace the stored ones)
+    - DELETE: Remove a template (invoices already generated are kept)
+    
+    Invoices are generated by ``python manage.py generate_recurring_invoices``.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    cursor_ordering = ('-created_at', '-id')
+    
+    def get_queryset(self):
+        return RecurringInvoice.objects.filter(user=self.request.user)
+    
+    def get(self, request, recurring_id=None):
+        """Get a list of templates or a specific template"""
+        if recurring_id:
+            try:
+                templates = self.get_queryset().filter(id=recurring_id)
+                return self.conditional_get(
+                    templates, ('updated_at', 'client__updated_at'),
+                    lambda: Response(RecurringInvoiceSerializer(templates.get()).data)
+                )
+            except Exception as e:
+                return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        
+        queryset = self.get_queryset().select_related('client').prefetch_related('items')
+        if request.query_params.get('is_active') in ('true', 'false'):
+            queryset = queryset.filter(is_active=request.query_params['is_active'] == 'true')
+        return self.get_paginated_response(queryset, RecurringInvoiceSerializer)
+    
+    def post(self, request):
+        """Create a new template with items"""
+        serializer = RecurringInvoiceSerializer(data=request.data, context={'request': request})
+        
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def update_template(self, request, recurring_id, partial):
+        try:
+            template = get_object_or_404(self.get_queryset(), id=recurring_id)
+            serializer = RecurringInvoiceSerializer(template, data=request.data, partial=partial,
+                                                    context={'request': request})
+            
+            if serializer.is_valid():
+                serializer.save()
+                return Response(serializer.data)
+            
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    
+    def put(self, request, recurring_id):
+        """Update an existing template"""
+        return self.update_template(request, recurring_id, partial=False)
+    
+    def patch(self, request, recurring_id):
+        """Partially update an existing template, e.g. ``{"is_active": false}`` to pause it"""
+        return self.update_template(request, recurring_id, partial=True)
+    
+    def delete(self, request, recurring_id):
+        """Delete a template"""
+        try:
+            template = get_object_or_404(self.get_queryset(), id=recurring_id)
+            template.delete()
+            return Response({'message': 'Recurring invoice deleted successfully'}, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
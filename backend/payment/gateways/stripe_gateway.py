@@ -1,9 +1,13 @@
-import stripe
+import importlib
 import json
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from .base import PaymentGatewayBase
 from ..models import InvoicePayment, PaymentWebhookEvent
 
+# The Stripe SDK takes ~0.5s to import, so only load it the first time it is used
+stripe = SimpleLazyObject(lambda: importlib.import_module('stripe'))
+
 
 class StripeGateway(PaymentGatewayBase):
     """
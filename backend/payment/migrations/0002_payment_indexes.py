@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0004_invoice_indexes'),
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoicepayment',
+            index=models.Index(fields=['invoice', 'created_at'], name='payment_invoice_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicepayment',
+            index=models.Index(fields=['gateway_session_id'], name='payment_session_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoicepayment',
+            index=models.Index(fields=['gateway_payment_id'], name='payment_gateway_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0002_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoicepayment',
+            name='gateway_name',
+            field=models.CharField(choices=[('stripe', 'Stripe'), ('paypal', 'PayPal'), ('razorpay', 'Razorpay'), ('manual', 'Manual')], max_length=50),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from invoice.models import Invoice
@@ -62,10 +64,15 @@ class InvoicePayment(models.Model):
         ('refunded', 'Refunded'),
     )
     
+    # Manual payments are recorded by hand (e.g. a bank transfer marked paid) and have no gateway
+    GATEWAY_CHOICES = PaymentGatewayConfig.GATEWAY_CHOICES + (
+        ('manual', 'Manual'),
+    )
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='payments')
     gateway = models.ForeignKey(PaymentGatewayConfig, on_delete=models.SET_NULL, null=True, related_name='payments')
-    gateway_name = models.CharField(max_length=50, choices=PaymentGatewayConfig.GATEWAY_CHOICES)
+    gateway_name = models.CharField(max_length=50, choices=GATEWAY_CHOICES)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -83,14 +90,34 @@ class InvoicePayment(models.Model):
         return f"Payment for Invoice #{self.invoice.invoice_number}"
     
     def save(self, *args, **kwargs):
-        # If payment is completed, update invoice status and set payment date
+        from invoice.balances import refresh_invoice_balances
+        
         if self.status == 'completed' and not self.payment_date:
             self.payment_date = timezone.now()
-            # Update invoice status
-            self.invoice.status = 'paid'
-            self.invoice.save()
         
-        super().save(*args, **kwargs)
+        # The payment and the invoice's amount paid and status change together or not at all;
+        # the invoice is paid once its completed payments cover the total (invoice/balances.py)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            refresh_invoice_balances([self.invoice_id])
+    
+    class Meta:
+        indexes = [
+            # Payments of an invoice, newest first
+            models.Index(fields=['invoice', 'created_at'], name='payment_invoice_created_idx'),
+            # Webhook lookups
+            models.Index(fields=['gateway_session_id'], name='payment_session_id_idx'),
+            models.Index(fields=['gateway_payment_id'], name='payment_gateway_id_idx'),
+        ]
+
+
+@receiver(post_delete, sender=InvoicePayment)
+def refresh_balance_for_deleted_payment(sender, instance, origin=None, **kwargs):
+    # Deleting the invoice itself cascades here; there is no balance left to keep
+    if isinstance(origin, Invoice) or getattr(origin, 'model', None) is Invoice:
+        return
+    from invoice.balances import refresh_invoice_balances
+    refresh_invoice_balances([instance.invoice_id])
 
 
 class PaymentWebhookEvent(models.Model):
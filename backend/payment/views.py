@@ -6,7 +6,7 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.pagination import PageNumberPagination
+from trackify.pagination import StandardResultsSetPagination, PaginatedListMixin
 
 from invoice.models import Invoice
 from .models import PaymentGatewayConfig, InvoicePayment
@@ -19,14 +19,7 @@ from .serializers import (
 from .services import PaymentService
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    """Standard pagination for list views"""
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
-class PaymentGatewayConfigView(APIView):
+class PaymentGatewayConfigView(PaginatedListMixin, APIView):
     """
     API view for managing payment gateway configurations
     
@@ -38,13 +31,7 @@ class PaymentGatewayConfigView(APIView):
     """
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
-    
-    def get_paginated_response(self, queryset, serializer_class):
-        """Helper method to paginate queryset"""
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(queryset, self.request)
-        serializer = serializer_class(page, many=True, context={'request': self.request})
-        return paginator.get_paginated_response(serializer.data)
+    cursor_ordering = ('-created_at', '-id')
     
     def get(self, request, gateway_id=None):
         """Get a list of payment gateways or a specific gateway"""
@@ -266,19 +253,13 @@ class PaymentRefundView(APIView):
             return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class InvoicePaymentsView(APIView):
+class InvoicePaymentsView(PaginatedListMixin, APIView):
     """
     API view for listing payments for an invoice
     """
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
-    
-    def get_paginated_response(self, queryset, serializer_class):
-        """Helper method to paginate queryset"""
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(queryset, self.request)
-        serializer = serializer_class(page, many=True, context={'request': self.request})
-        return paginator.get_paginated_response(serializer.data)
+    cursor_ordering = ('-created_at', '-id')
     
     def get(self, request, invoice_id):
         """Get a list of payments for an invoice"""
@@ -411,19 +392,13 @@ class PublicPaymentView(APIView):
             })
 
 
-class AllPaymentsView(APIView):
+class AllPaymentsView(PaginatedListMixin, APIView):
     """
     API view for listing all payments with pagination
     """
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
-    
-    def get_paginated_response(self, queryset, serializer_class):
-        """Helper method to paginate queryset"""
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(queryset, self.request)
-        serializer = serializer_class(page, many=True, context={'request': self.request})
-        return paginator.get_paginated_response(serializer.data)
+    cursor_ordering = ('-created_at', '-id')
     
     def get(self, request):
         """Get a list of all payments"""
@@ -0,0 +1,62 @@
+"""Conditional GET for the detail endpoints.
+
+A detail response only changes when one of the rows it is built from
+changes, and every such row bumps its ``updated_at`` when saved. Reading
+those timestamps is a single indexed lookup, so the validators can be
+checked before the object is loaded or serialized:
+
+- ``ETag``: weak (``W/"..."``), a hash of the timestamps and the response
+  format. Equal timestamps mean an equivalent body, not a byte-identical
+  one (e.g. a Cloudinary URL may be signed differently).
+- ``Last-Modified``: the newest of the timestamps.
+
+A request whose ``If-None-Match`` (or, without one, ``If-Modified-Since``)
+still matches gets ``304 Not Modified`` without running the serializer.
+"""
+import hashlib
+from calendar import timegm
+
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+# Bump when a detail serializer changes shape so clients refetch
+REPRESENTATION_VERSION = 2
+
+
+def weak_etag(*parts):
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+class ConditionalGetMixin:
+    """``conditional_get`` helper for APIView detail GETs"""
+
+    def conditional_get(self, queryset, timestamp_fields, build_response):
+        """Return 304 if the client's copy is current, else ``build_response()``.
+
+        ``queryset`` selects the object (already filtered by owner);
+        ``timestamp_fields`` are the ``updated_at`` columns, following
+        relations, of every row the response is built from. Raises
+        ``Http404`` if the object does not exist.
+        """
+        row = queryset.values_list(*timestamp_fields).first()
+        if row is None:
+            raise Http404('No %s matches the given query.' % queryset.model._meta.object_name)
+
+        etag = weak_etag(REPRESENTATION_VERSION, self.request.accepted_renderer.format, *row)
+        timestamps = [value for value in row if value is not None]
+        last_modified = timegm(max(timestamps).utctimetuple()) if timestamps else None
+
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = build_response()
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Clients may keep the body but must revalidate before reusing it
+            response['Cache-Control'] = 'private, no-cache'
+        return response
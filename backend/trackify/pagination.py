@@ -0,0 +1,192 @@
+"""Pagination shared by the list endpoints.
+
+Lists are paginated by page number by default (``?page=3``). Views that
+declare a ``cursor_ordering`` (e.g. ``('-created_at', '-id')``) also offer a
+keyset mode, opted into with ``?pagination=cursor``: each page is fetched with
+``WHERE (created_at, id) < (last row)`` instead of ``OFFSET``, so a page costs
+the same however far the client has scrolled, and rows inserted meanwhile do
+not shift later pages. Keyset pages skip the ``COUNT(*)`` unless
+``?include_total=true`` asks for an approximate total.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+PAGE_SIZE = 10
+
+MAX_PAGE_SIZE = 100
+
+
+def approximate_count(queryset):
+    """Row count estimate: the planner's estimate on Postgres, an exact count elsewhere"""
+    if connection.vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    return queryset.count()
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a unique ordering, e.g. ``('-created_at', '-id')``.
+
+    The cursor is the ordering values of the row at the page edge, so the
+    next page is an index range scan from that row. The last ordering field
+    must be unique (normally the primary key) to make the order stable.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    total_query_param = 'include_total'
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return PAGE_SIZE
+        return min(page_size, MAX_PAGE_SIZE) if page_size > 0 else PAGE_SIZE
+
+    def encode_cursor(self, instance, reverse):
+        values = []
+        for field_name in self.ordering:
+            field = instance._meta.get_field(field_name.lstrip('-'))
+            values.append(field.value_to_string(instance))
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = payload['v'], bool(payload['r'])
+            if len(values) != len(self.ordering):
+                raise ValueError
+            values = [
+                model._meta.get_field(field_name.lstrip('-')).to_python(value)
+                for field_name, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound('Invalid cursor')
+        return values, reverse
+
+    def keyset_filter(self, values, reverse):
+        """Rows after ``values`` in the ordering (before them when ``reverse``)"""
+        condition = Q()
+        equal = Q()
+        for field_name, value in zip(self.ordering, values):
+            descending = field_name.startswith('-')
+            name = field_name.lstrip('-')
+            lookup = 'gt' if descending == reverse else 'lt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        # The OR alone is not an index range; bounding the first column as
+        # well lets the database seek straight to the cursor row
+        first = self.ordering[0]
+        lookup = 'gte' if first.startswith('-') == reverse else 'lte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        values, self.reverse = self.decode_cursor(request, queryset.model)
+        self.has_cursor = values is not None
+
+        self.total = None
+        if request.query_params.get(self.total_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.total = approximate_count(queryset)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+        if self.has_cursor:
+            queryset = queryset.filter(self.keyset_filter(values, self.reverse))
+
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        self.has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+        return self.page
+
+    def get_next_link(self):
+        # Going forward there is a next page if an extra row came back;
+        # going backward we came from the next page
+        if not self.page or not (self.reverse or self.has_more):
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.page or not (self.has_more if self.reverse else self.has_cursor):
+            return None
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, instance, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(instance, reverse))
+
+    def get_paginated_response(self, data):
+        body = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            body['approximate_count'] = self.total
+        body['results'] = data
+        return Response(body)
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """Standard pagination for list views
+
+    Page numbers by default; ``?pagination=cursor`` switches to keyset pages
+    on views that set ``cursor_ordering``. Both modes sort by that ordering,
+    so rows with equal timestamps keep a stable order.
+    """
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    mode_query_param = 'pagination'
+
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', None)
+        wants_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+        if ordering and wants_cursor:
+            self.keyset = KeysetPagination(ordering)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class PaginatedListMixin:
+    """``get_paginated_response`` helper for APIViews with a ``pagination_class``"""
+
+    def get_paginated_response(self, queryset, serializer_class, context=None):
+        """Helper method to paginate queryset"""
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(page, many=True, context={'request': self.request, **(context or {})})
+        return paginator.get_paginated_response(serializer.data)
@@ -58,6 +58,7 @@ INSTALLED_APPS = [
     'subscription',
     'analytics',
     'payment',
+    'archive',
 ]
 
 MIDDLEWARE = [
@@ -220,6 +221,61 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 # Frontend URL for email verification
 FRONTEND_URL = os.getenv('FRONTEND_URL')  # Update this with your frontend URL
 
+# Analytics
+# Responses of the analytics endpoints are cached per user and invalidated through a
+# per-user data version. Backend: locmem (per process), file (shared by the workers of
+# one host) or redis (any Redis protocol compatible server, needs the `redis` package).
+# Defaults to a backend every worker shares: redis when ANALYTICS_CACHE_URL is set, file
+# otherwise. A per-process locmem cache misses the invalidations made by other workers.
+ANALYTICS_CACHE_ENABLED = os.getenv('ANALYTICS_CACHE_ENABLED', 'True') == 'True'
+ANALYTICS_CACHE_ALIAS = 'analytics'
+ANALYTICS_CACHE_BACKEND = os.getenv('ANALYTICS_CACHE_BACKEND', 'redis' if os.getenv('ANALYTICS_CACHE_URL') else 'file')
+ANALYTICS_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'trackify-analytics',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('ANALYTICS_CACHE_LOCATION', os.path.join(BASE_DIR, '.cache', 'analytics')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('ANALYTICS_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    ANALYTICS_CACHE_ALIAS: {
+        **ANALYTICS_CACHE_BACKENDS[ANALYTICS_CACHE_BACKEND],
+        'TIMEOUT': int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 60 * 60)),
+        'KEY_PREFIX': 'analytics',
+    },
+}
+
+# Async execution mode: with ASYNC_ANALYTICS_VIEWS the dashboard and analytics bundle
+# URLs are served by async views that run their independent queries concurrently.
+# Run under an ASGI server (uvicorn) for this to pay off. Every worker thread holds its
+# own database connection, so the pool size bounds the extra connections per process.
+ASYNC_ANALYTICS_VIEWS = os.getenv('ASYNC_ANALYTICS_VIEWS', 'False') == 'True'
+ANALYTICS_ASYNC_MAX_WORKERS = int(os.getenv('ANALYTICS_ASYNC_MAX_WORKERS', 8))
+
+# Invoice PDFs: rendered by a bounded pool of worker processes and cached on disk,
+# or in the STORAGES entry named by INVOICE_PDF_STORAGE (see invoice/rendering.py)
+INVOICE_PDF_STORAGE = os.getenv('INVOICE_PDF_STORAGE')
+INVOICE_PDF_CACHE_DIR = os.getenv('INVOICE_PDF_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'invoice_pdfs'))
+INVOICE_PDF_WORKERS = int(os.getenv('INVOICE_PDF_WORKERS', 2))
+INVOICE_PDF_TIMEOUT = int(os.getenv('INVOICE_PDF_TIMEOUT', 30))
+# Seconds clients are asked to wait (Retry-After) when a render times out or the pool is broken
+INVOICE_PDF_RETRY_AFTER = int(os.getenv('INVOICE_PDF_RETRY_AFTER', 5))
+
+# Closed years older than this many years can be moved to the archive tables
+# (see archive/services.py); the current and the previous year always stay hot
+ARCHIVE_KEEP_YEARS = int(os.getenv('ARCHIVE_KEEP_YEARS', 2))
+
 # Payment Gateway Configuration
 PAYMENT_GATEWAYS = [
     {
@@ -243,10 +299,9 @@ PLATFORM_GATEWAY = {
     'fee_percentage': 1.0  # 1% platform fee
 }
 
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
-
+# The cloudinary apps stay installed because CloudinaryField (users and expense
+# models) needs them, so cloudinary and cloudinary.uploader still load during app
+# population. Only cloudinary.api, which nothing imports at boot, is left out here.
 CLOUDINARY_STORAGE = {
     "CLOUD_NAME": os.getenv('CLOUD_NAME'),
     "API_KEY": os.getenv('CLOUDINARY_API_KEY'),
@@ -0,0 +1,18 @@
+from rest_framework import status
+
+from analytics.async_views import async_analytics_view
+from analytics.concurrency import run_concurrently
+from .dashboard import get_dashboard_range, dashboard_tasks, assemble_dashboard
+
+
+@async_analytics_view()
+async def get_dashboard_data(request, user):
+    """
+    Async variant of the dashboard endpoint (ASYNC_ANALYTICS_VIEWS)
+    The six dashboard queries run concurrently
+    """
+    start_date, end_date, range_type = get_dashboard_range(request.GET)
+
+    results = await run_concurrently(dashboard_tasks(user, start_date, end_date))
+
+    return assemble_dashboard(results, start_date, end_date, range_type), status.HTTP_200_OK
@@ -0,0 +1,155 @@
+from datetime import timedelta, datetime
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from invoice.models import Invoice
+from invoice.serializers import InvoiceListSerializer
+from expense.models import Expense
+from expense.serializers import ExpenseSerializer
+
+
+def get_dashboard_range(query_params):
+    """Resolve the dashboard date range; returns (start_date, end_date, range_type)"""
+    start_date = query_params.get('start_date', None)
+    end_date = query_params.get('end_date', None)
+    range_type = query_params.get('range_type', 'last_30_days')
+
+    # Set default date filters based on range_type if not explicitly provided
+    if not start_date or not end_date:
+        today = timezone.now()
+
+        if range_type == 'last_30_days':
+            end_date = today
+            start_date = today - timedelta(days=30)
+        elif range_type == 'last_month':
+            last_month = today.replace(day=1) - timedelta(days=1)
+            start_date = last_month.replace(day=1)
+            end_date = last_month.replace(day=last_month.day)
+        elif range_type == 'last_3_months':
+            end_date = today
+            start_date = today - timedelta(days=90)
+        elif range_type == 'last_6_months':
+            end_date = today
+            start_date = today - timedelta(days=180)
+        elif range_type == 'last_year':
+            last_year = today.replace(year=today.year-1)
+            start_date = last_year.replace(month=1, day=1)
+            end_date = last_year.replace(month=12, day=31)
+        else:  # Default to last 30 days
+            end_date = today
+            start_date = today - timedelta(days=30)
+    else:
+        # Convert string dates to datetime objects
+        try:
+            start_date = timezone.make_aware(datetime.strptime(start_date, '%Y-%m-%d'))
+            # Set end_date to end of the day
+            end_date = timezone.make_aware(datetime.strptime(end_date, '%Y-%m-%d'))
+            end_date = end_date.replace(hour=23, minute=59, second=59)
+        except ValueError:
+            # If date parsing fails, default to last 30 days
+            today = timezone.now()
+            end_date = today
+            start_date = today - timedelta(days=30)
+
+    return start_date, end_date, range_type
+
+
+def dashboard_tasks(user, start_date, end_date):
+    """Independent queries behind the dashboard, as name -> zero argument callable.
+
+    The sync view runs them one after another, the async view concurrently.
+    Serializer output is rendered inside the task so related lookups happen
+    on the same connection as the query.
+    """
+    # Previous period of equal length, used for the trends
+    period_length = (end_date - start_date).days
+    previous_start = start_date - timedelta(days=period_length)
+    previous_end = start_date - timedelta(days=1)
+
+    def paid_income(start, end):
+        return Invoice.objects.filter(
+            user=user,
+            status='paid',
+            created_at__gte=start,
+            created_at__lte=end
+        ).aggregate(total=Sum('total'))['total'] or 0
+
+    def expense_total(start, end):
+        return Expense.objects.filter(
+            user=user,
+            created_at__gte=start,
+            created_at__lte=end
+        ).aggregate(total=Sum('amount'))['total'] or 0
+
+    def recent_invoices():
+        invoices = Invoice.objects.filter(
+            user=user,
+            created_at__gte=start_date,
+            created_at__lte=end_date
+        ).select_related('client').order_by('-created_at')[:5]
+        return InvoiceListSerializer(invoices, many=True).data
+
+    def recent_expenses():
+        expenses = Expense.objects.filter(
+            user=user,
+            created_at__gte=start_date,
+            created_at__lte=end_date
+        ).order_by('-created_at')[:5]
+        return ExpenseSerializer(expenses, many=True).data
+
+    return {
+        'total_income': lambda: paid_income(start_date, end_date),
+        'total_expenses': lambda: expense_total(start_date, end_date),
+        'previous_income': lambda: paid_income(previous_start, previous_end),
+        'previous_expenses': lambda: expense_total(previous_start, previous_end),
+        'recent_invoices': recent_invoices,
+        'recent_expenses': recent_expenses,
+    }
+
+
+def assemble_dashboard(results, start_date, end_date, range_type):
+    """Build the dashboard payload from the task results"""
+    total_income = results['total_income']
+    total_expenses = results['total_expenses']
+    previous_income = results['previous_income']
+    previous_expenses = results['previous_expenses']
+
+    # Calculate balance
+    balance = total_income - total_expenses
+
+    # Calculate income trend percentage
+    income_trend = 0
+    if previous_income > 0:
+        income_trend = ((total_income - previous_income) / previous_income) * 100
+
+    # Calculate expense trend percentage
+    expense_trend = 0
+    if previous_expenses > 0:
+        expense_trend = ((total_expenses - previous_expenses) / previous_expenses) * 100
+
+    # Calculate balance trend
+    balance_trend = 0
+    previous_balance = previous_income - previous_expenses
+    current_balance = total_income - total_expenses
+
+    if previous_balance != 0:
+        balance_trend = ((current_balance - previous_balance) / abs(previous_balance)) * 100
+
+    return {
+        'stats': {
+            'total_income': total_income,
+            'total_expenses': total_expenses,
+            'balance': balance,
+            'income_trend': round(income_trend, 2),
+            'expense_trend': round(expense_trend, 2),
+            'balance_trend': round(balance_trend, 2),
+            'date_range': {
+                'start_date': start_date.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d'),
+                'range_type': range_type
+            }
+        },
+        'recent_invoices': results['recent_invoices'],
+        'recent_expenses': results['recent_expenses']
+    }
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_alter_bankaccount_account_holder_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='invoice_number_format',
+            field=models.CharField(default='INV-{year}-{month:02d}-{number:04d}', max_length=50),
+        ),
+    ]
@@ -14,6 +14,9 @@ CURRENCY_CHOICES = (
     ('usd', 'USD')
 )
 
+# Placeholders: {year}, {month} and {number}; see invoice/numbering.py
+DEFAULT_INVOICE_NUMBER_FORMAT = 'INV-{year}-{month:02d}-{number:04d}'
+
 
 class UserProfile(models.Model):
     """Profile model for extending the User model"""
@@ -30,6 +33,8 @@ class UserProfile(models.Model):
 
     currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default='pkr')
     allow_platform_gateway = models.BooleanField(default=False)
+    invoice_number_format = models.CharField(max_length=50, default=DEFAULT_INVOICE_NUMBER_FORMAT)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
     
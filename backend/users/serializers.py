@@ -22,7 +22,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ['company_name', 'phone_number', 'address', 'city', 'state',
-                 'country', 'zip_code', 'profile_picture', 'currency', 'allow_platform_gateway']
+                 'country', 'zip_code', 'profile_picture', 'currency', 'allow_platform_gateway',
+                 'invoice_number_format']
 
 
 
@@ -79,7 +80,16 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ['company_name', 'phone_number', 'address', 'city', 'state',
-                 'country', 'zip_code', 'profile_picture', 'currency', 'allow_platform_gateway']
+                 'country', 'zip_code', 'profile_picture', 'currency', 'allow_platform_gateway',
+                 'invoice_number_format']
+    
+    def validate_invoice_number_format(self, value):
+        from invoice.numbering import validate_number_format
+        try:
+            validate_number_format(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
 
 
 
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 from . import views_bank_account
 from . import contact_views
+from . import async_views
 
 
 urlpatterns = [
@@ -21,7 +23,9 @@ urlpatterns = [
     path('profile/details/', views.get_user_details, name='user_details'),
     
     # Dashboard
-    path('dashboard/', views.get_dashboard_data, name='dashboard_data'),
+    path('dashboard/',
+         async_views.get_dashboard_data if settings.ASYNC_ANALYTICS_VIEWS else views.get_dashboard_data,
+         name='dashboard_data'),
     
     # Bank Account
     path('bank-account/', views_bank_account.BankAccountView.as_view(), name='bank_account'),